@@ -0,0 +1,70 @@
+"""Compare gzip and brotli levels on the server's typical response bodies: size and CPU time.
+
+    python benchmarks/bench_compress.py [--transactions N] [--repeat N]
+
+Bodies are a /api/transactions-style JSON list, the same rows as an export document,
+and the app's largest static files. Rows marked * are the levels COMPRESS_LEVELS uses
+(dynamic for JSON, static for files). brotli rows appear only when the optional brotli
+package is installed.
+"""
+import argparse
+import json
+import zlib
+from pathlib import Path
+
+from bench_import import export_document
+from common import report, server, timed
+
+ROOT = Path(server.__file__).resolve().parent
+STATIC_FILES = ("js/chart.min.js", "js/app.js", "index.html", "css/style.css")
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 5, 11)}
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return server.brotli.decompress(body)
+    return zlib.decompress(body, wbits=31)
+
+
+def bodies(transactions: int):
+    doc = export_document(transactions, 0)
+    txs = doc["transactions"]
+    yield "/api/transactions", "dynamic", json.dumps(txs, ensure_ascii=False).encode("utf-8")
+    yield "/api/export", "dynamic", json.dumps(doc, ensure_ascii=False).encode("utf-8")
+    for name in STATIC_FILES:
+        path = ROOT / name
+        if path.exists():
+            yield name, "static", path.read_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encodings = ["gzip"] + (["br"] if server.brotli is not None else [])
+    rows = []
+    for name, kind, data in bodies(args.transactions):
+        rows.append((name, "identity", "", f"{len(data):,}", "100.0%", "", ""))
+        for encoding in encodings:
+            for level in LEVELS[encoding]:
+                saved = server.COMPRESS_LEVELS[kind][encoding]
+                server.COMPRESS_LEVELS[kind][encoding] = level
+                try:
+                    compress_ms, body = timed(lambda: server.compress_body(data, encoding, kind), args.repeat)
+                finally:
+                    server.COMPRESS_LEVELS[kind][encoding] = saved
+                decompress_ms, plain = timed(lambda: decompress(body, encoding), args.repeat)
+                assert plain == data
+                marker = "*" if level == saved else ""
+                rows.append(("", encoding, f"{level}{marker}", f"{len(body):,}", f"{len(body) / len(data):.1%}", f"{compress_ms:.2f}", f"{decompress_ms:.2f}"))
+    report(
+        f"median of {args.repeat}; * = level in COMPRESS_LEVELS" + ("" if "br" in encodings else "; brotli not installed"),
+        rows,
+        ("body", "encoding", "level", "bytes", "ratio", "compress ms", "decompress ms"),
+    )
+
+
+if __name__ == "__main__":
+    main()
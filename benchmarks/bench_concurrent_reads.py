@@ -0,0 +1,146 @@
+"""Drive concurrent GETs at the pooled HTTP server with shared readers and with one lock for everything.
+
+    python benchmarks/bench_concurrent_reads.py [--transactions N] [--clients 1,4,16] [--requests N]
+
+"one lock" forces every request onto the writer path, so requests take turns on the
+database as they did under the old process-wide lock; "shared" is the current
+connect(write=False) for GETs. Each mix runs idle and again with a writer that keeps
+holding a short write transaction. The response cache is switched off so every GET
+reaches SQLite. Clients are keep-alive connections issuing requests back to back.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+
+from bench_import import export_document
+from common import report, server, temp_database
+
+PATHS = [
+    "/api/analytics/cashflow?period=all",
+    "/api/analytics/cashflow?period=year&accountId=3",
+    "/api/transactions?limit=200",
+    "/api/transactions?accountId=7&limit=200",
+]
+
+
+def run_clients(port: int, clients: int, requests: int):
+    latencies = []
+    lock = threading.Lock()
+    errors = []
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        mine = []
+        try:
+            for i in range(requests):
+                started = time.perf_counter()
+                conn.request("GET", PATHS[(n + i) % len(PATHS)])
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors.append(resp.status)
+                mine.append((time.perf_counter() - started) * 1000)
+        finally:
+            conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f"non-200 replies: {sorted(set(errors))}")
+    return len(latencies) / elapsed, latencies
+
+
+def busy_writer(stop: threading.Event, hold: float):
+    """Keep taking the write lock, holding each transaction for `hold` seconds."""
+    while not stop.is_set():
+        conn = server.connect()
+        try:
+            conn.execute("UPDATE accounts SET updatedAt = ? WHERE id = 1", (server.now_iso(),))
+            time.sleep(hold)
+            conn.commit()
+        finally:
+            conn.close()
+        time.sleep(hold)
+
+
+def p95(samples):
+    return statistics.quantiles(samples, n=20)[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=50_000)
+    parser.add_argument("--clients", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=40, help="requests per client")
+    parser.add_argument("--hold", type=float, default=0.02, help="seconds the busy writer holds each transaction")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.clients.split(",")]
+
+    shared_connect = server.connect
+    modes = {
+        "shared": shared_connect,
+        "one lock": lambda write=True: shared_connect(write=True),
+    }
+
+    saved_cache = server.RESPONSE_CACHE
+    server.RESPONSE_CACHE = server.ResponseCache(0)
+    rows = []
+    try:
+        with temp_database():
+            conn = server.connect()
+            try:
+                server.bulk_import(conn, export_document(args.transactions, 0))
+                conn.commit()
+            finally:
+                conn.close()
+            workers = max(levels)
+            server.DB_POOL.resize(workers + server.DB_POOL_BACKGROUND)
+            httpd = server.PooledHTTPServer(("127.0.0.1", 0), server.KeepAliveHandler, workers=workers)
+            httpd.RequestHandlerClass.log_message = lambda *a: None
+            threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+            port = httpd.server_address[1]
+            try:
+                run_clients(port, 1, len(PATHS))  # warm the page cache
+                for writer in (False, True):
+                    for clients in levels:
+                        for name, fn in modes.items():
+                            server.connect = fn
+                            stop = threading.Event()
+                            w = threading.Thread(target=busy_writer, args=(stop, args.hold)) if writer else None
+                            if w:
+                                w.start()
+                            try:
+                                rps, lat = run_clients(port, clients, args.requests)
+                            finally:
+                                stop.set()
+                                if w:
+                                    w.join()
+                                server.connect = shared_connect
+                            rows.append([
+                                "busy" if writer else "idle", clients, name, f"{rps:.0f}",
+                                f"{statistics.median(lat):.1f}", f"{p95(lat):.1f}",
+                            ])
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+    finally:
+        server.connect = shared_connect
+        server.RESPONSE_CACHE = saved_cache
+
+    report(
+        f"Concurrent GETs, {args.transactions} transactions, {args.requests} requests per client",
+        rows, ["writer", "clients", "locking", "req/s", "p50 ms", "p95 ms"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Time /api/import's loaders: a full bulk_import replace, and merge_import with few or many changes.
+
+    python benchmarks/bench_import.py [--transactions N] [--prices N] [--repeat N]
+
+Each case runs against an in-process temporary database; JSON transfer and parsing,
+which the HTTP route adds on top, are not included.
+"""
+import argparse
+import random
+from datetime import date
+
+from common import report, server, temp_database, timed
+
+
+def export_document(transactions: int, prices: int, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    accounts = [
+        {"id": i, "name": f"Account {i}", "group": "cash", "balance": 1000.0, "includeInNetWorth": True, "updatedAt": "2026-01-01T00:00:00Z"}
+        for i in range(1, 21)
+    ]
+    investments = [
+        {"id": i, "type": "fund", "name": f"Fund {i}", "symbol": f"{i:06d}", "quantity": 100, "costPrice": 1, "currentPrice": 1, "updatedAt": "2026-01-01T00:00:00Z"}
+        for i in range(1, 51)
+    ]
+    txs = [
+        {
+            "id": i, "accountId": rng.randint(1, 20), "type": "expense", "previousBalance": 0, "newBalance": 0,
+            "amount": round(rng.uniform(1, 500), 2), "reason": "bench", "date": f"20{20 + i % 6}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "updatedAt": "2026-01-01T00:00:00Z",
+        }
+        for i in range(1, transactions + 1)
+    ]
+    per_fund = max(1, prices // len(investments))
+    history = []
+    for inv in investments:
+        for day in range(per_fund):
+            history.append({
+                "id": len(history) + 1, "investmentId": inv["id"], "date": date.fromordinal(738000 + day).isoformat(),
+                "price": round(1 + rng.random(), 4), "updatedAt": "2026-01-01T00:00:00Z",
+            })
+    return {"accounts": accounts, "transactions": txs, "investments": investments, "priceHistory": history, "settings": {"language": "zh"}}
+
+
+def changed(doc: dict, fraction: float, seed: int = 2) -> dict:
+    """A copy of `doc` with `fraction` of transactions and prices edited (and re-stamped)."""
+    rng = random.Random(seed)
+    out = dict(doc)
+    for table, field in (("transactions", "amount"), ("priceHistory", "price")):
+        rows = [dict(r) for r in doc[table]]
+        for r in rng.sample(rows, int(len(rows) * fraction)):
+            r[field] = round(r[field] + 1, 4)
+            r["updatedAt"] = "2026-02-01T00:00:00Z"
+        out[table] = rows
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--prices", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    doc = export_document(args.transactions, args.prices)
+    rows = []
+    with temp_database():
+        def run(label, fn, reset=False):
+            conn = server.connect()
+            try:
+                setup = (lambda: server.bulk_import(conn, doc)) if reset else None
+                ms, result = timed(lambda: fn(conn), args.repeat, setup)
+            finally:
+                conn.close()
+            counts = result["counts"]
+            touched = sum(c.get("inserted", 0) + c.get("updated", 0) + c.get("deleted", 0) if isinstance(c, dict) else c for c in counts.values())
+            rows.append((label, touched, f"{ms:,.0f}"))
+
+        run("bulk replace", lambda conn: server.bulk_import(conn, doc))
+        run("merge, unchanged", lambda conn: server.merge_import(conn, doc))
+        for fraction in (0.01, 0.5):
+            edited = changed(doc, fraction)
+            # Reset to `doc` (untimed) before each merge so every run applies the same edits.
+            run(f"merge, {fraction:.0%} edited", lambda conn, edited=edited: server.merge_import(conn, edited), reset=True)
+
+    report(f"{args.transactions:,} transactions, {len(doc['priceHistory']):,} price points (median of {args.repeat})", rows, ("case", "rows written", "ms"))
+
+
+if __name__ == "__main__":
+    main()
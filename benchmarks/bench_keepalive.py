@@ -0,0 +1,98 @@
+"""Compare the HTTP/1.0 thread-per-connection server with the pooled keep-alive server.
+
+    python benchmarks/bench_keepalive.py [--clients 1,6,32] [--requests N]
+
+"thread per connection" is ThreadingHTTPServer with Handler, which is what
+PERCENTO_WORKERS=0 runs, and every request opens a new connection. "pooled
+keep-alive" is PooledHTTPServer with KeepAliveHandler and the default worker count,
+and each client reuses one connection. Clients fetch the small API routes and static
+files a page load makes.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+from common import report, server, temp_database
+
+PATHS = ["/api/accounts", "/api/investments", "/api/settings", "/api/health", "/js/app.js", "/css/style.css"]
+
+
+def run_clients(port: int, clients: int, requests: int, keep_alive: bool):
+    latencies = []
+    lock = threading.Lock()
+    errors = []
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        mine = []
+        try:
+            for i in range(requests):
+                started = time.perf_counter()
+                conn.request("GET", PATHS[(n + i) % len(PATHS)])
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors.append(resp.status)
+                if not keep_alive:
+                    conn.close()
+                mine.append((time.perf_counter() - started) * 1000)
+        finally:
+            conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f"non-200 replies: {sorted(set(errors))}")
+    return elapsed, latencies
+
+
+def serve(httpd):
+    threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return httpd.server_address[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", default="1,6,32")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.clients.split(",")]
+
+    server.Handler.log_message = lambda *a: None
+    servers = {
+        "thread per connection": (lambda: ThreadingHTTPServer(("127.0.0.1", 0), server.Handler), False),
+        "pooled keep-alive": (lambda: server.PooledHTTPServer(("127.0.0.1", 0), server.KeepAliveHandler), True),
+    }
+    rows = []
+    with temp_database():
+        for name, (make, keep_alive) in servers.items():
+            httpd = make()
+            port = serve(httpd)
+            try:
+                run_clients(port, 1, len(PATHS), keep_alive)  # warm caches
+                for clients in levels:
+                    elapsed, lat = run_clients(port, clients, args.requests, keep_alive)
+                    rows.append((
+                        clients, name, f"{elapsed:.2f}", f"{len(lat) / elapsed:,.0f}",
+                        f"{statistics.median(lat):.2f}", f"{statistics.quantiles(lat, n=20)[-1]:.2f}",
+                    ))
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+    rows.sort(key=lambda r: r[0])
+
+    report(f"{args.requests} GETs per client", rows, ("clients", "server", "total s", "req/s", "p50 ms", "p95 ms"))
+
+
+if __name__ == "__main__":
+    main()
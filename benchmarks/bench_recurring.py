@@ -0,0 +1,99 @@
+"""Time recurring catch-up: run_due_recurring against one execute_recurring_rule call per occurrence.
+
+    python benchmarks/bench_recurring.py [--rules N] [--days N] [--repeat N]
+
+Rules are a seeded mix of daily/weekly/monthly income, transfers and DCA buys, all
+`--days` days overdue. The per-occurrence path is what runDue did before the writes
+were batched; both produce the same rows.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from common import report, server, temp_database, timed
+
+TODAY = date(2026, 1, 1)
+
+
+def reset(conn, rules: int, days: int):
+    for table in ("transactions", "recurringRules", "priceHistory", "investments", "accounts"):
+        conn.execute(f"DELETE FROM {table}")
+    ts = server.now_iso()
+    conn.executemany(
+        "INSERT INTO accounts (id, name, \"group\", balance, createdAt, updatedAt) VALUES (?, ?, 'cash', 1e9, ?, ?)",
+        [(i, f"Account {i}", ts, ts) for i in range(1, 11)],
+    )
+    conn.executemany(
+        "INSERT INTO investments (id, type, name, symbol, quantity, costPrice, currentPrice, createdAt, updatedAt) VALUES (?, 'fund', ?, ?, 0, 0, 1.5, ?, ?)",
+        [(i, f"Fund {i}", f"{i:06d}", ts, ts) for i in range(1, 11)],
+    )
+    rng = random.Random(1)
+    start = (TODAY - timedelta(days=days)).isoformat()
+    rows = []
+    for i in range(1, rules + 1):
+        action = ("income", "transfer", "dca")[i % 3]
+        kind = "investment" if action == "dca" else "account"
+        frequency = rng.choice(("daily", "daily", "weekly", "monthly"))
+        from_id, to_id = rng.sample(range(1, 11), 2)
+        rows.append((
+            i, kind, action, from_id, from_id if action == "transfer" else None, to_id if action == "transfer" else None,
+            rng.randint(1, 10) if action == "dca" else None, frequency, 1, rng.randint(1, 31), rng.randint(1, 365),
+            round(rng.uniform(10, 500), 2), start, ts, ts,
+        ))
+    conn.executemany(
+        """
+        INSERT INTO recurringRules
+        (id, kind, action, accountId, fromAccountId, toAccountId, investmentId, frequency, weekday, monthDay, yearDay, amount, enabled, nextRun, createdAt, updatedAt)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
+        """,
+        rows,
+    )
+    conn.commit()
+
+
+def per_occurrence(conn):
+    today = TODAY.isoformat()
+    executed = 0
+    for row in conn.execute("SELECT * FROM recurringRules WHERE enabled = 1 ORDER BY id ASC").fetchall():
+        rule = server.row_to_dict(row)
+        next_run, last_run, guard = rule["nextRun"], None, 0
+        while next_run and next_run <= today and guard < server.RECURRING_CATCH_UP_MAX:
+            if not server.execute_recurring_rule(conn, rule, next_run):
+                break
+            executed += 1
+            last_run, next_run = next_run, server.compute_next_run(rule, next_run)
+            guard += 1
+        if last_run is not None:
+            conn.execute("UPDATE recurringRules SET lastRun = ?, nextRun = ? WHERE id = ?", (last_run, next_run, rule["id"]))
+    conn.commit()
+    return executed
+
+
+def batched(conn):
+    result = server.run_due_recurring(conn, TODAY)
+    conn.commit()
+    return result["executed"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=70)
+    parser.add_argument("--days", type=int, default=330)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    with temp_database():
+        conn = server.connect()
+        try:
+            for label, fn in (("per occurrence", per_occurrence), ("run_due_recurring", batched)):
+                ms, executed = timed(lambda: fn(conn), args.repeat, lambda: reset(conn, args.rules, args.days))
+                transactions = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+                rows.append((label, executed, transactions, f"{ms:,.0f}"))
+        finally:
+            conn.close()
+    report(f"{args.rules} rules, {args.days} days overdue (median of {args.repeat})", rows, ("path", "occurrences", "transactions", "ms"))
+
+
+if __name__ == "__main__":
+    main()
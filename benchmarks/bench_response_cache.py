@@ -0,0 +1,75 @@
+"""Time repeated GETs through the test server with RESPONSE_CACHE on and off.
+
+    python benchmarks/bench_response_cache.py [--transactions N] [--requests N]
+
+Each route is requested back to back, one connection per request; "off" is
+ResponseCache(0), which stores nothing.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+from bench_import import export_document
+from common import report, server, temp_database
+
+ROUTES = ["/api/transactions?limit={n}", "/api/accounts", "/api/investments"]
+
+
+def get_ms(port: int, path: str) -> float:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        started = time.perf_counter()
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        resp.read()
+        elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        conn.close()
+    if resp.status != 200:
+        raise RuntimeError(f"{path}: HTTP {resp.status}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    saved_cache = server.RESPONSE_CACHE
+    rows = []
+    try:
+        with temp_database():
+            conn = server.connect()
+            try:
+                server.bulk_import(conn, export_document(args.transactions, 0))
+                conn.commit()
+            finally:
+                conn.close()
+            server.Handler.log_message = lambda *a: None
+            httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.Handler)
+            threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+            port = httpd.server_address[1]
+            try:
+                for route in ROUTES:
+                    path = route.format(n=args.transactions)
+                    medians = []
+                    for max_bytes in (0, saved_cache.max_bytes or server.RESPONSE_CACHE_MB_DEFAULT * 1024 * 1024):
+                        server.RESPONSE_CACHE = server.ResponseCache(max_bytes)
+                        get_ms(port, path)  # fill the cache (or warm the page cache when off)
+                        medians.append(statistics.median(get_ms(port, path) for _ in range(args.requests)))
+                    rows.append((path, f"{medians[0]:.2f}", f"{medians[1]:.2f}"))
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+    finally:
+        server.RESPONSE_CACHE = saved_cache
+
+    report(f"GET median ms over {args.requests} requests, {args.transactions:,} transactions", rows, ("route", "cache off", "cache on"))
+
+
+if __name__ == "__main__":
+    main()
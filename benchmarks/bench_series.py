@@ -0,0 +1,106 @@
+"""Time price-history lookups with and without the in-memory PriceIndex, and LTTB downsampling.
+
+    python benchmarks/bench_series.py [--investments N] [--days N] [--snapshots N] [--repeat N]
+
+Price lookups run the same queries through PriceIndex(enabled=True) and (enabled=False);
+"cold" includes loading every series into the index. The snapshot rows time
+snapshot_series at the default point budget against returning every point.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from common import report, server, temp_database, timed
+
+END = date(2026, 1, 1)
+
+
+def seed(conn, investments: int, days: int, snapshots: int, rng: random.Random):
+    ts = server.now_iso()
+    conn.executemany(
+        "INSERT INTO investments (id, type, name, symbol, quantity, costPrice, currentPrice, createdAt, updatedAt) VALUES (?, 'fund', ?, ?, 1, 1, 1, ?, ?)",
+        [(i, f"Fund {i}", f"{i:06d}", ts, ts) for i in range(1, investments + 1)],
+    )
+    rows = []
+    for inv_id in range(1, investments + 1):
+        price = 1.0
+        for d in range(days):
+            price *= 1 + rng.gauss(0, 0.01)
+            rows.append((inv_id, (END - timedelta(days=days - d)).isoformat(), round(price, 4), ts))
+    conn.executemany("INSERT INTO priceHistory (investmentId, date, price, createdAt) VALUES (?, ?, ?, ?)", rows)
+    value = 100_000.0
+    snaps = []
+    for d in range(snapshots):
+        value += rng.gauss(0, 500)
+        snaps.append(((END - timedelta(days=snapshots - d)).isoformat(), {"netWorth": value}))
+    for day, values in snaps:
+        server.upsert_snapshot(conn, day, values, ts)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--investments", type=int, default=50)
+    parser.add_argument("--days", type=int, default=2000)
+    parser.add_argument("--snapshots", type=int, default=3650)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    ids = list(range(1, args.investments + 1))
+    probe_days = [(END - timedelta(days=rng.randint(1, args.days))).isoformat() for _ in range(20)]
+    window = ((END - timedelta(days=90)).isoformat(), END.isoformat())
+    month_ends = [(END - timedelta(days=30 * k)).isoformat() for k in range(args.days // 30)]
+
+    cases = {
+        "range, full history": lambda index, conn: [index.range(conn, i) for i in ids],
+        "range, last 90 days": lambda index, conn: [index.range(conn, i, *window) for i in ids],
+        "point, 20 days each": lambda index, conn: [index.point(conn, i, d) for i in ids for d in probe_days],
+        "latest": lambda index, conn: [index.latest(conn, i) for i in ids],
+        "as-of, month ends": None,
+    }
+
+    rows = []
+    with temp_database():
+        conn = server.connect()
+        try:
+            seed(conn, args.investments, args.days, args.snapshots, rng)
+            saved = server.PRICE_INDEX
+            try:
+                for label, fn in cases.items():
+                    timings = []
+                    for enabled, cold in ((False, False), (True, True), (True, False)):
+                        index = server.PriceIndex(enabled=enabled)
+                        if fn is None:
+                            server.PRICE_INDEX = index
+                            run = lambda: server.prices_as_of(conn, ids, month_ends)  # noqa: E731
+                        else:
+                            run = lambda: fn(index, conn)  # noqa: E731
+                        if enabled and not cold:
+                            run()
+                        ms, _ = timed(run, args.repeat, index.invalidate if cold else None)
+                        timings.append(f"{ms:,.1f}")
+                    rows.append((label, *timings))
+            finally:
+                server.PRICE_INDEX = saved
+            report(
+                f"{args.investments} investments x {args.days:,} days (median ms of {args.repeat})",
+                rows,
+                ("query", "SQL", "index, cold", "index, warm"),
+            )
+
+            rows = []
+            for budget in (server.SERIES_MAX_POINTS_DEFAULT, args.snapshots):
+                ms, result = timed(lambda: server.snapshot_series(conn, "netWorth", max_points=budget), args.repeat)
+                rows.append((budget, len(result["points"]), f"{ms:,.1f}"))
+            xs = [float(i) for i in range(100_000)]
+            ys = [rng.random() for _ in xs]
+            ms, kept = timed(lambda: server.lttb_indices(xs, ys, server.SERIES_MAX_POINTS_DEFAULT), args.repeat)
+            rows.append(("lttb_indices only, 100k in", len(kept), f"{ms:,.1f}"))
+            report(f"snapshot_series over {args.snapshots:,} snapshots (median ms of {args.repeat})", rows, ("max points", "returned", "ms"))
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
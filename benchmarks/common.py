@@ -0,0 +1,56 @@
+"""Shared setup for the benchmark scripts: a throwaway database and a timer.
+
+Run the scripts from the repository root, e.g. ``python benchmarks/bench_import.py``.
+"""
+import contextlib
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+@contextlib.contextmanager
+def temp_database():
+    """Point the server module at a fresh, migrated database file for the duration."""
+    saved = server.DB_PATH, server.RECURRING_SCHEDULER
+    with tempfile.TemporaryDirectory() as tmp:
+        server.DB_POOL.drain()
+        server.DB_PATH = Path(tmp) / "bench.db"
+        server.RECURRING_SCHEDULER = None
+        server.init_db()
+        try:
+            yield server.DB_PATH
+        finally:
+            server.DB_POOL.drain()
+            server.DB_PATH, server.RECURRING_SCHEDULER = saved
+
+
+def timed(fn, repeat=5, setup=None):
+    """Median wall time of `fn()` in milliseconds over `repeat` runs, and its last result.
+
+    `setup`, if given, runs untimed before each run.
+    """
+    samples = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def report(title, rows, headers):
+    """Print rows as a plain aligned table."""
+    cells = [headers] + [[str(c) for c in row] for row in rows]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(headers))]
+    print(title)
+    for row in cells:
+        print("  " + "  ".join(c.rjust(w) for c, w in zip(row, widths)))
+    print()
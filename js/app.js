@@ -488,8 +488,10 @@ const Charts = {
         this.charts.dashboard.update('none');
     },
     async getNetWorthData(period = 'month') {
-        const snapshots = await DB.getAllSnapshots();
         const { startDate, endDate, labelFormat } = this.getPeriodRange(period);
+        const snapshots = DB.mode === 'api'
+            ? await DB.getNetWorthSeries(startDate.toISOString().split('T')[0], endDate.toISOString().split('T')[0])
+            : await DB.getAllSnapshots();
 
         const filteredSnapshots = snapshots.filter(s => {
             const date = new Date(s.date);
@@ -568,8 +570,27 @@ const Charts = {
         };
     },
     async getFinancialChangesData(period = 'month') {
-        const transactions = await DB.getAllTransactions();
         const { startDate, endDate } = this.getPeriodRange(period);
+        const startStr = startDate.toISOString().split('T')[0];
+        const endStr = endDate.toISOString().split('T')[0];
+
+        if (DB.mode === 'api') {
+            const rollup = await DB.getCashflow(period, startStr, endStr);
+            if (!rollup || !rollup.keys || rollup.keys.length === 0) {
+                return {
+                    labels: [i18n.currentLang === 'zh' ? '暂无数据' : 'No data'],
+                    income: [0],
+                    expense: [0]
+                };
+            }
+            return {
+                labels: rollup.keys.map(k => this.formatGroupKeyLabel(k, period)),
+                income: rollup.income,
+                expense: rollup.expense
+            };
+        }
+
+        const transactions = await DB.getTransactionsByDateRange(startStr, endStr);
 
         const filteredTransactions = transactions.filter(t => {
             const date = new Date(t.date);
@@ -785,9 +806,12 @@ const Recurring = {
             }
         });
 
-        setInterval(() => {
-            this.runDue().catch(() => { });
-        }, 5 * 60 * 1000);
+        // 本地服务会在规则到期时自动执行，无需轮询
+        if (!(DB.mode === 'api' && DB.serverScheduler)) {
+            setInterval(() => {
+                this.runDue().catch(() => { });
+            }, 5 * 60 * 1000);
+        }
 
         document.addEventListener('visibilitychange', () => {
             if (!document.hidden) {
@@ -1185,6 +1209,18 @@ const Recurring = {
     },
 
     async runDue() {
+        // 服务端调度器运行时由服务端执行（按当前语言写入说明），否则仍在页面中逐条执行
+        if (DB.mode === 'api' && DB.serverScheduler) {
+            const res = await DB.runRecurringDue();
+            if (res && res.executed > 0) {
+                await DB.recordDailySnapshot();
+                if (window.App && typeof App.refreshAll === 'function') {
+                    await App.refreshAll();
+                }
+            }
+            return;
+        }
+
         const today = new Date();
         today.setHours(0, 0, 0, 0);
         const todayStr = this.toDateStr(today);
@@ -561,7 +561,7 @@ const DataManager = {
             const result = await response.json();
 
             if (result.ok && result.data) {
-                await DB.importData(result.data);
+                await DB.importData(result.data, { mode: 'merge' });
                 App.hideLoading();
                 App.showToast(i18n.currentLang === 'zh' ? '数据恢复成功' : 'Data restored');
                 await App.refreshAll();
@@ -9,6 +9,7 @@ const DB = {
     db: null,
     mode: 'indexeddb',
     apiBaseUrl: '',
+    serverScheduler: false, // 本地服务是否在后台自动执行定期规则
 
     // 对象存储名称
     stores: {
@@ -132,6 +133,7 @@ const DB = {
     async _probeApi() {
         try {
             const res = await this._fetchJson('/api/health', { method: 'GET' }, 800);
+            this.serverScheduler = !!(res && res.recurringScheduler);
             return !!(res && res.ok);
         } catch (e) {
             return false;
@@ -171,6 +173,29 @@ const DB = {
         }
     },
 
+    /**
+     * 批量执行 API 操作：一次请求、一个事务，任一操作失败则全部回滚
+     * @param {Array<{method: string, path: string, body?: Object}>} operations
+     * @returns {Promise<{ok: boolean, results: Array, failedIndex?: number}>}
+     */
+    async batch(operations) {
+        if (this.mode !== 'api') {
+            throw new Error('Batch requests are only available in API mode');
+        }
+        const res = await this._fetchJson('/api/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ operations })
+        }, 30000);
+        if (!res || !res.ok) {
+            const failed = res?.results?.[res.failedIndex];
+            const err = new Error(failed?.body?.error || 'batch_failed');
+            err.result = res;
+            throw err;
+        }
+        return res;
+    },
+
     /**
      * 获取对象存储
      * @param {string} storeName 
@@ -419,6 +444,13 @@ const DB = {
      * @returns {Promise<Array>}
      */
     async getTransactionsByDateRange(startDate, endDate) {
+        if (this.mode === 'api') {
+            const qs = new URLSearchParams();
+            if (startDate) qs.set('startDate', startDate);
+            if (endDate) qs.set('endDate', endDate);
+            const res = await this._fetchJson(`/api/transactions?${qs.toString()}`, { method: 'GET' });
+            return res || [];
+        }
         const allTransactions = await this.getAllTransactions();
         return allTransactions.filter(t => {
             const date = new Date(t.date);
@@ -426,6 +458,61 @@ const DB = {
         });
     },
 
+    /**
+     * 获取按日/周/月汇总的收支数据（仅 API 模式，由服务端 SQL 分组计算）
+     * @param {string} period week | month | quarter | year | all
+     * @param {string} startDate 
+     * @param {string} endDate 
+     * @param {number} accountId 可选
+     * @returns {Promise<{bucket: string, keys: Array, income: Array, expense: Array}>}
+     */
+    async getCashflow(period, startDate, endDate, accountId = null) {
+        const qs = new URLSearchParams();
+        qs.set('period', period);
+        if (startDate) qs.set('start', startDate);
+        if (endDate) qs.set('end', endDate);
+        if (accountId) qs.set('accountId', accountId);
+        return await this._fetchJson(`/api/analytics/cashflow?${qs.toString()}`, { method: 'GET' });
+    },
+
+    /**
+     * 分页获取交易记录（按日期、ID 倒序）
+     * @param {Object} options { accountId, startDate, endDate, type, limit, before, after }
+     * @returns {Promise<{items: Array, nextCursor: string|null, prevCursor: string|null}>}
+     */
+    async getTransactionsPage({ accountId, startDate, endDate, type, limit = 100, before, after } = {}) {
+        if (this.mode === 'api') {
+            const qs = new URLSearchParams();
+            if (accountId) qs.set('accountId', accountId);
+            if (startDate) qs.set('startDate', startDate);
+            if (endDate) qs.set('endDate', endDate);
+            if (type) qs.set('type', type);
+            qs.set('limit', limit);
+            if (before) qs.set('before', before);
+            if (after) qs.set('after', after);
+            const res = await this._fetchJson(`/api/transactions?${qs.toString()}`, { method: 'GET' });
+            return res || { items: [], nextCursor: null, prevCursor: null };
+        }
+        let results = accountId
+            ? await this.getTransactionsByAccount(accountId)
+            : await this.getAllTransactions();
+        if (startDate || endDate) {
+            results = results.filter(t => {
+                const d = String(t.date || '').substring(0, 10);
+                return (!startDate || d >= startDate) && (!endDate || d <= endDate);
+            });
+        }
+        if (type) results = results.filter(t => t.type === type);
+        const offset = Number(before || after) || 0;
+        const items = results.slice(offset, offset + limit);
+        const next = offset + limit;
+        return {
+            items,
+            nextCursor: next < results.length ? String(next) : null,
+            prevCursor: offset > 0 ? String(Math.max(0, offset - limit)) : null
+        };
+    },
+
     // ==================== 投资操作 ====================
 
     /**
@@ -701,6 +788,21 @@ const DB = {
         });
     },
 
+    /**
+     * 由服务端补执行所有到期的定期规则（仅 API 模式）
+     * @returns {Promise<{processed: number, executed: number}>}
+     */
+    async runRecurringDue() {
+        if (this.mode !== 'api') {
+            throw new Error('Server-side recurring runs are only available in API mode');
+        }
+        return await this._fetchJson('/api/recurring/runDue', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ lang: i18n.currentLang })
+        }, 30000);
+    },
+
     async getRecurringRules({ kind, accountId, investmentId } = {}) {
         if (this.mode === 'api') {
             const params = new URLSearchParams();
@@ -847,6 +949,22 @@ const DB = {
         });
     },
 
+    /**
+     * 获取净资产曲线（服务端按 maxPoints 保形降采样，仅 API 模式）
+     * @param {string} startDate 
+     * @param {string} endDate 
+     * @param {number} maxPoints 
+     * @returns {Promise<Array<{date: string, netWorth: number}>>}
+     */
+    async getNetWorthSeries(startDate, endDate, maxPoints = 500) {
+        const qs = new URLSearchParams();
+        if (startDate) qs.set('start', startDate);
+        if (endDate) qs.set('end', endDate);
+        qs.set('maxPoints', maxPoints);
+        const res = await this._fetchJson(`/api/snapshots/series?${qs.toString()}`, { method: 'GET' });
+        return (res?.points || []).map(p => ({ date: p.date, netWorth: p.value }));
+    },
+
     /**
      * 获取最新快照
      * @returns {Promise<Object|null>}
@@ -926,6 +1044,39 @@ const DB = {
         });
     },
 
+    /**
+     * 批量写入价格：更新投资当前价格并写入（覆盖）当日价格历史，单次请求、单个事务
+     * @param {Array<{investmentId: number, date: string, price: number, type?: string, symbol?: string}>} prices
+     * @returns {Promise<Object>}
+     */
+    async bulkUpdatePrices(prices) {
+        if (this.mode !== 'api') {
+            throw new Error('Bulk price updates are only available in API mode');
+        }
+        return await this._fetchJson('/api/prices/bulk', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ prices })
+        }, 30000);
+    },
+
+    /**
+     * 由服务端并发抓取行情并写入价格（仅 API 模式）
+     * @param {Array<number>|null} investmentIds 为空时刷新全部投资
+     * @returns {Promise<{requested: number, updated: number, history: number, failed: Array}>}
+     */
+    async refreshQuotes(investmentIds = null) {
+        if (this.mode !== 'api') {
+            throw new Error('Server-side quote refresh is only available in API mode');
+        }
+        const body = Array.isArray(investmentIds) ? { ids: investmentIds } : {};
+        return await this._fetchJson('/api/quotes/refresh', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        }, 60000);
+    },
+
     /**
      * 获取投资的价格历史记录
      * @param {number} investmentId 
@@ -966,6 +1117,67 @@ const DB = {
         });
     },
 
+    /**
+     * 获取投资的价格序列（仅日期与价格，用于图表和历史列表）
+     * @param {number} investmentId 
+     * @param {string} startDate 
+     * @param {string} endDate 
+     * @returns {Promise<Array<{date: string, price: number}>>} 按日期升序
+     */
+    async getPriceSeries(investmentId, startDate = null, endDate = null) {
+        if (this.mode === 'api') {
+            const qs = new URLSearchParams();
+            qs.set('investmentId', investmentId);
+            qs.set('format', 'series');
+            if (startDate) qs.set('startDate', startDate);
+            if (endDate) qs.set('endDate', endDate);
+            const res = await this._fetchJson(`/api/priceHistory?${qs.toString()}`, { method: 'GET' });
+            const dates = res?.dates || [];
+            const prices = res?.prices || [];
+            return dates.map((date, i) => ({ date, price: prices[i] }));
+        }
+        const history = await this.getPriceHistoryByInvestment(investmentId, startDate, endDate);
+        return history.map(h => ({ date: h.date, price: h.price }));
+    },
+
+    /**
+     * 批量查询多个投资在多个日期的最近价格（当日或之前最后一次记录，仅 API 模式）
+     * @param {Array<number>} investmentIds 
+     * @param {Array<string>} dates 
+     * @returns {Promise<Object<string, {prices: Array<number|null>, priceDates: Array<string|null>}>>} 与 dates 顺序一致
+     */
+    async getPricesAsOf(investmentIds, dates) {
+        if (this.mode !== 'api') {
+            throw new Error('As-of price lookups are only available in API mode');
+        }
+        const res = await this._fetchJson('/api/priceHistory/asof', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ investmentIds, dates })
+        }, 30000);
+        return res?.series || {};
+    },
+
+    /**
+     * 批量获取投资卡片迷你走势（一次请求返回所有投资最近 days 天的价格，仅 API 模式）
+     * @param {number} days 
+     * @param {Array<number>} investmentIds 为空时返回全部投资
+     * @returns {Promise<Object<string, Array<number>>>} investmentId -> 按日期升序的价格
+     */
+    async getPriceSparklines(days = 30, investmentIds = null) {
+        const qs = new URLSearchParams();
+        qs.set('days', days);
+        if (Array.isArray(investmentIds) && investmentIds.length > 0) {
+            qs.set('ids', investmentIds.join(','));
+        }
+        const res = await this._fetchJson(`/api/priceHistory/sparklines?${qs.toString()}`, { method: 'GET' });
+        const result = {};
+        Object.entries(res?.series || {}).forEach(([id, s]) => {
+            result[id] = s.prices || [];
+        });
+        return result;
+    },
+
     /**
      * 获取特定日期的价格历史记录
      * @param {number} investmentId 
@@ -1086,16 +1298,17 @@ const DB = {
     /**
      * 导入数据
      * @param {Object} data 
+     * @param {Object} options { mode: 'replace' | 'merge' }，merge 仅写入有变化的记录（API 模式）
      * @returns {Promise}
      */
-    async importData(data) {
+    async importData(data, { mode = 'replace' } = {}) {
         if (this.mode === 'api') {
-            await this._fetchJson('/api/import', {
+            const qs = mode === 'merge' ? '?mode=merge' : '';
+            return await this._fetchJson(`/api/import${qs}`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(data || {})
             });
-            return;
         }
         // 清空现有数据
         await this.clearAllData();
@@ -1168,6 +1381,21 @@ const DB = {
             const investments = await this.getAllInvestments();
             const missingPurchaseDate = investments.filter(inv => !inv.purchaseDate);
 
+            if (this.mode === 'api') {
+                if (missingPurchaseDate.length === 0) return;
+                await this.batch(missingPurchaseDate.map(inv => ({
+                    method: 'PUT',
+                    path: `/api/investments/${encodeURIComponent(inv.id)}`,
+                    body: {
+                        ...inv,
+                        purchaseDate: inv.createdAt
+                            ? String(inv.createdAt).split('T')[0]
+                            : new Date().toISOString().split('T')[0]
+                    }
+                })));
+                return;
+            }
+
             for (const inv of missingPurchaseDate) {
                 const purchaseDate = inv.createdAt
                     ? String(inv.createdAt).split('T')[0]
@@ -1190,6 +1418,9 @@ const DB = {
      * @returns {Promise<Object>}
      */
     async calculateStats() {
+        if (this.mode === 'api') {
+            return await this._fetchJson('/api/stats', { method: 'GET' });
+        }
         const accounts = await this.getAllAccounts();
         const investments = await this.getAllInvestments();
 
@@ -1247,21 +1478,21 @@ const DB = {
      * @returns {Promise}
      */
     async recordDailySnapshot() {
-        const today = new Date().toISOString().split('T')[0];
-        const stats = await this.calculateStats();
-
         if (this.mode === 'api') {
-            await this._fetchJson('/api/snapshots', {
+            // 服务端直接用 SQL 汇总并写入快照（同时补齐缺失的日期）。
+            // 不传日期：由服务端按其本地日期决定，与定时任务、as-of 查询保持一致。
+            await this._fetchJson('/api/snapshots/record', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    date: today,
-                    ...stats
-                })
+                body: JSON.stringify({})
             });
             return;
         }
 
+        const today = new Date().toISOString().split('T')[0];
+
+        const stats = await this.calculateStats();
+
         // 检查今天是否已有快照
         const snapshots = await this.getAllSnapshots();
         const todaySnapshot = snapshots.find(s => s.date === today);
@@ -149,7 +149,17 @@ const Investments = {
             return;
         }
 
-        const cardsHtml = await Promise.all(investments.map(inv => this.renderInvestmentCard(inv)));
+        // API 模式下一次请求取回所有卡片的走势数据
+        let sparklines = null;
+        if (DB.mode === 'api') {
+            try {
+                sparklines = await DB.getPriceSparklines(30, investments.map(inv => inv.id));
+            } catch (error) {
+                console.error('Error loading sparklines:', error);
+            }
+        }
+
+        const cardsHtml = await Promise.all(investments.map(inv => this.renderInvestmentCard(inv, sparklines ? (sparklines[inv.id] || []) : null)));
         container.innerHTML = cardsHtml.join('');
 
         // 绑定卡片事件
@@ -187,9 +197,10 @@ const Investments = {
     /**
      * 渲染投资卡片
      * @param {Object} inv 
+     * @param {Array<number>|null} sparkline 预取的走势价格，为 null 时单独查询
      * @returns {string}
      */
-    async renderInvestmentCard(inv) {
+    async renderInvestmentCard(inv, sparkline = null) {
         const marketValue = inv.quantity * inv.currentPrice;
         const cost = inv.quantity * inv.costPrice;
         const profit = marketValue - cost;
@@ -214,7 +225,7 @@ const Investments = {
         const priceLabelText = isWealth ? (i18n.currentLang === 'zh' ? '累计收益' : 'Interest') : (i18n.currentLang === 'zh' ? '当前价' : 'Current');
 
         // 生成迷你折线图
-        const trendHtml = await this.generateMiniTrendChart(inv.id, inv.type, inv.symbol);
+        const trendHtml = await this.generateMiniTrendChart(inv.id, inv.type, inv.symbol, sparkline);
 
         return `
             <div class="investment-card" data-id="${inv.id}">
@@ -259,36 +270,42 @@ const Investments = {
      * @param {number} investmentId 
      * @param {string} type 
      * @param {string} symbol 
+     * @param {Array<number>|null} prefetched 已按日期升序的价格（来自批量接口）
      * @returns {string}
      */
-    async generateMiniTrendChart(investmentId, type, symbol) {
+    async generateMiniTrendChart(investmentId, type, symbol, prefetched = null) {
         try {
-            const investment = await DB.getInvestment(investmentId);
-            if (!investment) {
-                return this.getEmptyTrendSvg(investmentId, symbol);
-            }
+            let series;
+            if (Array.isArray(prefetched)) {
+                series = prefetched.map(v => Number(v)).filter(v => Number.isFinite(v));
+            } else {
+                const investment = await DB.getInvestment(investmentId);
+                if (!investment) {
+                    return this.getEmptyTrendSvg(investmentId, symbol);
+                }
 
-            // 获取最近30天的价格历史
-            const endDate = new Date();
-            const startDate = new Date();
-            startDate.setDate(startDate.getDate() - 30);
+                // 获取最近30天的价格历史
+                const endDate = new Date();
+                const startDate = new Date();
+                startDate.setDate(startDate.getDate() - 30);
 
-            const history = await DB.getPriceHistoryByInvestment(
-                investmentId,
-                startDate.toISOString().split('T')[0],
-                endDate.toISOString().split('T')[0]
-            );
+                const history = await DB.getPriceSeries(
+                    investmentId,
+                    startDate.toISOString().split('T')[0],
+                    endDate.toISOString().split('T')[0]
+                );
 
-            if (history.length < 2) {
-                return this.getEmptyTrendSvg(investmentId, symbol);
-            }
+                if (history.length < 2) {
+                    return this.getEmptyTrendSvg(investmentId, symbol);
+                }
 
-            const series = history
-                .slice()
-                .sort((a, b) => String(a.date || '').localeCompare(String(b.date || '')))
-                .slice(-30)
-                .map(h => Number(h.price))
-                .filter(v => Number.isFinite(v));
+                series = history
+                    .slice()
+                    .sort((a, b) => String(a.date || '').localeCompare(String(b.date || '')))
+                    .slice(-30)
+                    .map(h => Number(h.price))
+                    .filter(v => Number.isFinite(v));
+            }
 
             if (series.length < 2) {
                 return this.getEmptyTrendSvg(investmentId, symbol);
@@ -384,6 +401,109 @@ const Investments = {
         }
     },
 
+    /**
+     * 保存一轮刷新得到的价格（API 模式下一次请求完成）
+     * @param {Array<{inv: Object, price: number}>} updates 
+     * @param {string} date 
+     */
+    async savePriceUpdates(updates, date) {
+        if (updates.length === 0) return;
+
+        if (DB.mode === 'api') {
+            await DB.bulkUpdatePrices(updates.map(({ inv, price }) => ({
+                investmentId: inv.id,
+                date,
+                price,
+                type: inv.type,
+                symbol: inv.symbol
+            })));
+            updates.forEach(({ inv, price }) => { inv.currentPrice = price; });
+            return;
+        }
+
+        for (const { inv, price } of updates) {
+            inv.currentPrice = price;
+            await DB.updateInvestment(inv);
+            await this.updatePriceHistory(inv, price);
+        }
+    },
+
+    /**
+     * 刷新股票/基金/加密货币的行情价格，返回更新条数
+     * API 模式由服务端并发抓取并一次性写入；浏览器模式逐个抓取后保存
+     * @param {Array} investments 
+     * @param {string} date 
+     * @returns {Promise<number>}
+     */
+    async refreshMarketPrices(investments, date) {
+        if (DB.mode === 'api') {
+            const res = await DB.refreshQuotes();
+            return res?.updated || 0;
+        }
+        const priceUpdates = await this.collectPriceUpdates(investments);
+        await this.savePriceUpdates(priceUpdates, date);
+        return priceUpdates.length;
+    },
+
+    /**
+     * 在浏览器中抓取最新价格
+     * @param {Array} investments 
+     * @returns {Promise<Array<{inv: Object, price: number}>>}
+     */
+    async collectPriceUpdates(investments) {
+        const priceUpdates = [];
+
+        // 获取所有加密货币ID
+        const cryptoInvestments = investments.filter(inv => inv.type === 'crypto');
+
+        if (cryptoInvestments.length > 0) {
+            const coinIds = cryptoInvestments.map(inv =>
+                this.cryptoSymbols[inv.symbol] || inv.symbol.toLowerCase()
+            );
+
+            try {
+                const response = await fetch(
+                    `${this.apis.crypto}/simple/price?ids=${coinIds.join(',')}&vs_currencies=cny`
+                );
+
+                if (response.ok) {
+                    const data = await response.json();
+
+                    for (const inv of cryptoInvestments) {
+                        const coinId = this.cryptoSymbols[inv.symbol] || inv.symbol.toLowerCase();
+                        if (data[coinId] && data[coinId].cny) {
+                            const newPrice = data[coinId].cny;
+
+                            priceUpdates.push({ inv, price: newPrice });
+                        }
+                    }
+                }
+            } catch (error) {
+                console.error('Batch crypto API error:', error);
+            }
+        }
+
+        const otherInvestments = investments.filter(inv => inv.type !== 'crypto' && inv.type !== 'wealth');
+        for (const inv of otherInvestments) {
+            try {
+                let info = null;
+                if (inv.type === 'fund') {
+                    info = await this.fetchFundInfo(inv.symbol);
+                } else if (inv.type === 'stock') {
+                    info = await this.fetchStockInfo(inv.symbol);
+                }
+
+                if (info && info.price && info.price > 0) {
+                    priceUpdates.push({ inv, price: info.price });
+                }
+            } catch (error) {
+                console.error('Refresh price error:', error);
+            }
+        }
+
+        return priceUpdates;
+    },
+
     /**
      * 更新投资汇总
      */
@@ -400,11 +520,28 @@ const Investments = {
         yesterday.setDate(yesterday.getDate() - 1);
         const yesterdayStr = yesterday.toISOString().split('T')[0];
 
+        // API 模式下一次请求取回所有投资昨日的价格
+        let yesterdayPrices = null;
+        if (DB.mode === 'api' && (investments || []).length > 0) {
+            try {
+                yesterdayPrices = await DB.getPricesAsOf(investments.map(inv => Number(inv.id)), [yesterdayStr]);
+            } catch (error) {
+                console.error('Error loading yesterday prices:', error);
+            }
+        }
+
         for (const inv of (investments || [])) {
             totalMarketValue += inv.quantity * inv.currentPrice;
             totalCost += inv.quantity * inv.costPrice;
             try {
-                const h = await DB.getPriceHistoryByDate(Number(inv.id), yesterdayStr);
+                let h = null;
+                if (yesterdayPrices) {
+                    // 只取昨日当天的记录，与逐条查询 byDate 的口径一致
+                    const s = yesterdayPrices[inv.id];
+                    if (s && s.priceDates[0] === yesterdayStr) h = { price: s.prices[0] };
+                } else {
+                    h = await DB.getPriceHistoryByDate(Number(inv.id), yesterdayStr);
+                }
                 const prev = Number(h?.price);
                 if (Number.isFinite(prev)) {
                     yesterdayProfit += (Number(inv.quantity || 0) * (Number(inv.currentPrice || 0) - prev));
@@ -1345,62 +1482,10 @@ const Investments = {
             let updatedCount = 0;
 
             updatedCount += await this.accrueWealthInvestments(today);
-
-            // 获取所有加密货币ID
-            const cryptoInvestments = investments.filter(inv => inv.type === 'crypto');
-
-            if (cryptoInvestments.length > 0) {
-                const coinIds = cryptoInvestments.map(inv =>
-                    this.cryptoSymbols[inv.symbol] || inv.symbol.toLowerCase()
-                );
-
-                try {
-                    const response = await fetch(
-                        `${this.apis.crypto}/simple/price?ids=${coinIds.join(',')}&vs_currencies=cny`
-                    );
-
-                    if (response.ok) {
-                        const data = await response.json();
-
-                        for (const inv of cryptoInvestments) {
-                            const coinId = this.cryptoSymbols[inv.symbol] || inv.symbol.toLowerCase();
-                            if (data[coinId] && data[coinId].cny) {
-                                const newPrice = data[coinId].cny;
-
-                                // 更新投资的当前价格
-                                inv.currentPrice = newPrice;
-                                await DB.updateInvestment(inv);
-
-                                // 更新价格历史记录
-                                await this.updatePriceHistory(inv, newPrice);
-                                updatedCount++;
-                            }
-                        }
-                    }
-                } catch (error) {
-                    console.error('Auto update crypto prices error:', error);
-                }
-            }
-
-            const otherInvestments = investments.filter(inv => inv.type !== 'crypto' && inv.type !== 'wealth');
-            for (const inv of otherInvestments) {
-                try {
-                    let info = null;
-                    if (inv.type === 'fund') {
-                        info = await this.fetchFundInfo(inv.symbol);
-                    } else if (inv.type === 'stock') {
-                        info = await this.fetchStockInfo(inv.symbol);
-                    }
-
-                    if (info && info.price && info.price > 0) {
-                        inv.currentPrice = info.price;
-                        await DB.updateInvestment(inv);
-                        await this.updatePriceHistory(inv, info.price);
-                        updatedCount++;
-                    }
-                } catch (error) {
-                    console.error('Auto update price error:', error);
-                }
+            try {
+                updatedCount += await this.refreshMarketPrices(investments, today);
+            } catch (error) {
+                console.error('Auto update price error:', error);
             }
 
             // 更新汇总和仪表盘
@@ -1443,63 +1528,10 @@ const Investments = {
         const today = new Date().toISOString().split('T')[0];
 
         updatedCount += await this.accrueWealthInvestments(today);
-
-        // 获取所有加密货币ID
-        const cryptoInvestments = investments.filter(inv => inv.type === 'crypto');
-
-        if (cryptoInvestments.length > 0) {
-            const coinIds = cryptoInvestments.map(inv =>
-                this.cryptoSymbols[inv.symbol] || inv.symbol.toLowerCase()
-            );
-
-            try {
-                const response = await fetch(
-                    `${this.apis.crypto}/simple/price?ids=${coinIds.join(',')}&vs_currencies=cny`
-                );
-
-                if (response.ok) {
-                    const data = await response.json();
-
-                    for (const inv of cryptoInvestments) {
-                        const coinId = this.cryptoSymbols[inv.symbol] || inv.symbol.toLowerCase();
-                        if (data[coinId] && data[coinId].cny) {
-                            const newPrice = data[coinId].cny;
-
-                            // 更新投资的当前价格
-                            inv.currentPrice = newPrice;
-                            await DB.updateInvestment(inv);
-
-                            // 更新价格历史记录
-                            await this.updatePriceHistory(inv, newPrice);
-
-                            updatedCount++;
-                        }
-                    }
-                }
-            } catch (error) {
-                console.error('Batch crypto API error:', error);
-            }
-        }
-
-        const otherInvestments = investments.filter(inv => inv.type !== 'crypto' && inv.type !== 'wealth');
-        for (const inv of otherInvestments) {
-            try {
-                let info = null;
-                if (inv.type === 'fund') {
-                    info = await this.fetchFundInfo(inv.symbol);
-                } else if (inv.type === 'stock') {
-                    info = await this.fetchStockInfo(inv.symbol);
-                }
-
-                if (info && info.price && info.price > 0) {
-                    inv.currentPrice = info.price;
-                    await DB.updateInvestment(inv);
-                    await this.updatePriceHistory(inv, info.price);
-                    updatedCount++;
-                }
-            } catch (error) {
-                console.error('Refresh price error:', error);
-            }
+        try {
+            updatedCount += await this.refreshMarketPrices(investments, today);
+        } catch (error) {
+            console.error('Refresh price error:', error);
         }
 
         App.hideLoading();
@@ -1685,7 +1717,7 @@ const Investments = {
         const startDate = new Date();
         startDate.setDate(startDate.getDate() - 90);
 
-        const history = await DB.getPriceHistoryByInvestment(
+        const history = await DB.getPriceSeries(
             investment.id,
             startDate.toISOString().split('T')[0],
             endDate.toISOString().split('T')[0]
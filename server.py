@@ -1,24 +1,40 @@
 import json
+import re
+import select
 import ssl
 import sqlite3
 import urllib.request
 import urllib.error
 import base64
+import hashlib
 import os
 import tempfile
 import email.utils
 import xml.etree.ElementTree as ET
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+import mimetypes
+import queue
 import threading
-from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from urllib.parse import parse_qs, urlparse, urlunparse, quote
+from urllib.parse import parse_qs, urlparse, urlunparse, quote, unquote
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict, Tuple
 
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-only
+    brotli = None
+
 
 ROOT_DIR = Path(__file__).resolve().parent
 DB_PATH = ROOT_DIR / "openpercento.db"
-DB_IO_LOCK = threading.RLock()
 
 
 def now_iso():
@@ -45,6 +61,12 @@ def to_date_str(d):
     return d.isoformat()
 
 
+def local_today():
+    """The server's calendar day. Quotes, snapshots, recurring runs and as-of lookups all key
+    on this, so a price written just after midnight lands on the same day as the snapshot."""
+    return datetime.now().date()
+
+
 def compute_initial_next_run(rule: dict, today):
     freq = (rule.get("frequency") or "").lower()
     if freq == "daily":
@@ -81,173 +103,913 @@ def compute_initial_next_run(rule: dict, today):
     return to_date_str(d)
 
 
-def compute_next_run(rule: dict, current_date_str: str):
-    base = parse_date_str(current_date_str)
-    if not base:
-        return ""
+def next_run_date(rule: dict, base):
     freq = (rule.get("frequency") or "").lower()
     if freq == "daily":
-        return to_date_str(base + timedelta(days=1))
+        return base + timedelta(days=1)
     if freq == "weekly":
-        return to_date_str(base + timedelta(days=7))
+        return base + timedelta(days=7)
     if freq == "monthly":
         day = max(1, min(31, int(rule.get("monthDay") or 1)))
         first_next = (base.replace(day=1) + timedelta(days=32)).replace(day=1)
         last = (first_next + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        return to_date_str(first_next.replace(day=min(day, last.day)))
+        return first_next.replace(day=min(day, last.day))
     year_day_input = int(rule.get("yearDay") or 1)
     y = base.year + 1
     day_for_y = clamp_year_day(y, year_day_input)
-    d = datetime(y, 1, 1).date() + timedelta(days=day_for_y - 1)
-    return to_date_str(d)
+    return datetime(y, 1, 1).date() + timedelta(days=day_for_y - 1)
 
 
-def execute_recurring_rule(conn, rule: dict, date_str: str) -> bool:
-    action = (rule.get("action") or "").lower()
-    amount = float(rule.get("amount") or 0)
-    if not amount or amount <= 0:
-        return False
+def compute_next_run(rule: dict, current_date_str: str):
+    base = parse_date_str(current_date_str)
+    if not base:
+        return ""
+    return to_date_str(next_run_date(rule, base))
 
-    if action == "income" and rule.get("accountId"):
-        account_id = int(rule.get("accountId"))
-        row = conn.execute("SELECT * FROM accounts WHERE id = ?", (account_id,)).fetchone()
-        if not row:
-            return False
-        prev = float(row["balance"] or 0)
-        new_bal = prev + amount
-        conn.execute("UPDATE accounts SET balance = ?, updatedAt = ? WHERE id = ?", (new_bal, now_iso(), account_id))
-        conn.execute(
-            """
-            INSERT INTO transactions (accountId, type, previousBalance, newBalance, amount, reason, date, note, createdAt, updatedAt)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                account_id,
-                "recurring_income",
-                prev,
-                new_bal,
-                amount,
-                rule.get("note") or "Recurring income",
-                date_str,
-                rule.get("note"),
-                now_iso(),
-                now_iso(),
-            ),
-        )
-        return True
 
-    if action == "transfer" and (rule.get("fromAccountId") or rule.get("accountId")) and rule.get("toAccountId"):
-        from_id = int(rule.get("fromAccountId") or rule.get("accountId"))
-        to_id = int(rule.get("toAccountId"))
-        if from_id == to_id:
-            return False
-        from_row = conn.execute("SELECT * FROM accounts WHERE id = ?", (from_id,)).fetchone()
-        to_row = conn.execute("SELECT * FROM accounts WHERE id = ?", (to_id,)).fetchone()
-        if not from_row or not to_row:
-            return False
-        from_prev = float(from_row["balance"] or 0)
-        to_prev = float(to_row["balance"] or 0)
-        from_new = from_prev - amount
-        to_new = to_prev + amount
-        now = now_iso()
-        conn.execute("UPDATE accounts SET balance = ?, updatedAt = ? WHERE id = ?", (from_new, now, from_id))
-        conn.execute("UPDATE accounts SET balance = ?, updatedAt = ? WHERE id = ?", (to_new, now, to_id))
-
-        from_name = from_row["name"] or "-"
-        to_name = to_row["name"] or "-"
-        reason = rule.get("note") or f"Recurring transfer: {from_name} → {to_name}"
-        conn.execute(
-            """
-            INSERT INTO transactions (accountId, type, previousBalance, newBalance, amount, reason, date, note, createdAt, updatedAt)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (from_id, "recurring_transfer_out", from_prev, from_new, -amount, reason, date_str, rule.get("note"), now, now),
-        )
-        conn.execute(
-            """
-            INSERT INTO transactions (accountId, type, previousBalance, newBalance, amount, reason, date, note, createdAt, updatedAt)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (to_id, "recurring_transfer_in", to_prev, to_new, amount, reason, date_str, rule.get("note"), now, now),
-        )
-        return True
+# Default transaction reasons, matching Recurring.executeRule in js/app.js.
+RECURRING_REASON_LABELS = {
+    "zh": {"income": "周期入账", "expense": "周期出账", "transfer": "周期转账", "dca": "定投"},
+    "en": {"income": "Recurring income", "expense": "Recurring expense", "transfer": "Recurring transfer", "dca": "DCA"},
+}
 
-    if action == "dca" and rule.get("fromAccountId") and rule.get("investmentId"):
-        from_id = int(rule.get("fromAccountId"))
-        inv_id = int(rule.get("investmentId"))
-        from_row = conn.execute("SELECT * FROM accounts WHERE id = ?", (from_id,)).fetchone()
-        inv_row = conn.execute("SELECT * FROM investments WHERE id = ?", (inv_id,)).fetchone()
-        if not from_row or not inv_row:
-            return False
-        price = float(inv_row["currentPrice"] or 0) or float(inv_row["costPrice"] or 0)
-        if not price or price <= 0:
-            return False
 
-        qty_add = amount / price
-        old_qty = float(inv_row["quantity"] or 0)
-        old_cost = float(inv_row["costPrice"] or 0)
-        new_qty = old_qty + qty_add
-        new_cost = ((old_qty * old_cost) + (qty_add * price)) / new_qty if new_qty > 0 else old_cost
+def stored_language(conn) -> str:
+    """The UI language saved in settings, normalized the way Settings.init in js/settings.js does."""
+    row = conn.execute("SELECT value FROM settings WHERE key = 'language'").fetchone()
+    try:
+        raw = json.loads(row["value"]) if row and row["value"] is not None else None
+    except Exception:
+        raw = row["value"] if row else None
+    return {"zh": "zh", "en": "en", "中文": "zh", "English": "en"}.get(raw, "zh")
+
+
+class RecurringLedger:
+    """Account and investment state for applying recurring rules in memory.
+
+    apply() mirrors one execution of a rule against the cached rows; flush() then writes
+    every queued transaction with executemany and one final UPDATE per touched row.
+    Reasons are written in `lang`, or the language saved in settings.
+    """
+
+    def __init__(self, conn, lang: Optional[str] = None):
+        self.conn = conn
+        self.now = now_iso()
+        self.labels = RECURRING_REASON_LABELS[lang if lang in RECURRING_REASON_LABELS else stored_language(conn)]
+        self._accounts: Dict[int, Optional[dict]] = {}
+        self._investments: Dict[int, Optional[dict]] = {}
+        self._dirty_accounts: List[int] = []
+        self._dirty_investments: List[int] = []
+        self.transactions: List[tuple] = []
+
+    def _account(self, account_id: int) -> Optional[dict]:
+        if account_id not in self._accounts:
+            row = self.conn.execute("SELECT id, name, balance FROM accounts WHERE id = ?", (account_id,)).fetchone()
+            self._accounts[account_id] = row_to_dict(row)
+        return self._accounts[account_id]
+
+    def _investment(self, inv_id: int) -> Optional[dict]:
+        if inv_id not in self._investments:
+            row = self.conn.execute(
+                """
+                SELECT id, type, name, quantity, costPrice, currentPrice, purchaseDate, annualInterestRate, lastAccruedDate, createdAt
+                FROM investments WHERE id = ?
+                """,
+                (inv_id,),
+            ).fetchone()
+            self._investments[inv_id] = row_to_dict(row)
+        return self._investments[inv_id]
+
+    def _set_balance(self, account: dict, balance: float):
+        account["balance"] = balance
+        if account["id"] not in self._dirty_accounts:
+            self._dirty_accounts.append(account["id"])
+
+    def _add_transaction(self, account_id, kind, prev, new, amount, reason, date_str, note):
+        self.transactions.append((account_id, kind, prev, new, amount, reason, date_str, note, self.now, self.now))
+
+    def apply(self, rule: dict, date_str: str) -> bool:
+        action = (rule.get("action") or "").lower()
+        amount = float(rule.get("amount") or 0)
+        if not amount or amount <= 0:
+            return False
 
-        from_prev = float(from_row["balance"] or 0)
-        from_new = from_prev - amount
-        now = now_iso()
-        conn.execute("UPDATE accounts SET balance = ?, updatedAt = ? WHERE id = ?", (from_new, now, from_id))
-        conn.execute(
-            """
-            INSERT INTO transactions (accountId, type, previousBalance, newBalance, amount, reason, date, note, createdAt, updatedAt)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                from_id,
+        if action == "income" and rule.get("accountId"):
+            account = self._account(int(rule.get("accountId")))
+            if not account:
+                return False
+            prev = float(account["balance"] or 0)
+            new_bal = prev + amount
+            self._set_balance(account, new_bal)
+            self._add_transaction(
+                account["id"], "recurring_income", prev, new_bal, amount, rule.get("note") or self.labels["income"], date_str, rule.get("note")
+            )
+            return True
+
+        if action == "expense" and rule.get("accountId"):
+            account = self._account(int(rule.get("accountId")))
+            if not account:
+                return False
+            prev = float(account["balance"] or 0)
+            if amount > prev:
+                return False
+            new_bal = prev - amount
+            self._set_balance(account, new_bal)
+            self._add_transaction(
+                account["id"], "recurring_expense", prev, new_bal, -amount, rule.get("note") or self.labels["expense"], date_str, rule.get("note")
+            )
+            return True
+
+        if action == "transfer" and (rule.get("fromAccountId") or rule.get("accountId")) and rule.get("toAccountId"):
+            from_id = int(rule.get("fromAccountId") or rule.get("accountId"))
+            to_id = int(rule.get("toAccountId"))
+            if from_id == to_id:
+                return False
+            from_acc = self._account(from_id)
+            to_acc = self._account(to_id)
+            if not from_acc or not to_acc:
+                return False
+            from_prev = float(from_acc["balance"] or 0)
+            to_prev = float(to_acc["balance"] or 0)
+            from_new = from_prev - amount
+            to_new = to_prev + amount
+            self._set_balance(from_acc, from_new)
+            self._set_balance(to_acc, to_new)
+            reason = rule.get("note") or f"{self.labels['transfer']}: {from_acc['name'] or '-'} → {to_acc['name'] or '-'}"
+            self._add_transaction(from_id, "recurring_transfer_out", from_prev, from_new, -amount, reason, date_str, rule.get("note"))
+            self._add_transaction(to_id, "recurring_transfer_in", to_prev, to_new, amount, reason, date_str, rule.get("note"))
+            return True
+
+        if action == "dca" and rule.get("fromAccountId") and rule.get("investmentId"):
+            from_acc = self._account(int(rule.get("fromAccountId")))
+            inv = self._investment(int(rule.get("investmentId")))
+            if not from_acc or not inv:
+                return False
+            if inv["type"] == "wealth":
+                return self._apply_wealth_dca(rule, date_str, amount, from_acc, inv)
+            price = float(inv["currentPrice"] or 0) or float(inv["costPrice"] or 0)
+            if not price or price <= 0:
+                return False
+
+            qty_add = amount / price
+            old_qty = float(inv["quantity"] or 0)
+            old_cost = float(inv["costPrice"] or 0)
+            new_qty = old_qty + qty_add
+            new_cost = ((old_qty * old_cost) + (qty_add * price)) / new_qty if new_qty > 0 else old_cost
+
+            from_prev = float(from_acc["balance"] or 0)
+            from_new = from_prev - amount
+            self._set_balance(from_acc, from_new)
+            self._add_transaction(
+                from_acc["id"],
                 "dca_out",
                 from_prev,
                 from_new,
                 -amount,
-                rule.get("note") or f"DCA: {(from_row['name'] or '-') } → {(inv_row['name'] or '-')}",
+                rule.get("note") or f"{self.labels['dca']}: {from_acc['name'] or '-'} → {inv['name'] or '-'}",
                 date_str,
                 rule.get("note"),
-                now,
-                now,
-            ),
-        )
-        conn.execute(
-            "UPDATE investments SET quantity = ?, costPrice = ?, updatedAt = ? WHERE id = ?",
-            (new_qty, new_cost, now, inv_id),
+            )
+            inv["quantity"] = new_qty
+            inv["costPrice"] = new_cost
+            self._touch_investment(inv)
+            return True
+
+        return False
+
+    def _touch_investment(self, inv: dict):
+        if inv["id"] not in self._dirty_investments:
+            self._dirty_investments.append(inv["id"])
+
+    def _apply_wealth_dca(self, rule: dict, date_str: str, amount: float, from_acc: dict, inv: dict) -> bool:
+        """Same as the browser's wealth DCA: accrue simple interest up to date_str, then add principal."""
+        last_accrued = inv["lastAccruedDate"] or inv["purchaseDate"] or (str(inv["createdAt"]).split("T")[0] if inv["createdAt"] else date_str)
+        annual_rate = float(inv["annualInterestRate"] or 0)
+        daily_rate = annual_rate / 100 / 365 if annual_rate > 0 else 0
+        principal = float(inv["quantity"] or 0)
+        prev_factor = float(inv["currentPrice"] or 0) or 1
+        prev_amount = principal * prev_factor if principal > 0 else 0
+        start, end = parse_date_str(str(last_accrued)[:10]), parse_date_str(date_str)
+        days = max(0, (end - start).days) if start and end else 0
+        accrued = prev_amount * (1 + daily_rate * days) if daily_rate > 0 and days > 0 else prev_amount
+
+        from_prev = float(from_acc["balance"] or 0)
+        from_new = from_prev - amount
+        self._set_balance(from_acc, from_new)
+        self._add_transaction(
+            from_acc["id"],
+            "dca_out",
+            from_prev,
+            from_new,
+            -amount,
+            rule.get("note") or f"{self.labels['dca']}: {from_acc['name'] or '-'} → {inv['name'] or '-'}",
+            date_str,
+            rule.get("note"),
         )
+        new_principal = principal + amount
+        inv["quantity"] = new_principal
+        inv["costPrice"] = 1
+        inv["currentPrice"] = (accrued + amount) / new_principal if new_principal > 0 else 1
+        inv["lastAccruedDate"] = date_str
+        self._touch_investment(inv)
         return True
 
+    def flush(self):
+        if self._dirty_accounts:
+            self.conn.executemany(
+                "UPDATE accounts SET balance = ?, updatedAt = ? WHERE id = ?",
+                [(self._accounts[i]["balance"], self.now, i) for i in self._dirty_accounts],
+            )
+        if self.transactions:
+            self.conn.executemany(
+                """
+                INSERT INTO transactions (accountId, type, previousBalance, newBalance, amount, reason, date, note, createdAt, updatedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                self.transactions,
+            )
+        if self._dirty_investments:
+            self.conn.executemany(
+                "UPDATE investments SET quantity = ?, costPrice = ?, currentPrice = ?, lastAccruedDate = ?, updatedAt = ? WHERE id = ?",
+                [
+                    (inv["quantity"], inv["costPrice"], inv["currentPrice"], inv["lastAccruedDate"], self.now, inv["id"])
+                    for inv in (self._investments[i] for i in self._dirty_investments)
+                ],
+            )
+        self._dirty_accounts = []
+        self._dirty_investments = []
+        self.transactions = []
+
+
+def execute_recurring_rule(conn, rule: dict, date_str: str, lang: Optional[str] = None) -> bool:
+    ledger = RecurringLedger(conn, lang)
+    ran = ledger.apply(rule, date_str)
+    ledger.flush()
+    return ran
+
+
+RECURRING_CATCH_UP_MAX = 366
+
+
+def run_due_recurring(conn, today, rule_ids: Optional[List[int]] = None, lang: Optional[str] = None) -> dict:
+    """Execute every enabled rule's occurrences due up to `today` (at most RECURRING_CATCH_UP_MAX each),
+    or only those of `rule_ids`.
+
+    Occurrences are replayed in memory rule by rule, in id order, exactly as repeated
+    execute_recurring_rule calls would; the writes then go out as a handful of batched
+    statements. Does not commit.
+    """
+    today_str = to_date_str(today)
+    ledger = RecurringLedger(conn, lang)
+    initial_runs = []
+    rule_runs = []
+    processed = 0
+    executed = 0
+    sql = "SELECT * FROM recurringRules WHERE enabled = 1"
+    if rule_ids is not None:
+        sql += f" AND id IN ({','.join('?' for _ in rule_ids)})"
+    for row in conn.execute(sql + " ORDER BY id ASC", list(rule_ids or [])).fetchall():
+        rule = row_to_dict(row)
+        next_run = str(rule.get("nextRun") or "")
+        if not next_run:
+            next_run = compute_initial_next_run(rule, today)
+            rule["nextRun"] = next_run
+            initial_runs.append((next_run, ledger.now, int(rule["id"])))
+
+        # Step on date objects (compute_next_run semantics) instead of re-parsing each occurrence.
+        current = parse_date_str(next_run)
+        last_run = None
+        guard = 0
+        while next_run and next_run <= today_str and guard < RECURRING_CATCH_UP_MAX:
+            processed += 1
+            if not ledger.apply(rule, next_run):
+                break
+            executed += 1
+            last_run = next_run
+            if current is None:
+                next_run = ""
+            else:
+                current = next_run_date(rule, current)
+                next_run = to_date_str(current)
+            guard += 1
+        if last_run is not None:
+            rule["lastRun"], rule["nextRun"] = last_run, next_run
+            rule_runs.append((last_run, next_run, ledger.now, int(rule["id"])))
+
+    if initial_runs:
+        conn.executemany("UPDATE recurringRules SET nextRun = ?, updatedAt = ? WHERE id = ?", initial_runs)
+    ledger.flush()
+    if rule_runs:
+        conn.executemany("UPDATE recurringRules SET lastRun = ?, nextRun = ?, updatedAt = ? WHERE id = ?", rule_runs)
+    return {"processed": processed, "executed": executed}
+
+
+class _RWLock:
+    """Shared/exclusive lock: API requests share it, swapping the database file takes it exclusively.
+
+    A waiting exclusive holder blocks new shared holders so a sync can't be starved by a
+    steady stream of GETs. The exclusive owner may take the shared side again (e.g. init_db).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._shared = 0
+        self._owner = None
+        self._owner_depth = 0
+        self._waiting = 0
+
+    def acquire_shared(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._owner_depth += 1
+                return
+            while self._owner is not None or self._waiting:
+                self._cond.wait()
+            self._shared += 1
+
+    def release_shared(self):
+        with self._cond:
+            if self._owner == threading.get_ident():
+                self._owner_depth -= 1
+                return
+            self._shared -= 1
+            if self._shared == 0:
+                self._cond.notify_all()
+
+    def acquire_exclusive(self):
+        me = threading.get_ident()
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._owner is not None or self._shared:
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            self._owner = me
+            self._owner_depth = 0
+
+    def release_exclusive(self):
+        with self._cond:
+            self._owner = None
+            self._owner_depth = 0
+            self._cond.notify_all()
+
+
+DB_RW_LOCK = _RWLock()
+DB_WRITE_LOCK = threading.Lock()
+
+
+class _ConnectionPool:
+    """Keeps prepared SQLite connections around so requests don't pay connect() + PRAGMA each time."""
+
+    def __init__(self, max_idle: int = 8):
+        self._lock = threading.Lock()
+        self._idle: List[sqlite3.Connection] = []
+        self._path: Optional[Path] = None
+        self._generation = 0
+        self._max_idle = max_idle
+
+    def _open(self, path: Path) -> sqlite3.Connection:
+        raw = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        raw.row_factory = sqlite3.Row
+        raw.execute("PRAGMA foreign_keys = ON;")
+        raw.execute("PRAGMA synchronous = NORMAL;")
+        return raw
+
+    def acquire(self) -> Tuple[sqlite3.Connection, int]:
+        with self._lock:
+            if self._path != DB_PATH:
+                self._close_idle()
+                self._path = DB_PATH
+                self._generation += 1
+            generation = self._generation
+            path = self._path
+            if self._idle:
+                return self._idle.pop(), generation
+        return self._open(path), generation
+
+    def release(self, conn: sqlite3.Connection, generation: int):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            generation = -1
+        with self._lock:
+            if generation == self._generation and len(self._idle) < self._max_idle:
+                self._idle.append(conn)
+                return
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def resize(self, max_idle: int):
+        """Keep up to `max_idle` idle connections, e.g. one per server worker."""
+        with self._lock:
+            self._max_idle = max(1, max_idle)
+            extra, self._idle = self._idle[self._max_idle:], self._idle[:self._max_idle]
+        for conn in extra:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def drain(self):
+        with self._lock:
+            self._close_idle()
+            self._path = None
+            self._generation += 1
+
+    def _close_idle(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+DB_POOL = _ConnectionPool()
+# Connections used off the request path at the same time as the workers: the snapshot
+# recorder, the recurring scheduler and a server-side quote refresh.
+DB_POOL_BACKGROUND = 3
+
+# Bumped after every request that changed rows and whenever a (different) database file
+# is attached, so in-process caches can tell whether what they hold is still current.
+DATA_VERSION = 0
+DATA_VERSION_LOCK = threading.Lock()
+
+
+def mark_data_changed():
+    global DATA_VERSION
+    with DATA_VERSION_LOCK:
+        DATA_VERSION += 1
+
+
+# DATA_VERSION restarts at 0 with the process, so validators also carry a per-process epoch.
+DATA_EPOCH = f"{os.getpid():x}.{time.time_ns():x}"
+
+
+def api_etag(path: str, query_string: str) -> str:
+    """Validator for a GET on a database route: same data version, day, route and query -> same body.
+
+    The local day is included because some routes (sparklines, due rules) default to "today".
+    """
+    key = f"{DATA_EPOCH}|{DATA_VERSION}|{to_date_str(local_today())}|{path}?{query_string}"
+    return '"' + hashlib.blake2s(key.encode("utf-8"), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or _strip_etag_encoding(candidate.removeprefix("W/")) == etag:
+            return True
     return False
 
 
-def connect():
-    DB_IO_LOCK.acquire()
-    raw = sqlite3.connect(DB_PATH)
-    raw.row_factory = sqlite3.Row
-    raw.execute("PRAGMA foreign_keys = ON;")
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """Compressed bodies are different representations, so their validators carry a suffix."""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def _strip_etag_encoding(tag: str) -> str:
+    for encoding in ("br", "gzip"):
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+# GET routes whose encoded replies may be kept, and the tables each one reads.
+RESPONSE_CACHE_ROUTES = {
+    "/api/accounts": ("accounts",),
+    "/api/transactions": ("transactions",),
+    "/api/investments": ("investments",),
+    "/api/priceHistory": ("priceHistory",),
+    "/api/settings": ("settings",),
+    "/api/recurring": ("recurringRules",),
+    "/api/snapshots": ("snapshots",),
+    "/api/analytics/cashflow": ("transactions",),
+    "/api/stats": ("accounts", "investments"),
+}
+RESPONSE_CACHE_MB_DEFAULT = 32
+
+
+class ResponseCache:
+    """LRU of encoded JSON bodies for GET routes, keyed by route, query and day.
+
+    Entries are dropped when a connection that wrote one of their tables commits, before
+    its reply goes out. Per-table generations stop a read that overlapped such a write
+    from storing its (possibly older) body afterwards.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (body, tables, {encoding: compressed body})
+        self._entries: "OrderedDict[tuple, Tuple[bytes, tuple, Dict[str, bytes]]]" = OrderedDict()
+        self._size = 0
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def tables_for(path: str) -> Optional[tuple]:
+        for prefix, tables in RESPONSE_CACHE_ROUTES.items():
+            if path == prefix or path.startswith(prefix + "/"):
+                return tables
+        return None
 
-    class _LockedConn:
-        def __init__(self, conn, lock):
-            self._conn = conn
-            self._lock = lock
+    def _token(self, tables) -> tuple:
+        return (self._epoch, tuple(self._generations.get(t, 0) for t in tables))
 
-        def __getattr__(self, name):
-            return getattr(self._conn, name)
+    def token(self, tables) -> tuple:
+        with self._lock:
+            return self._token(tables)
 
-        def close(self):
-            try:
-                return self._conn.close()
-            finally:
+    def get(self, key) -> Optional[bytes]:
+        if self.max_bytes <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, tables, token, data: bytes):
+        # A single body may take at most an eighth of the budget, so one full dump can't flush everything.
+        if self.max_bytes <= 0 or len(data) > self.max_bytes // 8:
+            return
+        with self._lock:
+            if token != self._token(tables):
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= self._entry_size(old)
+            self._entries[key] = (data, tables, {})
+            self._size += len(data)
+            self._evict()
+
+    def get_variant(self, key, data: bytes, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[2].get(encoding) if entry is not None and entry[0] is data else None
+
+    def put_variant(self, key, data: bytes, encoding: str, body: bytes):
+        """Keep the compressed form of a cached body next to it; it goes when the body goes."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not data or encoding in entry[2]:
+                return
+            entry[2][encoding] = body
+            self._size += len(body)
+            self._evict()
+
+    @staticmethod
+    def _entry_size(entry) -> int:
+        return len(entry[0]) + sum(len(v) for v in entry[2].values())
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            _key, dropped = self._entries.popitem(last=False)
+            self._size -= self._entry_size(dropped)
+            self.evictions += 1
+
+    def invalidate(self, tables):
+        tables = set(tables)
+        with self._lock:
+            for t in tables:
+                self._generations[t] = self._generations.get(t, 0) + 1
+            for key in [k for k, (_data, deps, _variants) in self._entries.items() if tables.intersection(deps)]:
+                self._size -= self._entry_size(self._entries.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _response_cache_bytes(raw: Optional[str]) -> int:
+    raw = (raw or "").strip().lower()
+    if raw in ("0", "off", "false", "no"):
+        return 0
+    try:
+        return int(float(raw) * 1024 * 1024) if raw else RESPONSE_CACHE_MB_DEFAULT * 1024 * 1024
+    except ValueError:
+        return RESPONSE_CACHE_MB_DEFAULT * 1024 * 1024
+
+
+RESPONSE_CACHE = ResponseCache(_response_cache_bytes(os.environ.get("PERCENTO_RESPONSE_CACHE_MB")))
+
+
+# Bodies smaller than this go out as-is: the framing saves less than it costs.
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/manifest+json", "image/svg+xml")
+# Dynamic replies favour speed; static assets are compressed once, so they get the best ratio.
+COMPRESS_LEVELS = {"dynamic": {"br": 5, "gzip": 6}, "static": {"br": 11, "gzip": 9}}
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br (when the brotli package is installed) or gzip from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _sep, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _eq, value = param.strip().partition("=")
+            if key == "q":
                 try:
-                    self._lock.release()
-                except Exception:
-                    pass
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip().lower()] = q
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    best = None
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+def compress_body(data: bytes, encoding: str, kind: str = "dynamic") -> bytes:
+    level = COMPRESS_LEVELS[kind][encoding]
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return zlib.compress(data, level, wbits=31)
+
+
+def stream_compressor(encoding: str):
+    """(compress, finish) callables for bodies that are produced incrementally."""
+    level = COMPRESS_LEVELS["dynamic"][encoding]
+    if encoding == "br":
+        c = brotli.Compressor(quality=level)
+        return c.process, c.finish
+    c = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return c.compress, c.flush
+
+
+# Files served from StaticAssets; anything else under ROOT_DIR still goes through SimpleHTTPRequestHandler.
+STATIC_ASSET_FILES = ("index.html", "manifest.json")
+STATIC_ASSET_DIRS = ("css", "js", "icons")
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STATIC_DEV_CHECK_INTERVAL = 1.0
+# Local references in index.html that get a ?v=<content hash> suffix.
+_ASSET_REF_RE = re.compile(r'((?:src|href)=")((?:css|js|icons)/[^"?#]+|manifest\.json)(")')
+
+
+class _StaticAsset:
+    __slots__ = ("content_type", "body", "digest", "etag", "mtime_ns", "size", "last_modified", "compressible", "encoded")
+
+    def __init__(self, content_type: str, body: bytes, mtime_ns: int, size: int):
+        self.content_type = content_type
+        self.body = body
+        self.digest = hashlib.blake2s(body, digest_size=8).hexdigest()
+        self.etag = f'"{self.digest}"'
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.last_modified = email.utils.formatdate(mtime_ns / 1e9, usegmt=True)
+        self.compressible = is_compressible(content_type) and len(body) >= COMPRESS_MIN_BYTES
+        self.encoded: Dict[str, bytes] = {}
+
+
+class StaticAssets:
+    """In-memory table of the app's static files: bytes, content hash, ETag and compressed forms.
+
+    The table is built on first use. index.html has its css/js/icon/manifest references
+    rewritten to `?v=<hash>`, so those URLs can be cached as immutable. With dev=True the
+    files are re-stat'ed at most once a second and the table rebuilt when any changed.
+    """
+
+    def __init__(self, root: Path, dev: bool = False):
+        self.root = Path(root)
+        self.dev = dev
+        self._lock = threading.Lock()
+        self._assets: Optional[Dict[str, _StaticAsset]] = None
+        self._stamp: Dict[str, Tuple[int, int]] = {}
+        self._checked = 0.0
+
+    def _paths(self) -> Dict[str, Path]:
+        paths = {}
+        for name in STATIC_ASSET_FILES:
+            p = self.root / name
+            if p.is_file():
+                paths["/" + name] = p
+        for d in STATIC_ASSET_DIRS:
+            base = self.root / d
+            if not base.is_dir():
+                continue
+            for p in sorted(base.rglob("*")):
+                if p.is_file() and not p.name.startswith("."):
+                    paths["/" + p.relative_to(self.root).as_posix()] = p
+        return paths
+
+    def _stat_all(self, paths: Dict[str, Path]) -> Dict[str, Tuple[int, int]]:
+        stamp = {}
+        for url_path, p in paths.items():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            stamp[url_path] = (st.st_mtime_ns, st.st_size)
+        return stamp
+
+    def load(self):
+        paths = self._paths()
+        stamp = self._stat_all(paths)
+        assets: Dict[str, _StaticAsset] = {}
+        for url_path, p in paths.items():
+            if url_path not in stamp:
+                continue
+            try:
+                body = p.read_bytes()
+            except OSError:
+                continue
+            content_type = mimetypes.guess_type(p.name)[0] or "application/octet-stream"
+            if content_type.startswith("text/"):
+                content_type += "; charset=utf-8"
+            assets[url_path] = _StaticAsset(content_type, body, *stamp[url_path])
+        index = assets.get("/index.html")
+        if index is not None:
+
+            def versioned(m):
+                ref = assets.get("/" + m.group(2))
+                return f"{m.group(1)}{m.group(2)}?v={ref.digest}{m.group(3)}" if ref else m.group(0)
+
+            body = _ASSET_REF_RE.sub(versioned, index.body.decode("utf-8")).encode("utf-8")
+            assets["/index.html"] = _StaticAsset(index.content_type, body, index.mtime_ns, index.size)
+        with self._lock:
+            self._assets = assets
+            self._stamp = stamp
+            self._checked = time.monotonic()
+        return len(assets)
+
+    def _changed(self) -> bool:
+        with self._lock:
+            if time.monotonic() - self._checked < STATIC_DEV_CHECK_INTERVAL:
+                return False
+            self._checked = time.monotonic()
+            stamp = self._stamp
+        return self._stat_all(self._paths()) != stamp
+
+    def lookup(self, url_path: str) -> Optional[_StaticAsset]:
+        if self._assets is None or (self.dev and self._changed()):
+            self.load()
+        return self._assets.get(url_path)
+
+    def encoded(self, asset: _StaticAsset, encoding: str) -> bytes:
+        body = asset.encoded.get(encoding)
+        if body is None:
+            body = compress_body(asset.body, encoding, kind="static")
+            asset.encoded[encoding] = body
+        return body
+
+    def precompress(self) -> int:
+        """Compress every compressible asset ahead of the first request for it."""
+        if self._assets is None:
+            self.load()
+        count = 0
+        for asset in list(self._assets.values()):
+            if not asset.compressible:
+                continue
+            for encoding in ("br", "gzip") if brotli is not None else ("gzip",):
+                self.encoded(asset, encoding)
+            count += 1
+        return count
+
+
+STATIC_ASSETS = StaticAssets(ROOT_DIR, dev=(os.environ.get("PERCENTO_DEV") or "").strip().lower() in ("1", "on", "true", "yes"))
+
+
+_WRITE_TABLE_RE = re.compile(r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+"?(\w+)', re.IGNORECASE)
+
+
+class _PooledConn:
+    def __init__(self, conn, generation, write):
+        self._conn = conn
+        self._generation = generation
+        self._write = write
+        self.tables_written = set()
+        self._pending_callbacks = []
+        self._committed_callbacks = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def _note(self, sql):
+        m = _WRITE_TABLE_RE.match(sql)
+        if m:
+            self.tables_written.add(m.group(1))
+
+    def execute(self, sql, *args):
+        self._note(sql)
+        return self._conn.execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        self._note(sql)
+        return self._conn.executemany(sql, *args)
+
+    def on_commit(self, callback):
+        """Run `callback` when the connection is released, if the current transaction commits."""
+        self._pending_callbacks.append(callback)
+
+    def commit(self):
+        self._conn.commit()
+        self._committed_callbacks.extend(self._pending_callbacks)
+        self._pending_callbacks = []
+        # Handlers reply before close(); drop cached state now so the client's next GET sees this write.
+        if self.tables_written:
+            mark_data_changed()
+            if "priceHistory" in self.tables_written:
+                PRICE_INDEX.invalidate()
+            RESPONSE_CACHE.invalidate(self.tables_written)
+
+    def rollback(self):
+        self._conn.rollback()
+        self._pending_callbacks = []
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            DB_POOL.release(conn, self._generation)
+        finally:
+            if self._write:
+                DB_WRITE_LOCK.release()
+            DB_RW_LOCK.release_shared()
+        for callback in self._committed_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Commit callback error: {e}")
 
-    return _LockedConn(raw, DB_IO_LOCK)
 
+def connect(write: bool = True):
+    """Borrow a pooled connection.
 
-def init_db():
-    conn = connect()
+    Readers run concurrently (WAL); writers are serialized on DB_WRITE_LOCK so they
+    never race each other into SQLITE_BUSY. close() hands the connection back.
+    """
+    DB_RW_LOCK.acquire_shared()
+    if write:
+        DB_WRITE_LOCK.acquire()
+    try:
+        raw, generation = DB_POOL.acquire()
+    except Exception:
+        if write:
+            DB_WRITE_LOCK.release()
+        DB_RW_LOCK.release_shared()
+        raise
+    return _PooledConn(raw, generation, write)
+
+
+def checkpoint_db(path: Path):
+    """Fold the WAL back into the main file so the .db on disk is complete by itself."""
+    if not path.exists():
+        return
+    raw = sqlite3.connect(path, timeout=30)
+    try:
+        raw.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    finally:
+        raw.close()
+
+
+def remove_wal_files(path: Path):
+    for suffix in ("-wal", "-shm"):
+        try:
+            os.unlink(str(path) + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _migrate_base_schema(conn):
     conn.executescript(
         """
         CREATE TABLE IF NOT EXISTS accounts (
@@ -368,8 +1130,67 @@ def init_db():
     ):
         if col not in inv_cols:
             conn.execute(f"ALTER TABLE investments ADD COLUMN {col} {col_type}")
-    conn.commit()
-    conn.close()
+
+
+# Secondary indexes by name. snapshots(date) is already covered by its UNIQUE constraint's index.
+QUERY_INDEXES = (
+    ("idx_transactions_account_date", "transactions", "CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions (accountId, date DESC, id DESC)"),
+    ("idx_transactions_date", "transactions", "CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)"),
+    ("idx_priceHistory_date", "priceHistory", "CREATE INDEX IF NOT EXISTS idx_priceHistory_date ON priceHistory (date)"),
+    ("idx_recurringRules_due", "recurringRules", "CREATE INDEX IF NOT EXISTS idx_recurringRules_due ON recurringRules (enabled, nextRun)"),
+)
+
+
+def _migrate_query_indexes(conn):
+    for _name, _table, ddl in QUERY_INDEXES:
+        conn.execute(ddl)
+
+
+def _migrate_quote_cache(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS quoteCache (
+            provider TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            name TEXT,
+            price REAL,
+            fetchedAt REAL NOT NULL,
+            PRIMARY KEY (provider, symbol)
+        )
+        """
+    )
+
+
+# (version, migration) pairs applied in order; PRAGMA user_version records the last one run.
+# Migrations must stay idempotent: databases created before versioning start at 0.
+SCHEMA_MIGRATIONS = (
+    (1, _migrate_base_schema),
+    (2, _migrate_query_indexes),
+    (3, _migrate_quote_cache),
+)
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def init_db():
+    mark_data_changed()
+    PRICE_INDEX.invalidate()
+    RESPONSE_CACHE.clear()
+    if RECURRING_SCHEDULER is not None:
+        RECURRING_SCHEDULER.reload()
+    conn = connect()
+    try:
+        conn.execute("PRAGMA journal_mode = WAL;")
+        version = int(conn.execute("PRAGMA user_version").fetchone()[0])
+        if version >= SCHEMA_VERSION:
+            return
+        for target, migrate in SCHEMA_MIGRATIONS:
+            if target <= version:
+                continue
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+    finally:
+        conn.close()
 
 
 def row_to_dict(row):
@@ -378,6 +1199,359 @@ def row_to_dict(row):
     return {k: row[k] for k in row.keys()}
 
 
+TRANSACTIONS_PAGE_DEFAULT = 100
+TRANSACTIONS_PAGE_MAX = 1000
+
+
+def encode_cursor(date, row_id) -> str:
+    raw = json.dumps([date, int(row_id)], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, row_id = json.loads(raw.decode("utf-8"))
+        if date is not None and not isinstance(date, str):
+            return None
+        return date, int(row_id)
+    except Exception:
+        return None
+
+
+def keyset_clause(cursor, older: bool) -> Tuple[str, list]:
+    """WHERE fragment for rows strictly after (older) or before (newer) a cursor in `date DESC, id DESC` order.
+
+    NULL dates sort last in that order, so they need their own branches.
+    """
+    date, row_id = cursor
+    if older:
+        if date is None:
+            return "(date IS NULL AND id < ?)", [row_id]
+        return "(date < ? OR (date = ? AND id < ?) OR date IS NULL)", [date, date, row_id]
+    if date is None:
+        return "(date IS NOT NULL OR id > ?)", [row_id]
+    return "(date > ? OR (date = ? AND id > ?))", [date, date, row_id]
+
+
+def end_date_clause(end: str) -> Tuple[str, str]:
+    """Inclusive upper bound on `date`; a bare YYYY-MM-DD also covers timestamps on that day."""
+    d = parse_date_str(end)
+    if d:
+        return "date < ?", to_date_str(d + timedelta(days=1))
+    return "date <= ?", end
+
+
+EXPORT_VERSION = 2
+EXPORT_TABLES = (
+    ("accounts", "SELECT * FROM accounts ORDER BY id ASC"),
+    ("transactions", "SELECT * FROM transactions ORDER BY date DESC, id DESC"),
+    ("investments", "SELECT * FROM investments ORDER BY id ASC"),
+    ("priceHistory", "SELECT * FROM priceHistory ORDER BY id ASC"),
+    ("settings", "SELECT key, value FROM settings ORDER BY key ASC"),
+    ("snapshots", "SELECT * FROM snapshots ORDER BY date ASC, id ASC"),
+)
+
+
+def iter_export_json(conn):
+    """Yield the version-2 export document piece by piece, one row at a time.
+
+    The output is byte-identical to json.dumps(payload, ensure_ascii=False) of the
+    fully materialized export, without ever holding more than one row in memory.
+    """
+    def dumps(value):
+        return json.dumps(value, ensure_ascii=False)
+
+    yield '{"version": ' + dumps(EXPORT_VERSION) + ', "exportedAt": ' + dumps(now_iso())
+    for name, sql in EXPORT_TABLES:
+        cur = conn.execute(sql)
+        if name == "settings":
+            yield ', "settings": {'
+            sep = ""
+            for r in cur:
+                try:
+                    val = json.loads(r["value"]) if r["value"] is not None else None
+                except Exception:
+                    val = r["value"]
+                yield sep + dumps(r["key"]) + ": " + dumps(val)
+                sep = ", "
+            yield "}"
+            continue
+        yield ", " + dumps(name) + ": ["
+        sep = ""
+        for r in cur:
+            yield sep + dumps(row_to_dict(r))
+            sep = ", "
+        yield "]"
+    yield "}"
+
+
+def _import_account(a, ts):
+    return (
+        a.get("id"),
+        a.get("name") or "",
+        a.get("group") or "",
+        float(a.get("balance") or 0),
+        a.get("icon"),
+        1 if a.get("includeInNetWorth", True) else 0,
+        a.get("billingDay"),
+        a.get("repaymentDay"),
+        a.get("note"),
+        a.get("createdAt") or ts,
+        a.get("updatedAt") or ts,
+    )
+
+
+def _import_transaction(t, ts):
+    return (
+        t.get("id"),
+        int(t.get("accountId") or 0),
+        t.get("type"),
+        float(t.get("previousBalance") or 0),
+        float(t.get("newBalance") or 0),
+        float(t.get("amount") or 0),
+        t.get("reason"),
+        t.get("date"),
+        t.get("note"),
+        t.get("createdAt") or ts,
+        t.get("updatedAt"),
+    )
+
+
+def _import_investment(inv, ts):
+    return (
+        inv.get("id"),
+        inv.get("type") or "",
+        inv.get("name") or "",
+        inv.get("symbol") or "",
+        float(inv.get("quantity") or 0),
+        float(inv.get("costPrice") or 0),
+        float(inv.get("currentPrice") or 0),
+        inv.get("purchaseDate"),
+        inv.get("wealthProductType"),
+        float(inv.get("annualInterestRate") or 0),
+        inv.get("maturityDate"),
+        inv.get("lastAccruedDate"),
+        inv.get("note"),
+        inv.get("createdAt") or ts,
+        inv.get("updatedAt") or ts,
+    )
+
+
+def _import_price_history(ph, ts):
+    return (
+        ph.get("id"),
+        int(ph.get("investmentId") or 0),
+        ph.get("date"),
+        float(ph.get("price") or 0),
+        ph.get("type"),
+        ph.get("symbol"),
+        ph.get("createdAt") or ts,
+        ph.get("updatedAt") or ts,
+    )
+
+
+def _import_setting(item, ts):
+    key, val = item
+    return (key, json.dumps(val, ensure_ascii=False), ts, ts)
+
+
+def _import_snapshot(s, ts):
+    return (
+        s.get("id"),
+        s.get("date"),
+        float(s.get("netWorth") or 0),
+        float(s.get("assets") or s.get("totalAssets") or 0),
+        float(s.get("liabilities") or s.get("totalLiabilities") or 0),
+        float(s.get("investments") or s.get("totalInvestmentValue") or 0),
+        float(s.get("totalAssets") or 0),
+        float(s.get("totalLiabilities") or 0),
+        float(s.get("totalInvestmentValue") or 0),
+        float(s.get("totalInvestmentCost") or 0),
+        float(s.get("investmentProfit") or 0),
+        float(s.get("investmentProfitRate") or 0),
+        s.get("createdAt") or ts,
+        s.get("updatedAt"),
+    )
+
+
+# (table, columns, normalizer) in insert order. Normalizers turn one exported item into
+# the column tuple, so the loader can hand whole lists to executemany.
+IMPORT_TABLES = (
+    (
+        "accounts",
+        ("id", "name", '"group"', "balance", "icon", "includeInNetWorth", "billingDay", "repaymentDay", "note", "createdAt", "updatedAt"),
+        _import_account,
+    ),
+    (
+        "transactions",
+        ("id", "accountId", "type", "previousBalance", "newBalance", "amount", "reason", "date", "note", "createdAt", "updatedAt"),
+        _import_transaction,
+    ),
+    (
+        "investments",
+        (
+            "id", "type", "name", "symbol", "quantity", "costPrice", "currentPrice", "purchaseDate", "wealthProductType",
+            "annualInterestRate", "maturityDate", "lastAccruedDate", "note", "createdAt", "updatedAt",
+        ),
+        _import_investment,
+    ),
+    (
+        "priceHistory",
+        ("id", "investmentId", "date", "price", "type", "symbol", "createdAt", "updatedAt"),
+        _import_price_history,
+    ),
+    (
+        "settings",
+        ("key", "value", "createdAt", "updatedAt"),
+        _import_setting,
+    ),
+    (
+        "snapshots",
+        (
+            "id", "date", "netWorth", "assets", "liabilities", "investments", "totalAssets", "totalLiabilities",
+            "totalInvestmentValue", "totalInvestmentCost", "investmentProfit", "investmentProfitRate", "createdAt", "updatedAt",
+        ),
+        _import_snapshot,
+    ),
+)
+IMPORT_CLEAR_ORDER = ("priceHistory", "snapshots", "transactions", "investments", "accounts", "settings")
+
+
+def _import_items(body: dict, table: str) -> list:
+    if table == "settings":
+        return list((body.get("settings") or {}).items())
+    return list(body.get(table) or [])
+
+
+def bulk_import(conn, body: dict) -> dict:
+    """Replace all data with the contents of an export document in one transaction.
+
+    Rows are normalized up front and written with executemany; durability is relaxed
+    for the duration of the load since the whole thing commits or rolls back at once.
+    """
+    started = time.perf_counter()
+    ts = now_iso()
+    rows = {table: [normalize(item, ts) for item in _import_items(body, table)] for table, _cols, normalize in IMPORT_TABLES}
+
+    counts = {}
+    conn.execute("PRAGMA synchronous = OFF;")
+    try:
+        conn.execute("BEGIN")
+        for table in IMPORT_CLEAR_ORDER:
+            conn.execute(f"DELETE FROM {table}")
+        # Building secondary indexes once after the load beats maintaining them per row.
+        rebuild = [(name, ddl) for name, table, ddl in QUERY_INDEXES if table in rows]
+        for name, _ddl in rebuild:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        for table, cols, _normalize in IMPORT_TABLES:
+            placeholders = ", ".join("?" for _ in cols)
+            conn.executemany(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({placeholders})", rows[table])
+            counts[table] = len(rows[table])
+        for _name, ddl in rebuild:
+            conn.execute(ddl)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA synchronous = NORMAL;")
+
+    return {"counts": counts, "elapsedMs": round((time.perf_counter() - started) * 1000, 1)}
+
+
+# Columns merge_import matches rows on; tables not listed match by id and are updated in
+# place. Listed tables are upserted on their key and keep a matched row's createdAt. Price
+# points are unique per (investmentId, date) and an export may carry the same point under
+# another id, so they are matched on that natural key instead.
+MERGE_KEYS = {
+    "settings": ("key",),
+    "priceHistory": ("investmentId", "date"),
+}
+
+
+def merge_import(conn, body: dict) -> dict:
+    """Bring the database in line with an export document by touching only rows that differ.
+
+    Rows are matched by id (settings by key, price history by investment and date). A
+    matching updatedAt short-circuits to "unchanged"; otherwise the non-timestamp columns
+    are compared, so documents that lack timestamps don't rewrite every row. Local rows
+    missing from the document are deleted, leaving the same end state as a full import
+    (except that matched settings and price points keep their local createdAt, and price
+    points their local id).
+    """
+    started = time.perf_counter()
+    ts = now_iso()
+    counts = {}
+    plans = []
+    for table, cols, normalize in IMPORT_TABLES:
+        key_cols = MERGE_KEYS.get(table, ("id",))
+        key_idx = [cols.index(c) for c in key_cols]
+        upsert = table in MERGE_KEYS
+        by_natural_key = key_cols[0] != cols[0]
+        updated_idx = cols.index("updatedAt")
+        ignored = ("id", "createdAt", "updatedAt") if by_natural_key else ("createdAt", "updatedAt")
+        content_idx = [i for i, c in enumerate(cols) if c not in ignored]
+        existing = {tuple(r[i] for i in key_idx): tuple(r) for r in conn.execute(f"SELECT {', '.join(cols)} FROM {table}")}
+
+        inserts, updates, seen = [], [], set()
+        unchanged = 0
+        for item in _import_items(body, table):
+            row = normalize(item, ts)
+            if row[0] is not None and cols[0] == "id":
+                row = (int(row[0]),) + row[1:]
+            key = tuple(row[i] for i in key_idx)
+            current = existing.get(key) if None not in key else None
+            if current is None:
+                inserts.append(row)
+                if None not in key:
+                    seen.add(key)
+                continue
+            seen.add(key)
+            incoming_updated = item.get("updatedAt") if isinstance(item, dict) else None
+            if incoming_updated and incoming_updated == current[updated_idx]:
+                unchanged += 1
+            elif all(row[i] == current[i] for i in content_idx):
+                unchanged += 1
+            elif upsert:
+                updates.append((None,) + row[1:] if by_natural_key else row)
+            else:
+                updates.append(row[1:] + key)
+        deletes = [k for k in existing if k not in seen]
+        if by_natural_key:
+            # A new point may arrive under an id a surviving local row already holds.
+            taken = {existing[k][0] for k in seen if k in existing}
+            inserts = [(None,) + r[1:] if r[0] in taken else r for r in inserts]
+        plans.append((table, cols, key_cols, inserts, updates, deletes))
+        counts[table] = {"inserted": len(inserts), "updated": len(updates), "unchanged": unchanged, "deleted": len(deletes)}
+
+    if any(inserts or updates or deletes for _t, _c, _k, inserts, updates, deletes in plans):
+        try:
+            conn.execute("BEGIN")
+            for table, _cols, key_cols, _inserts, _updates, deletes in reversed(plans):
+                where = " AND ".join(f"{c} = ?" for c in key_cols)
+                conn.executemany(f"DELETE FROM {table} WHERE {where}", deletes)
+            for table, cols, key_cols, inserts, updates, _deletes in plans:
+                placeholders = ", ".join("?" for _ in cols)
+                insert_sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({placeholders})"
+                if table in MERGE_KEYS:
+                    kept = ("id", "createdAt", *key_cols)
+                    assignments = ", ".join(f"{c} = excluded.{c}" for c in cols if c not in kept)
+                    upsert_sql = f"{insert_sql} ON CONFLICT({', '.join(key_cols)}) DO UPDATE SET {assignments}"
+                    conn.executemany(upsert_sql, updates)
+                    conn.executemany(upsert_sql, inserts)
+                    continue
+                assignments = ", ".join(f"{c} = ?" for c in cols[1:])
+                conn.executemany(f"UPDATE {table} SET {assignments} WHERE {key_cols[0]} = ?", updates)
+                conn.executemany(insert_sql, inserts)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return {"mode": "merge", "counts": counts, "elapsedMs": round((time.perf_counter() - started) * 1000, 1)}
+
+
 def _webdav_ssl_context():
     ctx = ssl.create_default_context()
     ctx.check_hostname = False
@@ -536,98 +1710,1485 @@ def _webdav_stat_file(base_url: str, username: str, password: str, filename: str
     return {"ok": True, "exists": False, "status": last_status, "message": last_message, "url": last_url}
 
 
-class Handler(SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=str(ROOT_DIR), **kwargs)
+def bulk_upsert_prices(conn, entries, update_current: bool = True) -> dict:
+    """Write many (investmentId, date, price) points: upsert priceHistory and, per investment,
+    move currentPrice to its latest-dated point. Does not commit.
 
-    def _send_json(self, status, payload):
-        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
-        self.send_header("Content-Length", str(len(data)))
-        self.end_headers()
-        self.wfile.write(data)
+    Entries for unknown investments are skipped rather than leaving orphaned history.
+    """
+    ts = now_iso()
+    history = []
+    latest: Dict[int, Tuple[str, float]] = {}
+    skipped = []
+    for index, e in enumerate(entries or []):
+        try:
+            inv_id = int(e.get("investmentId"))
+            date = str(e.get("date") or "")
+            price = float(e.get("price"))
+        except Exception:
+            skipped.append(index)
+            continue
+        if inv_id <= 0 or not parse_date_str(date) or price != price:
+            skipped.append(index)
+            continue
+        history.append((inv_id, date, price, e.get("type"), e.get("symbol"), ts, inv_id))
+        if inv_id not in latest or date >= latest[inv_id][0]:
+            latest[inv_id] = (date, price)
 
-    def _read_json(self):
-        length = int(self.headers.get("Content-Length", "0") or "0")
-        if length <= 0:
-            return None
-        raw = self.rfile.read(length)
-        if not raw:
-            return None
-        return json.loads(raw.decode("utf-8"))
+    before = conn.total_changes
+    conn.executemany(
+        """
+        INSERT INTO priceHistory (investmentId, date, price, type, symbol, createdAt, updatedAt)
+        SELECT ?, ?, ?, COALESCE(?, type), COALESCE(?, symbol), ?, NULL FROM investments WHERE id = ?
+        ON CONFLICT(investmentId, date) DO UPDATE SET
+            price = excluded.price,
+            type = excluded.type,
+            symbol = excluded.symbol,
+            updatedAt = excluded.createdAt
+        """,
+        history,
+    )
+    history_written = conn.total_changes - before
+
+    investments_updated = 0
+    if update_current and latest:
+        before = conn.total_changes
+        conn.executemany(
+            "UPDATE investments SET currentPrice = ?, updatedAt = ? WHERE id = ?",
+            [(price, ts, inv_id) for inv_id, (_date, price) in latest.items()],
+        )
+        investments_updated = conn.total_changes - before
+    return {"history": history_written, "investments": investments_updated, "skipped": skipped}
+
+
+# Same symbol -> CoinGecko id table as Investments.cryptoSymbols in js/investments.js.
+CRYPTO_COIN_IDS = {
+    "BTC": "bitcoin",
+    "ETH": "ethereum",
+    "USDT": "tether",
+    "BNB": "binancecoin",
+    "SOL": "solana",
+    "XRP": "ripple",
+    "USDC": "usd-coin",
+    "ADA": "cardano",
+    "DOGE": "dogecoin",
+    "TRX": "tron",
+    "TON": "the-open-network",
+    "AVAX": "avalanche-2",
+    "SHIB": "shiba-inu",
+    "DOT": "polkadot",
+    "LINK": "chainlink",
+    "MATIC": "matic-network",
+    "UNI": "uniswap",
+    "LTC": "litecoin",
+    "BCH": "bitcoin-cash",
+    "ATOM": "cosmos",
+}
+
+QUOTE_MAX_WORKERS = 8
+
+
+class QuoteError(Exception):
+    def __init__(self, message, retryable: bool = True, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def _quote_get(url: str, timeout: float, headers: Optional[Dict[str, str]] = None) -> bytes:
+    req = urllib.request.Request(url, method="GET", headers={"User-Agent": "OpenPercento", **(headers or {})})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.read()
+    except urllib.error.HTTPError as e:
+        retry_after = 0.0
+        try:
+            retry_after = float(e.headers.get("Retry-After") or 0)
+        except Exception:
+            pass
+        raise QuoteError(f"HTTP {e.code}", retryable=e.code == 429 or e.code >= 500, retry_after=retry_after)
+    except Exception as e:
+        raise QuoteError(str(e) or e.__class__.__name__)
+
+
+class QuoteProvider:
+    """One upstream quote source for an investment type.
+
+    Subclasses turn investment symbols into upstream codes, build the URL for a batch of
+    codes and parse the response into {code: {"name": ..., "price": ...}}. Codes missing
+    from the result are reported as not found.
+    """
+
+    batch_size = 1
+    concurrency = 4
+    timeout = 5.0
+    retries = 2
+    backoff = 0.5
+    max_backoff = 8.0
+    headers: Dict[str, str] = {}
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def code_for(self, symbol: str) -> str:
+        return symbol
+
+    def url_for(self, codes: List[str]) -> str:
+        raise NotImplementedError
+
+    def parse(self, codes: List[str], raw: bytes) -> Dict[str, dict]:
+        raise NotImplementedError
+
+    def fetch(self, codes: List[str]) -> Dict[str, dict]:
+        delay = self.backoff
+        attempt = 0
+        while True:
+            with self._slots:
+                try:
+                    return self.parse(codes, _quote_get(self.url_for(codes), self.timeout, self.headers))
+                except QuoteError as e:
+                    if not e.retryable or attempt >= self.retries:
+                        raise
+                    wait = min(max(delay, e.retry_after), self.max_backoff)
+            time.sleep(wait)
+            delay *= 2
+            attempt += 1
+
+
+class FundQuoteProvider(QuoteProvider):
+    """天天基金 fundgz JSONP: one fund per request, estimate (gsz) preferred over NAV (dwjz)."""
+
+    def url_for(self, codes):
+        return f"{self.base_url.rstrip('/')}/{quote(codes[0])}.js?rt={int(time.time() * 1000)}"
+
+    def parse(self, codes, raw):
+        text = raw.decode("utf-8", errors="replace")
+        start, end = text.find("("), text.rfind(")")
+        payload = text[start + 1:end].strip() if 0 <= start < end else ""
+        if not payload:
+            return {}
+        try:
+            data = json.loads(payload)
+        except Exception:
+            raise QuoteError("invalid_response", retryable=False)
+        price = 0.0
+        for key in ("gsz", "dwjz"):
+            try:
+                price = float(data.get(key) or 0)
+            except Exception:
+                price = 0.0
+            if price > 0:
+                break
+        if not data.get("name") or price <= 0:
+            return {}
+        return {str(data.get("fundcode") or codes[0]): {"name": data.get("name"), "price": price}}
+
+
+class StockQuoteProvider(QuoteProvider):
+    """Sina hq list= endpoint: comma-separated codes, one `var hq_str_<code>="...";` line each."""
+
+    batch_size = 50
+    concurrency = 2
+    headers = {"Referer": "https://finance.sina.com.cn/"}
+    _line_re = re.compile(r'hq_str_(\w+)="([^"]*)"')
+
+    def code_for(self, symbol):
+        # Same normalisation as Investments.fetchStockInfo: sh600519, sz000001, 0700.HK -> hk0700.
+        code = symbol.lower()
+        if ".hk" in code:
+            return "hk" + code.replace(".hk", "")
+        if not code.startswith("sh") and not code.startswith("sz"):
+            return ("sh" if code.startswith("6") else "sz") + code
+        return code
+
+    def url_for(self, codes):
+        return f"{self.base_url}{','.join(codes)}"
+
+    def parse(self, codes, raw):
+        text = raw.decode("gbk", errors="replace")
+        out = {}
+        for code, body in self._line_re.findall(text):
+            parts = body.split(",")
+            # HK rows lead with the English name; the last price is field 6 rather than 3.
+            name_idx, price_idx = (1, 6) if code.startswith("hk") else (0, 3)
+            if len(parts) <= price_idx or not parts[name_idx]:
+                continue
+            try:
+                price = float(parts[price_idx])
+            except ValueError:
+                continue
+            if price > 0:
+                out[code] = {"name": parts[name_idx], "price": price}
+        return out
 
-    def _not_found(self):
-        self._send_json(404, {"error": "not_found"})
 
-    def _bad_request(self, message="bad_request"):
-        self._send_json(400, {"error": message})
+class CryptoQuoteProvider(QuoteProvider):
+    """CoinGecko /simple/price, many coin ids per request, priced in CNY."""
 
-    def _method_not_allowed(self):
-        self._send_json(405, {"error": "method_not_allowed"})
+    batch_size = 100
+    concurrency = 1
+    timeout = 10.0
 
-    def _handle_api(self):
-        global DB_PATH
-        parsed = urlparse(self.path)
-        path = parsed.path
-        query = parse_qs(parsed.query)
+    def code_for(self, symbol):
+        return CRYPTO_COIN_IDS.get(symbol.upper()) or symbol.lower()
 
-        if path == "/api/health":
-            if self.command != "GET":
-                return self._method_not_allowed()
-            return self._send_json(200, {"ok": True})
+    def url_for(self, codes):
+        return f"{self.base_url.rstrip('/')}/simple/price?ids={quote(','.join(codes), safe=',')}&vs_currencies=cny"
 
-        if path == "/api/config":
-            if self.command != "GET":
-                return self._method_not_allowed()
-            return self._send_json(200, {"dbPath": str(DB_PATH)})
+    def parse(self, codes, raw):
+        try:
+            data = json.loads(raw.decode("utf-8"))
+        except Exception:
+            raise QuoteError("invalid_response", retryable=False)
+        out = {}
+        for code in codes:
+            price = (data.get(code) or {}).get("cny") if isinstance(data, dict) else None
+            if isinstance(price, (int, float)) and price > 0:
+                out[code] = {"name": code, "price": float(price)}
+        return out
 
-        if path == "/api/config/dbPath":
-            if self.command != "POST":
-                return self._method_not_allowed()
-            body = self._read_json() or {}
-            raw = body.get("dbPath")
-            if not raw or not isinstance(raw, str):
-                return self._bad_request("invalid_db_path")
 
-            try:
-                p = Path(raw).expanduser()
-            except Exception:
-                return self._bad_request("invalid_db_path")
+def build_quote_providers() -> Dict[str, QuoteProvider]:
+    """Providers keyed by investment type. Base URLs default to the browser's `apis` table
+    and can be pointed elsewhere (e.g. a local stub) with PERCENTO_QUOTE_*_URL."""
+    return {
+        "fund": FundQuoteProvider(os.environ.get("PERCENTO_QUOTE_FUND_URL") or "https://fundgz.1234567.com.cn/js"),
+        "stock": StockQuoteProvider(os.environ.get("PERCENTO_QUOTE_STOCK_URL") or "https://hq.sinajs.cn/list="),
+        "crypto": CryptoQuoteProvider(os.environ.get("PERCENTO_QUOTE_CRYPTO_URL") or "https://api.coingecko.com/api/v3"),
+    }
 
-            if not p.is_absolute():
-                return self._bad_request("db_path_must_be_absolute")
 
-            if p.suffix.lower() != ".db":
-                return self._bad_request("db_path_must_end_with_db")
+QUOTE_PROVIDERS = build_quote_providers()
 
-            try:
-                p.parent.mkdir(parents=True, exist_ok=True)
-            except Exception:
-                return self._bad_request("db_path_parent_unwritable")
 
-            DB_PATH = p
-            init_db()
-            return self._send_json(200, {"ok": True, "dbPath": str(DB_PATH)})
+# Seconds a cached quote counts as fresh, per investment type. Older entries up to
+# QUOTE_CACHE_STALE_MAX are still served while a background refresh runs.
+QUOTE_CACHE_TTL = {"fund": 10 * 60, "stock": 60, "crypto": 2 * 60}
+QUOTE_CACHE_TTL_DEFAULT = 5 * 60
+QUOTE_CACHE_STALE_MAX = 24 * 3600
+QUOTE_CACHE_RETENTION = 30 * 24 * 3600
+QUOTE_WAIT_TIMEOUT = 60
 
-        if path == "/api/config/resetDbPath":
-            if self.command != "POST":
-                return self._method_not_allowed()
-            DB_PATH = ROOT_DIR / "openpercento.db"
-            init_db()
-            return self._send_json(200, {"ok": True, "dbPath": str(DB_PATH)})
 
-        if path in ("/api/webdav/propfind", "/api/webdav/propfind/"):
-            if self.command != "POST":
-                return self._method_not_allowed()
-            
-            body = self._read_json() or {}
-            webdav_url = body.get("url")
-            username = body.get("username")
-            password = body.get("password")
-            
-            if webdav_url is None or username is None or password is None or not str(webdav_url).strip():
-                return self._bad_request("missing_credentials")
+class QuoteCache:
+    """Quotes keyed by (investment type, upstream code), persisted in the quoteCache table.
+
+    Lookups of the same key that overlap in time share one upstream call; batches go
+    through a shared bounded pool so background revalidation outlives the request.
+    """
+
+    def __init__(self, providers: Optional[Dict[str, QuoteProvider]] = None, max_workers: int = QUOTE_MAX_WORKERS):
+        self.providers = providers
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _providers(self) -> Dict[str, QuoteProvider]:
+        return QUOTE_PROVIDERS if self.providers is None else self.providers
+
+    def _load(self, keys) -> Dict[Tuple[str, str], sqlite3.Row]:
+        by_type: Dict[str, List[str]] = {}
+        for inv_type, code in keys:
+            by_type.setdefault(inv_type, []).append(code)
+        rows = {}
+        conn = connect(write=False)
+        try:
+            for inv_type, codes in by_type.items():
+                for i in range(0, len(codes), 500):
+                    chunk = codes[i:i + 500]
+                    for r in conn.execute(
+                        f"SELECT * FROM quoteCache WHERE provider = ? AND symbol IN ({','.join('?' for _ in chunk)})",
+                        [inv_type, *chunk],
+                    ):
+                        rows[(inv_type, r["symbol"])] = r
+        finally:
+            conn.close()
+        return rows
+
+    def _store(self, inv_type: str, codes: List[str], found: Dict[str, dict]):
+        """Record a batch result. Codes the provider didn't return are stored with a NULL price,
+        so unknown symbols are negatively cached for the same TTL."""
+        now = time.time()
+        conn = connect()
+        try:
+            conn.executemany(
+                """
+                INSERT INTO quoteCache (provider, symbol, name, price, fetchedAt) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(provider, symbol) DO UPDATE SET
+                    name = excluded.name, price = excluded.price, fetchedAt = excluded.fetchedAt
+                """,
+                [(inv_type, code, (found.get(code) or {}).get("name"), (found.get(code) or {}).get("price"), now) for code in codes],
+            )
+            conn.execute("DELETE FROM quoteCache WHERE fetchedAt < ?", (now - QUOTE_CACHE_RETENTION,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _fetch_batch(self, inv_type: str, codes: List[str]):
+        failure = None
+        try:
+            found = self._providers()[inv_type].fetch(codes)
+        except Exception as e:
+            found, failure = {}, e
+        if failure is None:
+            try:
+                self._store(inv_type, codes, found)
+            except Exception as e:
+                print(f"Quote cache write error: {e}")
+        with self._lock:
+            futures = [self._inflight.pop((inv_type, code), None) for code in codes]
+        for code, future in zip(codes, futures):
+            if future is None:
+                continue
+            if failure is not None:
+                future.set_exception(failure)
+            else:
+                future.set_result(found.get(code))
+
+    def _submit(self, keys) -> Tuple[Dict[Tuple[str, str], Future], int]:
+        """Futures for `keys`, starting upstream fetches only for keys not already in flight."""
+        futures = {}
+        started: Dict[str, List[str]] = {}
+        shared = 0
+        with self._lock:
+            for key in keys:
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._inflight[key] = Future()
+                    started.setdefault(key[0], []).append(key[1])
+                else:
+                    shared += 1
+                futures[key] = future
+            if started and self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="quotes")
+        providers = self._providers()
+        for inv_type, codes in started.items():
+            size = max(1, providers[inv_type].batch_size)
+            for i in range(0, len(codes), size):
+                self._executor.submit(self._fetch_batch, inv_type, codes[i:i + size])
+        return futures, shared
+
+    def lookup(self, items, force: bool = False):
+        """Quotes for (type, symbol) pairs. Returns (quotes, errors, info): quotes and errors are
+        keyed by (type, symbol); info counts cache hits, stale serves, misses and shared fetches.
+
+        Fresh entries are served as is and stale ones immediately, with a background refresh.
+        Missing or expired ones (or all, with `force`) are fetched before returning.
+        """
+        providers = self._providers()
+        wanted: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        errors: Dict[Tuple[str, str], str] = {}
+        for inv_type, symbol in items:
+            key = (inv_type, symbol)
+            provider = providers.get(inv_type)
+            if provider is None or not symbol:
+                errors[key] = "unsupported"
+                continue
+            wanted.setdefault((inv_type, provider.code_for(symbol)), []).append(key)
+
+        now = time.time()
+        cached = self._load(wanted) if wanted else {}
+        served: Dict[Tuple[str, str], dict] = {}
+        missing, stale = [], []
+        for key in wanted:
+            row = cached.get(key)
+            age = now - float(row["fetchedAt"] or 0) if row else None
+            if row is None or force or age >= QUOTE_CACHE_STALE_MAX:
+                missing.append(key)
+                continue
+            if row["price"] is not None:
+                served[key] = {"name": row["name"], "price": row["price"], "fetchedAt": row["fetchedAt"]}
+            if age >= QUOTE_CACHE_TTL.get(key[0], QUOTE_CACHE_TTL_DEFAULT):
+                stale.append(key)
+
+        futures, shared = self._submit(missing + stale)
+        failures: Dict[Tuple[str, str], str] = {}
+        for key in missing:
+            try:
+                found = futures[key].result(timeout=QUOTE_WAIT_TIMEOUT)
+            except Exception as e:
+                failures[key] = str(e) or "fetch_failed"
+                continue
+            if found:
+                served[key] = {**found, "fetchedAt": now}
+
+        quotes: Dict[Tuple[str, str], dict] = {}
+        for key, symbols in wanted.items():
+            for item in symbols:
+                if key in served:
+                    quotes[item] = served[key]
+                else:
+                    errors[item] = failures.get(key, "not_found")
+        info = {"hits": len(wanted) - len(missing) - len(stale), "stale": len(stale), "misses": len(missing), "shared": shared}
+        return quotes, errors, info
+
+
+QUOTE_CACHE = QuoteCache()
+
+
+def refresh_investment_quotes(ids=None, date_str: Optional[str] = None, force: bool = False) -> dict:
+    """Look up current quotes for investments (all priced ones, or just `ids`) through QUOTE_CACHE and
+    write them through to investments/priceHistory in one transaction. Network I/O runs without
+    holding the write lock.
+    """
+    started = time.perf_counter()
+    date_str = date_str or to_date_str(local_today())
+    conn = connect(write=False)
+    try:
+        sql = f"SELECT id, type, symbol FROM investments WHERE type IN ({','.join('?' for _ in QUOTE_PROVIDERS)}) AND COALESCE(symbol, '') <> ''"
+        params: list = list(QUOTE_PROVIDERS)
+        if ids:
+            sql += f" AND id IN ({','.join('?' for _ in ids)})"
+            params.extend(ids)
+        investments = [(r["id"], r["type"], r["symbol"]) for r in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+    quotes, errors, cache_info = QUOTE_CACHE.lookup([(inv_type, symbol) for _id, inv_type, symbol in investments], force=force)
+    entries = []
+    failed = []
+    for inv_id, inv_type, symbol in investments:
+        found = quotes.get((inv_type, symbol))
+        if found:
+            entries.append({"investmentId": inv_id, "date": date_str, "price": found["price"], "type": inv_type, "symbol": symbol})
+        else:
+            failed.append({"investmentId": inv_id, "symbol": symbol, "error": errors.get((inv_type, symbol), "not_found")})
+
+    written = {"history": 0, "investments": 0}
+    if entries:
+        conn = connect()
+        try:
+            written = bulk_upsert_prices(conn, entries)
+            conn.commit()
+        finally:
+            conn.close()
+    return {
+        "date": date_str,
+        "requested": len(investments),
+        "updated": written["investments"],
+        "history": written["history"],
+        "failed": failed,
+        "cache": cache_info,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+# SQL for a row's day ordinal (date.toordinal()), computed by SQLite rather than per row in Python.
+_DAY_ORDINAL_SQL = "CAST(julianday(substr(date, 1, 10)) - 1721424.5 AS INTEGER)"
+# priceHistory rows the index (and its SQL equivalents) consider, and their order. A valid
+# row's date starts with YYYY-MM-DD, so its text order is day order and day bounds can be
+# plain string comparisons; both then run off the (investmentId, date) unique index.
+_VALID_PRICE_SQL = "julianday(substr(date, 1, 10)) IS NOT NULL AND price IS NOT NULL"
+_PRICE_ORDER_SQL = "date ASC, id ASC"
+_PRICE_ORDER_DESC_SQL = "date DESC, id DESC"
+
+
+def _day_bounds_sql(start: Optional[int], end: Optional[int]) -> Tuple[str, list]:
+    """SQL and params restricting priceHistory.date to days `start`..`end` (ordinals, inclusive)."""
+    sql, params = "", []
+    if start is not None:
+        sql += " AND date >= ?"
+        params.append(to_date_str(datetime.fromordinal(start).date()))
+    if end is not None and end < datetime.max.toordinal():
+        sql += " AND date < ?"
+        params.append(to_date_str(datetime.fromordinal(end + 1).date()))
+    return sql, params
+
+
+class _PriceSeries:
+    """One investment's price history as parallel arrays sorted by date: 20 bytes a point."""
+
+    __slots__ = ("ids", "days", "prices")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.days = array("i")
+        self.prices = array("d")
+
+
+class PriceIndex:
+    """Optional in-process copy of priceHistory for bisect range/point/latest lookups.
+
+    Series load lazily per investment and are dropped when a connection that wrote
+    priceHistory commits. With the index disabled the
+    same methods answer from SQL with identical semantics: rows whose date doesn't start
+    with a valid day are ignored, bounds are whole days (both ends inclusive), rows are
+    ordered by day, then date text, then id, and dates come back as YYYY-MM-DD.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._series: Dict[int, _PriceSeries] = {}
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._series.clear()
+
+    def series(self, conn, inv_id: int) -> _PriceSeries:
+        # A connection with its own uncommitted price writes must read them, not the cache.
+        own_writes = conn.in_transaction and "priceHistory" in getattr(conn, "tables_written", ())
+        with self._lock:
+            found = None if own_writes else self._series.get(inv_id)
+            generation = self._generation
+        if found is not None:
+            return found
+        s = _PriceSeries()
+        rows = conn.execute(
+            f"""
+            SELECT id, {_DAY_ORDINAL_SQL}, price FROM priceHistory
+            WHERE investmentId = ? AND {_VALID_PRICE_SQL}
+            ORDER BY {_PRICE_ORDER_SQL}
+            """,
+            (inv_id,),
+        ).fetchall()
+        if rows:
+            ids, days, prices = zip(*rows)
+            s.ids.extend(ids)
+            s.days.extend(days)
+            s.prices.extend(float(p) for p in prices)
+        with self._lock:
+            # A write committed while we were loading, or these rows include our own uncommitted
+            # ones; either way don't cache them for other readers.
+            if self._generation == generation and not own_writes:
+                self._series[inv_id] = s
+        return s
+
+    @staticmethod
+    def _bound(value) -> Optional[int]:
+        d = parse_date_str(str(value)[:10]) if value else None
+        return d.toordinal() if d else None
+
+    @staticmethod
+    def _select(conn, inv_id: int, start: Optional[int], end: Optional[int], descending: bool = False, limit: Optional[int] = None):
+        sql = f"SELECT id, date(substr(date, 1, 10)) AS day, price FROM priceHistory WHERE investmentId = ? AND {_VALID_PRICE_SQL}"
+        bounds, params = _day_bounds_sql(start, end)
+        sql += bounds + f" ORDER BY {_PRICE_ORDER_DESC_SQL if descending else _PRICE_ORDER_SQL}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return conn.execute(sql, [inv_id, *params]).fetchall()
+
+    def range(self, conn, inv_id: int, start=None, end=None) -> Tuple[List[str], List[float]]:
+        start_d, end_d = self._bound(start), self._bound(end)
+        if not self.enabled:
+            rows = self._select(conn, inv_id, start_d, end_d)
+            return [r["day"] for r in rows], [float(r["price"]) for r in rows]
+        s = self.series(conn, inv_id)
+        lo = bisect_left(s.days, start_d) if start_d is not None else 0
+        hi = bisect_right(s.days, end_d) if end_d is not None else len(s.days)
+        return [to_date_str(datetime.fromordinal(d).date()) for d in s.days[lo:hi]], s.prices[lo:hi].tolist()
+
+    def point(self, conn, inv_id: int, date_str: str) -> Optional[int]:
+        """Row id of the (last) price recorded on the day of `date_str`, or None."""
+        d = self._bound(date_str)
+        if d is None:
+            return None
+        if not self.enabled:
+            rows = self._select(conn, inv_id, d, d, descending=True, limit=1)
+            return rows[0]["id"] if rows else None
+        s = self.series(conn, inv_id)
+        i = bisect_right(s.days, d) - 1
+        if i >= 0 and s.days[i] == d:
+            return s.ids[i]
+        return None
+
+    def latest(self, conn, inv_id: int, on_or_before=None) -> Optional[Tuple[str, float]]:
+        d = self._bound(on_or_before)
+        if not self.enabled:
+            rows = self._select(conn, inv_id, None, d, descending=True, limit=1)
+            return (rows[0]["day"], float(rows[0]["price"])) if rows else None
+        s = self.series(conn, inv_id)
+        i = (bisect_right(s.days, d) if d is not None else len(s.days)) - 1
+        if i < 0:
+            return None
+        return to_date_str(datetime.fromordinal(s.days[i]).date()), s.prices[i]
+
+
+PRICE_INDEX = PriceIndex(enabled=(os.environ.get("PERCENTO_PRICE_INDEX") or "").strip().lower() not in ("0", "off", "false", "no"))
+
+
+ASOF_MAX_INVESTMENTS = 1000
+ASOF_MAX_DATES = 10000
+
+
+def prices_as_of(conn, ids: List[int], dates: List[str]) -> dict:
+    """Last known price on or before each of `dates` for each investment in `ids`.
+
+    Dates are visited in ascending order against each investment's date-sorted history, so
+    every series is walked once. Results line up with `dates` as given; before the first
+    recorded price both price and priceDate are None.
+    """
+    days = [parse_date_str(d).toordinal() for d in dates]
+    order = sorted(range(len(dates)), key=days.__getitem__)
+
+    def merge(hist_days, hist_prices):
+        prices = [None] * len(dates)
+        price_dates = [None] * len(dates)
+        j = -1
+        for i in order:
+            while j + 1 < len(hist_days) and hist_days[j + 1] <= days[i]:
+                j += 1
+            if j >= 0:
+                prices[i] = hist_prices[j]
+                price_dates[i] = to_date_str(datetime.fromordinal(hist_days[j]).date())
+        return {"prices": prices, "priceDates": price_dates}
+
+    series = {}
+    if PRICE_INDEX.enabled:
+        for inv_id in ids:
+            s = PRICE_INDEX.series(conn, inv_id)
+            series[str(inv_id)] = merge(s.days, s.prices)
+        return {"dates": dates, "series": series}
+
+    # One ordered scan over the (investmentId, date) unique index for every requested id.
+    history: Dict[int, Tuple[List[int], List[float]]] = {inv_id: ([], []) for inv_id in ids}
+    bounds, bound_params = _day_bounds_sql(None, max(days) if days else 0)
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        rows = conn.execute(
+            f"""
+            SELECT investmentId, {_DAY_ORDINAL_SQL}, price FROM priceHistory
+            WHERE investmentId IN ({','.join('?' for _ in chunk)}) AND {_VALID_PRICE_SQL}{bounds}
+            ORDER BY investmentId ASC, {_PRICE_ORDER_SQL}
+            """,
+            [*chunk, *bound_params],
+        )
+        for inv_id, day, price in rows:
+            hist_days, hist_prices = history[inv_id]
+            hist_days.append(day)
+            hist_prices.append(float(price))
+    for inv_id in ids:
+        series[str(inv_id)] = merge(*history[inv_id])
+    return {"dates": dates, "series": series}
+
+
+SPARKLINE_DAYS_DEFAULT = 30
+SPARKLINE_DAYS_MAX = 366
+
+
+def price_sparklines(conn, days: int = SPARKLINE_DAYS_DEFAULT, ids=None, normalize: bool = False) -> dict:
+    """Last `days` days of prices (at most `days` points) for every investment, or just `ids`,
+    in one window query. Keys of "series" are investment ids as strings, oldest point first.
+    """
+    start = to_date_str(local_today() - timedelta(days=days))
+    params: list = [start]
+    sql = "SELECT investmentId, date, price, ROW_NUMBER() OVER (PARTITION BY investmentId ORDER BY date DESC) AS rn FROM priceHistory WHERE date >= ?"
+    if ids:
+        sql += f" AND investmentId IN ({','.join('?' for _ in ids)})"
+        params.extend(ids)
+    rows = conn.execute(
+        f"SELECT investmentId, date, price FROM ({sql}) WHERE rn <= ? ORDER BY investmentId ASC, date ASC",
+        params + [days],
+    )
+    series: Dict[str, dict] = {}
+    for r in rows:
+        price = r["price"]
+        if price is None:
+            continue
+        entry = series.setdefault(str(r["investmentId"]), {"dates": [], "prices": []})
+        entry["dates"].append(r["date"])
+        entry["prices"].append(float(price))
+    if normalize:
+        for entry in series.values():
+            lo, hi = min(entry["prices"]), max(entry["prices"])
+            span = hi - lo
+            entry["points"] = [((p - lo) / span) if span else 0.5 for p in entry["prices"]]
+    return {"days": days, "start": start, "series": series}
+
+
+def compute_stats(conn) -> dict:
+    """Net-worth summary, mirroring DB.calculateStats in js/db.js but aggregated in SQL.
+
+    An account is a liability when its primary group (the part before '/', or the whole
+    legacy value "liability") is "liability"; includeInNetWorth NULL counts as included.
+    """
+    acc = conn.execute(
+        """
+        SELECT
+            COALESCE(SUM(CASE WHEN is_liability THEN 0 ELSE balance END), 0) AS accountAssets,
+            COALESCE(SUM(CASE WHEN is_liability AND included THEN ABS(balance) ELSE 0 END), 0) AS includedLiabilities,
+            COALESCE(SUM(CASE WHEN is_liability THEN ABS(balance) ELSE 0 END), 0) AS totalLiabilities,
+            COALESCE(SUM(CASE WHEN NOT is_liability AND included THEN balance ELSE 0 END), 0) AS includedAccountAssets
+        FROM (
+            SELECT
+                COALESCE(balance, 0) AS balance,
+                COALESCE(includeInNetWorth, 1) != 0 AS included,
+                CASE
+                    WHEN instr(COALESCE("group", ''), '/') > 0 THEN substr("group", 1, instr("group", '/') - 1) = 'liability'
+                    ELSE COALESCE("group", '') = 'liability'
+                END AS is_liability
+            FROM accounts
+        )
+        """
+    ).fetchone()
+    inv = conn.execute(
+        """
+        SELECT
+            COALESCE(SUM(quantity * currentPrice), 0) AS totalInvestmentValue,
+            COALESCE(SUM(quantity * costPrice), 0) AS totalInvestmentCost
+        FROM investments
+        """
+    ).fetchone()
+
+    total_value = float(inv["totalInvestmentValue"])
+    total_cost = float(inv["totalInvestmentCost"])
+    total_assets = float(acc["accountAssets"]) + total_value
+    total_liabilities = float(acc["totalLiabilities"])
+    net_worth = (float(acc["includedAccountAssets"]) + total_value) - float(acc["includedLiabilities"])
+    return {
+        "netWorth": net_worth,
+        "assets": total_assets,
+        "liabilities": total_liabilities,
+        "investments": total_value,
+        "totalAssets": total_assets,
+        "totalLiabilities": total_liabilities,
+        "totalInvestmentValue": total_value,
+        "totalInvestmentCost": total_cost,
+        "investmentProfit": total_value - total_cost,
+        "investmentProfitRate": ((total_value - total_cost) / total_cost * 100) if total_cost > 0 else 0,
+    }
+
+
+_STATS_CACHE: Dict[str, object] = {"version": None, "stats": None}
+_STATS_CACHE_LOCK = threading.Lock()
+
+
+def cached_stats(conn) -> dict:
+    """compute_stats, reused until the next DATA_VERSION bump."""
+    version = DATA_VERSION
+    with _STATS_CACHE_LOCK:
+        if _STATS_CACHE["version"] == version:
+            return dict(_STATS_CACHE["stats"])
+    stats = compute_stats(conn)
+    with _STATS_CACHE_LOCK:
+        _STATS_CACHE["version"] = version
+        _STATS_CACHE["stats"] = stats
+    return dict(stats)
+
+
+# Chart period -> bucket size, matching App.getDateGroupKey in js/app.js.
+CASHFLOW_PERIOD_BUCKETS = {"week": "day", "month": "day", "quarter": "week", "year": "month", "all": "month"}
+CASHFLOW_BUCKET_KEYS = {
+    "day": "substr(date, 1, 10)",
+    # Calendar year + ISO week number, like getWeekNumber(); the ISO week is the one holding
+    # the Thursday of this date's Monday-Sunday week.
+    "week": "strftime('%Y', substr(date, 1, 10)) || '-W' || "
+    "((CAST(strftime('%j', date(substr(date, 1, 10), '-3 days', 'weekday 4')) AS INTEGER) - 1) / 7 + 1)",
+    "month": "substr(date, 1, 7)",
+}
+
+
+def cashflow_rollup(conn, bucket: str, start=None, end=None, account_id=None) -> dict:
+    clauses = ["date IS NOT NULL", "date != ''"]
+    params = []
+    if start:
+        clauses.append("date >= ?")
+        params.append(start)
+    if end:
+        clause, value = end_date_clause(end)
+        clauses.append(clause)
+        params.append(value)
+    if account_id:
+        clauses.append("accountId = ?")
+        params.append(account_id)
+    key_expr = CASHFLOW_BUCKET_KEYS[bucket]
+    rows = conn.execute(
+        f"""
+        SELECT {key_expr} AS bucket,
+            SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS income,
+            SUM(CASE WHEN amount > 0 THEN 0 ELSE -amount END) AS expense,
+            MIN(date) AS firstDate
+        FROM transactions
+        WHERE {" AND ".join(clauses)}
+        GROUP BY bucket
+        ORDER BY firstDate ASC
+        """,
+        params,
+    ).fetchall()
+    return {
+        "bucket": bucket,
+        "keys": [r["bucket"] for r in rows],
+        "income": [float(r["income"] or 0) for r in rows],
+        "expense": [float(r["expense"] or 0) for r in rows],
+    }
+
+
+SNAPSHOT_FIELDS = (
+    "netWorth", "assets", "liabilities", "investments", "totalAssets", "totalLiabilities",
+    "totalInvestmentValue", "totalInvestmentCost", "investmentProfit", "investmentProfitRate",
+)
+SNAPSHOT_CATCH_UP_MAX_DAYS = 366
+
+
+SERIES_MAX_POINTS_DEFAULT = 500
+SERIES_MAX_POINTS_LIMIT = 5000
+
+
+def lttb_indices(xs: List[float], ys: List[float], threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the visual shape.
+
+    First and last points are always kept; each bucket in between contributes the point
+    forming the largest triangle with the previously kept point and the next bucket's mean.
+    """
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1]
+    out = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, min(end, n - 1)):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    out.append(n - 1)
+    return out
+
+
+def snapshot_series(conn, field: str, start=None, end=None, max_points: int = SERIES_MAX_POINTS_DEFAULT) -> dict:
+    clauses = []
+    params = []
+    if start:
+        clauses.append("date >= ?")
+        params.append(start)
+    if end:
+        clause, value = end_date_clause(end)
+        clauses.append(clause)
+        params.append(value)
+    sql = f"SELECT date, {field} AS value FROM snapshots"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY date ASC"
+    dates, xs, ys = [], [], []
+    for r in conn.execute(sql, params):
+        d = parse_date_str(str(r["date"])[:10])
+        dates.append(r["date"])
+        xs.append(float(d.toordinal()) if d else float(len(xs)))
+        ys.append(float(r["value"] or 0))
+    keep = lttb_indices(xs, ys, max_points)
+    return {
+        "field": field,
+        "total": len(dates),
+        "downsampled": len(keep) < len(dates),
+        "points": [{"date": dates[i], "value": ys[i]} for i in keep],
+    }
+
+
+def upsert_snapshot(conn, date: str, values: dict, ts: str):
+    conn.execute(
+        """
+        INSERT INTO snapshots
+        (date, netWorth, assets, liabilities, investments, totalAssets, totalLiabilities, totalInvestmentValue, totalInvestmentCost, investmentProfit, investmentProfitRate, createdAt, updatedAt)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(date) DO UPDATE SET
+            netWorth = excluded.netWorth,
+            assets = excluded.assets,
+            liabilities = excluded.liabilities,
+            investments = excluded.investments,
+            totalAssets = excluded.totalAssets,
+            totalLiabilities = excluded.totalLiabilities,
+            totalInvestmentValue = excluded.totalInvestmentValue,
+            totalInvestmentCost = excluded.totalInvestmentCost,
+            investmentProfit = excluded.investmentProfit,
+            investmentProfitRate = excluded.investmentProfitRate,
+            updatedAt = excluded.updatedAt
+        """,
+        (date, *[float(values.get(f) or 0) for f in SNAPSHOT_FIELDS], ts, ts),
+    )
+
+
+def record_snapshot(conn, date_str: str) -> dict:
+    """Upsert the snapshot for date_str from live data, first filling days missed since the
+    previous snapshot. Does not commit.
+
+    Past values can't be recomputed, so each missed day repeats the last recorded snapshot
+    (the same flat line the chart would draw across the gap).
+    """
+    ts = now_iso()
+    filled = 0
+    day = parse_date_str(date_str)
+    prev = conn.execute("SELECT * FROM snapshots WHERE date < ? ORDER BY date DESC LIMIT 1", (date_str,)).fetchone()
+    prev_day = parse_date_str(str(prev["date"])[:10]) if prev else None
+    if day and prev_day:
+        start = max(prev_day + timedelta(days=1), day - timedelta(days=SNAPSHOT_CATCH_UP_MAX_DAYS))
+        gap = []
+        d = start
+        while d < day:
+            gap.append((to_date_str(d), *[float(prev[f] or 0) for f in SNAPSHOT_FIELDS], ts, ts))
+            d += timedelta(days=1)
+        if gap:
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO snapshots
+                (date, netWorth, assets, liabilities, investments, totalAssets, totalLiabilities, totalInvestmentValue, totalInvestmentCost, investmentProfit, investmentProfitRate, createdAt, updatedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                gap,
+            )
+            filled = conn.total_changes - before
+
+    stats = compute_stats(conn)
+    upsert_snapshot(conn, date_str, stats, ts)
+    return {"date": date_str, "filled": filled, **stats}
+
+
+def _parse_time_of_day(value: str, default: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+    value = (value or "").strip().lower()
+    if not value:
+        return default
+    if value in ("off", "0", "false", "disabled"):
+        return None
+    try:
+        hour, minute = (int(p) for p in value.split(":", 1))
+    except Exception:
+        return default
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return default
+    return hour, minute
+
+
+class SnapshotRecorder(threading.Thread):
+    """Records the daily net-worth snapshot in-process, at startup and then every day at
+    a fixed local time, so history no longer depends on a browser tab being open."""
+
+    def __init__(self, at: Tuple[int, int]):
+        super().__init__(name="snapshot-recorder", daemon=True)
+        self.at = at
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _next_run(self, now: datetime) -> datetime:
+        target = now.replace(hour=self.at[0], minute=self.at[1], second=0, microsecond=0)
+        return target if target > now else target + timedelta(days=1)
+
+    def record(self):
+        conn = connect()
+        try:
+            record_snapshot(conn, to_date_str(local_today()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def run(self):
+        due = datetime.now()
+        while not self._stop_event.is_set():
+            now = datetime.now()
+            if now >= due:
+                try:
+                    self.record()
+                except Exception as e:
+                    print(f"Snapshot recorder error: {e}")
+                due = self._next_run(datetime.now())
+                continue
+            # Wake at least hourly so suspend/resume or clock changes can't push a run out by a day.
+            self._stop_event.wait(min((due - now).total_seconds(), 3600))
+
+
+class RecurringScheduler(threading.Thread):
+    """Runs recurring rules as they fall due instead of waiting for a client to call runDue.
+
+    A heap keyed on (nextRun, id) holds one live entry per enabled rule; entries superseded
+    by schedule()/unschedule() stay in the heap and are skipped when they surface. The
+    thread sleeps until local midnight of the earliest nextRun (waking at least hourly),
+    runs the due rules in one transaction and pushes them back at their new nextRun.
+    """
+
+    RETRY_SECONDS = 60
+
+    def __init__(self):
+        super().__init__(name="recurring-scheduler", daemon=True)
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[str, int, int]] = []
+        self._live: Dict[int, int] = {}
+        self._seq = 0
+        self._reload = True
+        self._stopped = False
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def reload(self):
+        """Rebuild the heap from the database on the scheduler thread (e.g. after a file swap)."""
+        with self._cond:
+            self._reload = True
+            self._cond.notify()
+
+    def _push(self, rule_id: int, due: str):
+        self._seq += 1
+        self._live[rule_id] = self._seq
+        heapq.heappush(self._heap, (due, rule_id, self._seq))
+
+    def schedule(self, rule_id: int, next_run: Optional[str], enabled: bool = True):
+        with self._cond:
+            if enabled:
+                # An empty nextRun gets its initial date computed on the next run, so it's due now.
+                self._push(int(rule_id), str(next_run or ""))
+            else:
+                self._live.pop(int(rule_id), None)
+            self._cond.notify()
+
+    def unschedule(self, rule_id: int):
+        self.schedule(rule_id, None, enabled=False)
+
+    def _load(self):
+        conn = connect(write=False)
+        try:
+            rows = conn.execute("SELECT id, nextRun FROM recurringRules WHERE enabled = 1").fetchall()
+        finally:
+            conn.close()
+        with self._cond:
+            self._heap = []
+            self._live = {}
+            for r in rows:
+                self._push(int(r["id"]), str(r["nextRun"] or ""))
+
+    def _pop_due(self, today_str: str) -> List[int]:
+        due = []
+        while self._heap:
+            key, rule_id, seq = self._heap[0]
+            if self._live.get(rule_id) != seq:
+                heapq.heappop(self._heap)
+                continue
+            if key > today_str:
+                break
+            heapq.heappop(self._heap)
+            del self._live[rule_id]
+            due.append(rule_id)
+        return due
+
+    def _seconds_until_due(self, now: datetime) -> float:
+        while self._heap and self._live.get(self._heap[0][1]) != self._heap[0][2]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return 3600
+        try:
+            due = datetime.strptime(self._heap[0][0], "%Y-%m-%d")
+        except ValueError:
+            return 3600
+        return min(max((due - now).total_seconds(), 0.0), 3600)
+
+    def run_rules(self, rule_ids: List[int], today) -> dict:
+        conn = connect()
+        try:
+            result = run_due_recurring(conn, today, rule_ids=rule_ids)
+            if result["executed"]:
+                record_snapshot(conn, to_date_str(today))
+            placeholders = ",".join("?" for _ in rule_ids)
+            rows = conn.execute(
+                f"SELECT id, enabled, nextRun FROM recurringRules WHERE id IN ({placeholders})", rule_ids
+            ).fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+
+        # A rule that couldn't run (missing account, zero price...) stays due; retry it tomorrow
+        # rather than spinning on it.
+        tomorrow = to_date_str(today + timedelta(days=1))
+        with self._cond:
+            for r in rows:
+                rule_id = int(r["id"])
+                if r["enabled"] and rule_id not in self._live:
+                    self._push(rule_id, max(str(r["nextRun"] or ""), tomorrow))
+        return result
+
+    def run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                reload, self._reload = self._reload, False
+            try:
+                if reload:
+                    self._load()
+                today = local_today()
+                with self._cond:
+                    if self._stopped or self._reload:
+                        continue
+                    due = self._pop_due(to_date_str(today))
+                    if not due:
+                        self._cond.wait(self._seconds_until_due(datetime.now()))
+                        continue
+                self.run_rules(due, today)
+            except Exception as e:
+                print(f"Recurring scheduler error: {e}")
+                with self._cond:
+                    self._reload = True
+                    self._cond.wait(self.RETRY_SECONDS)
+
+
+RECURRING_SCHEDULER: Optional[RecurringScheduler] = None
+
+
+def notify_recurring_rule(conn, rule_id: int, next_run: Optional[str] = None, enabled: bool = True):
+    """Once `conn` commits, reschedule (or with enabled=False drop) a rule in the running scheduler."""
+    scheduler = RECURRING_SCHEDULER
+    if scheduler is not None:
+        conn.on_commit(lambda: scheduler.schedule(rule_id, next_run, enabled))
+
+
+BATCH_MAX_OPERATIONS = 500
+# Routes that manage their own transaction or stream their body can't join a batch.
+BATCH_EXCLUDED_PATHS = ("/api/batch", "/api/import", "/api/export")
+
+
+class _BatchAbort(Exception):
+    def __init__(self, index, status, payload):
+        super().__init__(index)
+        self.index = index
+        self.status = status
+        self.payload = payload
+
+
+class _BatchConn:
+    """Connection view for batch sub-requests: their commits are deferred to the batch."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        pass
+
+
+class Handler(SimpleHTTPRequestHandler):
+    # Validator for the GET being answered, set by _handle_api and attached to its 200 reply.
+    _etag = None
+    # (key, tables, token) when the GET being answered may be stored in RESPONSE_CACHE.
+    _cache_entry = None
+    # Whether _read_json already took this request's body off the connection.
+    _body_consumed = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=str(ROOT_DIR), **kwargs)
+
+    def handle_one_request(self):
+        self._body_consumed = False
+        if not self._wait_for_request():
+            self.close_connection = True
+            return
+        super().handle_one_request()
+        if self.close_connection:
+            return
+        self._discard_body()
+
+    def end_headers(self):
+        # Hand the worker to a queued connection rather than waiting for this one's next request.
+        if not self.close_connection and getattr(self.server, "has_waiting", None) and self.server.has_waiting():
+            self.send_header("Connection", "close")
+        super().end_headers()
+
+    def _wait_for_request(self) -> bool:
+        """On a pooled server, wait for the next request line in short polls.
+
+        Returns False (close the connection) once the keep-alive timeout passes, or as soon
+        as another connection is queued, so an idle browser socket never holds a worker.
+        """
+        has_waiting = getattr(self.server, "has_waiting", None)
+        if has_waiting is None:
+            return True
+        if self._has_buffered_input():
+            return True
+        deadline = time.monotonic() + KEEPALIVE_TIMEOUT
+        while True:
+            try:
+                readable, _w, _x = select.select([self.connection], [], [], KEEPALIVE_POLL_INTERVAL)
+            except (OSError, ValueError):
+                return False
+            if readable:
+                return True
+            if has_waiting() or time.monotonic() >= deadline:
+                return False
+
+    def _has_buffered_input(self) -> bool:
+        # A pipelined request may already sit in rfile's buffer, where select() can't see it.
+        timeout = self.connection.gettimeout()
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except (BlockingIOError, OSError, ValueError):
+            return False
+        finally:
+            self.connection.settimeout(timeout)
+
+    def _discard_body(self):
+        """Skip a request body the handler never read, so a persistent connection stays in sync."""
+        if self._body_consumed or self.headers is None:
+            return
+        if self.headers.get("Transfer-Encoding"):
+            self.close_connection = True
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0") or "0")
+        except ValueError:
+            length = -1
+        if length < 0 or length > KEEPALIVE_DISCARD_MAX:
+            self.close_connection = True
+        elif length:
+            self.rfile.read(length)
+
+    def _send_validators(self, status, encoding=None):
+        if self._etag and status == 200:
+            self.send_header("ETag", encoded_etag(self._etag, encoding))
+            self.send_header("Cache-Control", "no-cache")
+
+    def _accepted_encoding(self) -> Optional[str]:
+        return choose_encoding(self.headers.get("Accept-Encoding")) if self.headers else None
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        cache_key = None
+        if self._cache_entry and status == 200:
+            RESPONSE_CACHE.put(*self._cache_entry, data)
+            cache_key = self._cache_entry[0]
+        self._send_json_bytes(status, data, cache_key)
+
+    def _send_json_bytes(self, status, data: bytes, cache_key=None):
+        """Send an encoded JSON body, compressed when it is large enough and the client accepts it.
+
+        With cache_key, the compressed form is reused from (and stored in) RESPONSE_CACHE.
+        """
+        encoding = self._accepted_encoding() if len(data) >= COMPRESS_MIN_BYTES else None
+        body = data
+        if encoding:
+            body = RESPONSE_CACHE.get_variant(cache_key, data, encoding) if cache_key else None
+            if body is None:
+                body = compress_body(data, encoding)
+                if cache_key:
+                    RESPONSE_CACHE.put_variant(cache_key, data, encoding, body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if len(data) >= COMPRESS_MIN_BYTES:
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self._send_validators(status, encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _send_static_asset(self, head: bool = False) -> bool:
+        """Serve index.html, manifest.json, css/, js/ or icons/ from STATIC_ASSETS.
+
+        URLs carrying the asset's current ?v=<hash> are cacheable for a year; everything
+        else is revalidated with its ETag. Returns False for paths outside the table.
+        """
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        if path.endswith("/"):
+            path += "index.html"
+        asset = STATIC_ASSETS.lookup(path)
+        if asset is None:
+            return False
+        if (parse_qs(parsed.query).get("v") or [None])[0] == asset.digest:
+            cache_control = f"public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            cache_control = "no-cache"
+        encoding = self._accepted_encoding() if asset.compressible else None
+        etag = encoded_etag(asset.etag, encoding)
+        inm = self.headers.get("If-None-Match")
+        if etag_matches(inm, asset.etag) or (not inm and self._not_modified_since(asset.mtime_ns)):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return True
+        body = STATIC_ASSETS.encoded(asset, encoding) if encoding else asset.body
+        self.send_response(200)
+        self.send_header("Content-Type", asset.content_type)
+        if asset.compressible:
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", asset.last_modified)
+        self.send_header("Cache-Control", cache_control)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+        return True
+
+    def _not_modified_since(self, mtime_ns: int) -> bool:
+        ims = self.headers.get("If-Modified-Since")
+        if not ims:
+            return False
+        try:
+            return mtime_ns // 1_000_000_000 <= email.utils.parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+
+    def _send_json_stream(self, status, pieces, flush_size=64 * 1024):
+        """Send JSON text produced incrementally by `pieces`.
+
+        HTTP/1.1 requests get Transfer-Encoding: chunked; HTTP/1.0 ones get the body
+        delimited by closing the connection. Pieces are coalesced into ~flush_size chunks.
+        """
+        chunked = self.request_version == "HTTP/1.1" and self.protocol_version == "HTTP/1.1"
+        encoding = self._accepted_encoding()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+            compress, finish = stream_compressor(encoding)
+        self._send_validators(status, encoding)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+
+        def write(data: bytes, last: bool = False):
+            if encoding:
+                data = compress(data) + (finish() if last else b"")
+            if not data:
+                return
+            if chunked:
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            else:
+                self.wfile.write(data)
+
+        buf = []
+        size = 0
+        for piece in pieces:
+            data = piece.encode("utf-8")
+            buf.append(data)
+            size += len(data)
+            if size >= flush_size:
+                write(b"".join(buf))
+                buf = []
+                size = 0
+        write(b"".join(buf), last=True)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", "0") or "0")
+        if length <= 0 or self._body_consumed:
+            return None
+        self._body_consumed = True
+        raw = self.rfile.read(length)
+        if not raw:
+            return None
+        return json.loads(raw.decode("utf-8"))
+
+    def _not_found(self):
+        self._send_json(404, {"error": "not_found"})
+
+    def _bad_request(self, message="bad_request"):
+        self._send_json(400, {"error": message})
+
+    def _method_not_allowed(self):
+        self._send_json(405, {"error": "method_not_allowed"})
+
+    def _handle_api(self):
+        global DB_PATH
+        parsed = urlparse(self.path)
+        path = parsed.path
+        query = parse_qs(parsed.query)
+        self._etag = None
+        self._cache_entry = None
+
+        if path == "/api/health":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            return self._send_json(
+                200, {"ok": True, "recurringScheduler": RECURRING_SCHEDULER is not None, "responseCache": RESPONSE_CACHE.stats()}
+            )
+
+        if path == "/api/config":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            return self._send_json(200, {"dbPath": str(DB_PATH)})
+
+        if path == "/api/config/dbPath":
+            if self.command != "POST":
+                return self._method_not_allowed()
+            body = self._read_json() or {}
+            raw = body.get("dbPath")
+            if not raw or not isinstance(raw, str):
+                return self._bad_request("invalid_db_path")
+
+            try:
+                p = Path(raw).expanduser()
+            except Exception:
+                return self._bad_request("invalid_db_path")
+
+            if not p.is_absolute():
+                return self._bad_request("db_path_must_be_absolute")
+
+            if p.suffix.lower() != ".db":
+                return self._bad_request("db_path_must_end_with_db")
+
+            try:
+                p.parent.mkdir(parents=True, exist_ok=True)
+            except Exception:
+                return self._bad_request("db_path_parent_unwritable")
+
+            DB_RW_LOCK.acquire_exclusive()
+            try:
+                DB_POOL.drain()
+                DB_PATH = p
+                init_db()
+            finally:
+                DB_RW_LOCK.release_exclusive()
+            return self._send_json(200, {"ok": True, "dbPath": str(DB_PATH)})
+
+        if path == "/api/config/resetDbPath":
+            if self.command != "POST":
+                return self._method_not_allowed()
+            DB_RW_LOCK.acquire_exclusive()
+            try:
+                DB_POOL.drain()
+                DB_PATH = ROOT_DIR / "openpercento.db"
+                init_db()
+            finally:
+                DB_RW_LOCK.release_exclusive()
+            return self._send_json(200, {"ok": True, "dbPath": str(DB_PATH)})
+
+        if path in ("/api/webdav/propfind", "/api/webdav/propfind/"):
+            if self.command != "POST":
+                return self._method_not_allowed()
+            
+            body = self._read_json() or {}
+            webdav_url = body.get("url")
+            username = body.get("username")
+            password = body.get("password")
+            
+            if webdav_url is None or username is None or password is None or not str(webdav_url).strip():
+                return self._bad_request("missing_credentials")
             
             base = str(webdav_url).strip()
             status, resp_body, url_error = _webdav_request(
@@ -792,6 +3353,11 @@ class Handler(SimpleHTTPRequestHandler):
             local_mtime = None
             if local_exists:
                 try:
+                    DB_RW_LOCK.acquire_exclusive()
+                    try:
+                        checkpoint_db(local_path)
+                    finally:
+                        DB_RW_LOCK.release_exclusive()
                     st = local_path.stat()
                     local_size = int(st.st_size)
                     local_mtime = float(st.st_mtime)
@@ -846,14 +3412,12 @@ class Handler(SimpleHTTPRequestHandler):
                 if not local_exists:
                     return self._send_json(200, {"ok": False, "error": "local_db_missing"})
                 try:
-                    DB_IO_LOCK.acquire()
+                    DB_RW_LOCK.acquire_exclusive()
                     try:
+                        checkpoint_db(local_path)
                         data = local_path.read_bytes()
                     finally:
-                        try:
-                            DB_IO_LOCK.release()
-                        except Exception:
-                            pass
+                        DB_RW_LOCK.release_exclusive()
                 except Exception as e:
                     return self._send_json(200, {"ok": False, "error": "read_local_failed", "message": str(e)})
 
@@ -924,32 +3488,31 @@ class Handler(SimpleHTTPRequestHandler):
                         msg = None
                     return self._send_json(200, {"ok": False, "error": "http_error", "status": status, "message": msg, "url": remote_file_url})
 
-                DB_IO_LOCK.acquire()
+                tmp = None
                 try:
-                    tmp = None
+                    with tempfile.NamedTemporaryFile(prefix="openpercento_", suffix=".db", dir=str(ROOT_DIR), delete=False) as f:
+                        tmp = f.name
+                        f.write(resp_body or b"")
+                    DB_RW_LOCK.acquire_exclusive()
                     try:
-                        with tempfile.NamedTemporaryFile(prefix="openpercento_", suffix=".db", dir=str(ROOT_DIR), delete=False) as f:
-                            tmp = f.name
-                            f.write(resp_body or b"")
+                        DB_POOL.drain()
                         os.replace(tmp, str(local_path))
                         tmp = None
+                        remove_wal_files(local_path)
+                        init_db()
                         if remote_mtime:
                             try:
                                 os.utime(str(local_path), (float(remote_mtime), float(remote_mtime)))
                             except Exception:
                                 pass
-                        init_db()
                     finally:
-                        if tmp:
-                            try:
-                                os.unlink(tmp)
-                            except Exception:
-                                pass
+                        DB_RW_LOCK.release_exclusive()
                 finally:
-                    try:
-                        DB_IO_LOCK.release()
-                    except Exception:
-                        pass
+                    if tmp:
+                        try:
+                            os.unlink(tmp)
+                        except Exception:
+                            pass
 
                 return self._send_json(
                     200,
@@ -972,794 +3535,867 @@ class Handler(SimpleHTTPRequestHandler):
                 },
             )
 
-        def parse_id(segment):
-            try:
-                return int(segment)
-            except Exception:
-                return None
-
-        conn = connect()
+        if path == "/api/quotes/refresh":
+            if self.command != "POST":
+                return self._method_not_allowed()
+            body = self._read_json() or {}
+            ids = body.get("ids") if isinstance(body, dict) else None
+            if ids is not None:
+                try:
+                    ids = [int(x) for x in ids]
+                except Exception:
+                    return self._bad_request("invalid_ids")
+            date = body.get("date") if isinstance(body, dict) else None
+            if date and not parse_date_str(str(date)):
+                return self._bad_request("invalid_date")
+            force = bool(body.get("force")) if isinstance(body, dict) else False
+            return self._send_json(200, {"ok": True, **refresh_investment_quotes(ids=ids, date_str=date, force=force)})
+
+        if path == "/api/batch":
+            if self.command != "POST":
+                return self._method_not_allowed()
+            body = self._read_json()
+            ops = body.get("operations") if isinstance(body, dict) else body
+            if not isinstance(ops, list) or not ops:
+                return self._bad_request("missing_operations")
+            if len(ops) > BATCH_MAX_OPERATIONS:
+                return self._bad_request("too_many_operations")
+            conn = connect()
+            try:
+                return self._send_json(200, self._run_batch(conn, ops))
+            finally:
+                conn.close()
+
+        if self.command == "GET":
+            # Answered from the in-memory data version alone; SQLite is only opened on a miss.
+            etag = api_etag(path, parsed.query)
+            if etag_matches(self.headers.get("If-None-Match"), etag):
+                return self._send_not_modified(encoded_etag(etag, self._accepted_encoding()))
+            self._etag = etag
+            tables = RESPONSE_CACHE.tables_for(path)
+            if tables is not None:
+                key = (path, parsed.query, to_date_str(local_today()))
+                data = RESPONSE_CACHE.get(key)
+                if data is not None:
+                    return self._send_json_bytes(200, data, key)
+                self._cache_entry = (key, tables, RESPONSE_CACHE.token(tables))
+
+        conn = connect(write=self.command != "GET")
         try:
-            if path == "/api/recurring":
-                if self.command == "GET":
-                    kind = (query.get("kind") or [None])[0]
-                    account_id = parse_id((query.get("accountId") or [None])[0])
-                    investment_id = parse_id((query.get("investmentId") or [None])[0])
-
-                    where = []
-                    params = []
-                    if kind:
-                        where.append("kind = ?")
-                        params.append(kind)
-                    if account_id:
-                        where.append("accountId = ?")
-                        params.append(account_id)
-                    if investment_id:
-                        where.append("investmentId = ?")
-                        params.append(investment_id)
-
-                    sql = "SELECT * FROM recurringRules"
-                    if where:
-                        sql += " WHERE " + " AND ".join(where)
-                    sql += " ORDER BY id DESC"
-
-                    rows = conn.execute(sql, tuple(params)).fetchall()
-                    return self._send_json(200, [row_to_dict(r) for r in rows])
+            return self._handle_db_api(conn, path, query)
+        finally:
+            conn.close()
 
-                if self.command == "POST":
-                    body = self._read_json() or {}
-                    created_at = body.get("createdAt") or now_iso()
-                    updated_at = body.get("updatedAt") or now_iso()
-                    cur = conn.execute(
-                        """
-                        INSERT INTO recurringRules (
-                            kind, action, accountId, fromAccountId, toAccountId, investmentId,
-                            frequency, weekday, monthDay, yearDay, amount, note, enabled, nextRun, lastRun,
-                            createdAt, updatedAt
-                        )
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            body.get("kind") or "",
-                            body.get("action") or "",
-                            body.get("accountId"),
-                            body.get("fromAccountId"),
-                            body.get("toAccountId"),
-                            body.get("investmentId"),
-                            body.get("frequency") or "",
-                            body.get("weekday"),
-                            body.get("monthDay"),
-                            body.get("yearDay"),
-                            float(body.get("amount") or 0),
-                            body.get("note"),
-                            1 if body.get("enabled") else 0,
-                            body.get("nextRun") or "",
-                            body.get("lastRun"),
-                            created_at,
-                            updated_at,
-                        ),
-                    )
-                    conn.commit()
-                    return self._send_json(200, {"id": cur.lastrowid})
-                return self._method_not_allowed()
+    def _run_batch(self, conn, ops):
+        """Run sub-requests in order through _handle_db_api, all inside one transaction.
 
-            if path == "/api/recurring/runDue":
-                if self.command != "POST":
-                    return self._method_not_allowed()
-                today = datetime.now().date()
-                today_str = today.isoformat()
-                rows = conn.execute("SELECT * FROM recurringRules WHERE enabled = 1 ORDER BY id ASC").fetchall()
-                processed = 0
-                executed = 0
-                updated_at = now_iso()
-                for row in rows:
-                    rule = row_to_dict(row)
-                    next_run = str(rule.get("nextRun") or "")
-                    if not next_run:
-                        next_run = compute_initial_next_run(rule, today)
-                        rule["nextRun"] = next_run
-                        conn.execute(
-                            "UPDATE recurringRules SET nextRun = ?, updatedAt = ? WHERE id = ?",
-                            (next_run, updated_at, int(rule["id"])),
-                        )
+        The first operation answering with a 4xx/5xx (or raising) rolls everything back.
+        """
+        results = []
+        batch_conn = _BatchConn(conn)
+        conn.execute("BEGIN")
+        try:
+            for index, op in enumerate(ops):
+                if not isinstance(op, dict):
+                    raise _BatchAbort(index, 400, {"error": "invalid_operation"})
+                method = str(op.get("method") or "GET").upper()
+                parsed = urlparse(str(op.get("path") or ""))
+                if method not in ("GET", "POST", "PUT", "DELETE") or not parsed.path.startswith("/api/"):
+                    raise _BatchAbort(index, 400, {"error": "invalid_operation"})
+                if parsed.path in BATCH_EXCLUDED_PATHS:
+                    raise _BatchAbort(index, 400, {"error": "operation_not_batchable"})
+                sub = _BatchOperation(method, op.get("body"))
+                try:
+                    sub._handle_db_api(batch_conn, parsed.path, parse_qs(parsed.query))
+                except Exception as e:
+                    raise _BatchAbort(index, 500, {"error": "operation_failed", "message": str(e)})
+                if sub.result_status >= 400:
+                    raise _BatchAbort(index, sub.result_status, sub.result_payload)
+                results.append({"status": sub.result_status, "body": sub.result_payload})
+            conn.commit()
+        except _BatchAbort as abort:
+            conn.rollback()
+            results.append({"status": abort.status, "body": abort.payload})
+            return {"ok": False, "failedIndex": abort.index, "results": results}
+        except Exception:
+            conn.rollback()
+            raise
+        return {"ok": True, "results": results}
 
-                    guard = 0
-                    while next_run and next_run <= today_str and guard < 366:
-                        processed += 1
-                        ran = execute_recurring_rule(conn, rule, next_run)
-                        if not ran:
-                            break
-                        executed += 1
-                        rule["lastRun"] = next_run
-                        rule["nextRun"] = compute_next_run(rule, next_run)
-                        next_run = str(rule.get("nextRun") or "")
-                        conn.execute(
-                            "UPDATE recurringRules SET lastRun = ?, nextRun = ?, updatedAt = ? WHERE id = ?",
-                            (rule["lastRun"], rule["nextRun"], updated_at, int(rule["id"])),
-                        )
-                        guard += 1
+    def _handle_db_api(self, conn, path, query):
+        def parse_id(segment):
+            try:
+                return int(segment)
+            except Exception:
+                return None
 
+        if path == "/api/recurring":
+            if self.command == "GET":
+                kind = (query.get("kind") or [None])[0]
+                account_id = parse_id((query.get("accountId") or [None])[0])
+                investment_id = parse_id((query.get("investmentId") or [None])[0])
+
+                where = []
+                params = []
+                if kind:
+                    where.append("kind = ?")
+                    params.append(kind)
+                if account_id:
+                    where.append("accountId = ?")
+                    params.append(account_id)
+                if investment_id:
+                    where.append("investmentId = ?")
+                    params.append(investment_id)
+
+                sql = "SELECT * FROM recurringRules"
+                if where:
+                    sql += " WHERE " + " AND ".join(where)
+                sql += " ORDER BY id DESC"
+
+                rows = conn.execute(sql, tuple(params)).fetchall()
+                return self._send_json(200, [row_to_dict(r) for r in rows])
+
+            if self.command == "POST":
+                body = self._read_json() or {}
+                created_at = body.get("createdAt") or now_iso()
+                updated_at = body.get("updatedAt") or now_iso()
+                cur = conn.execute(
+                    """
+                    INSERT INTO recurringRules (
+                        kind, action, accountId, fromAccountId, toAccountId, investmentId,
+                        frequency, weekday, monthDay, yearDay, amount, note, enabled, nextRun, lastRun,
+                        createdAt, updatedAt
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        body.get("kind") or "",
+                        body.get("action") or "",
+                        body.get("accountId"),
+                        body.get("fromAccountId"),
+                        body.get("toAccountId"),
+                        body.get("investmentId"),
+                        body.get("frequency") or "",
+                        body.get("weekday"),
+                        body.get("monthDay"),
+                        body.get("yearDay"),
+                        float(body.get("amount") or 0),
+                        body.get("note"),
+                        1 if body.get("enabled") else 0,
+                        body.get("nextRun") or "",
+                        body.get("lastRun"),
+                        created_at,
+                        updated_at,
+                    ),
+                )
+                notify_recurring_rule(conn, cur.lastrowid, body.get("nextRun") or "", bool(body.get("enabled")))
                 conn.commit()
-                return self._send_json(200, {"processed": processed, "executed": executed})
+                return self._send_json(200, {"id": cur.lastrowid})
+            return self._method_not_allowed()
 
-            if path.startswith("/api/recurring/"):
-                rule_id = parse_id(path.split("/")[-1])
-                if not rule_id:
-                    return self._bad_request("invalid_id")
-                if self.command == "GET":
-                    row = conn.execute("SELECT * FROM recurringRules WHERE id = ?", (rule_id,)).fetchone()
-                    if not row:
-                        return self._not_found()
-                    return self._send_json(200, row_to_dict(row))
-                if self.command == "PUT":
-                    body = self._read_json() or {}
-                    updated_at = now_iso()
-                    conn.execute(
-                        """
-                        UPDATE recurringRules SET
-                            kind = ?, action = ?, accountId = ?, fromAccountId = ?, toAccountId = ?, investmentId = ?,
-                            frequency = ?, weekday = ?, monthDay = ?, yearDay = ?, amount = ?, note = ?, enabled = ?,
-                            nextRun = ?, lastRun = ?, updatedAt = ?
-                        WHERE id = ?
-                        """,
-                        (
-                            body.get("kind") or "",
-                            body.get("action") or "",
-                            body.get("accountId"),
-                            body.get("fromAccountId"),
-                            body.get("toAccountId"),
-                            body.get("investmentId"),
-                            body.get("frequency") or "",
-                            body.get("weekday"),
-                            body.get("monthDay"),
-                            body.get("yearDay"),
-                            float(body.get("amount") or 0),
-                            body.get("note"),
-                            1 if body.get("enabled") else 0,
-                            body.get("nextRun") or "",
-                            body.get("lastRun"),
-                            updated_at,
-                            rule_id,
-                        ),
-                    )
-                    conn.commit()
-                    return self._send_json(200, {"id": rule_id})
-                if self.command == "DELETE":
-                    conn.execute("DELETE FROM recurringRules WHERE id = ?", (rule_id,))
-                    conn.commit()
-                    return self._send_json(200, {"ok": True})
+        if path == "/api/recurring/runDue":
+            if self.command != "POST":
                 return self._method_not_allowed()
+            body = self._read_json() or {}
+            lang = body.get("lang") if isinstance(body, dict) else None
+            changes = conn.total_changes
+            result = run_due_recurring(conn, local_today(), lang=lang)
+            if conn.total_changes != changes and RECURRING_SCHEDULER is not None:
+                conn.on_commit(RECURRING_SCHEDULER.reload)
+            conn.commit()
+            return self._send_json(200, result)
+
+        if path.startswith("/api/recurring/"):
+            rule_id = parse_id(path.split("/")[-1])
+            if not rule_id:
+                return self._bad_request("invalid_id")
+            if self.command == "GET":
+                row = conn.execute("SELECT * FROM recurringRules WHERE id = ?", (rule_id,)).fetchone()
+                if not row:
+                    return self._not_found()
+                return self._send_json(200, row_to_dict(row))
+            if self.command == "PUT":
+                body = self._read_json() or {}
+                updated_at = now_iso()
+                conn.execute(
+                    """
+                    UPDATE recurringRules SET
+                        kind = ?, action = ?, accountId = ?, fromAccountId = ?, toAccountId = ?, investmentId = ?,
+                        frequency = ?, weekday = ?, monthDay = ?, yearDay = ?, amount = ?, note = ?, enabled = ?,
+                        nextRun = ?, lastRun = ?, updatedAt = ?
+                    WHERE id = ?
+                    """,
+                    (
+                        body.get("kind") or "",
+                        body.get("action") or "",
+                        body.get("accountId"),
+                        body.get("fromAccountId"),
+                        body.get("toAccountId"),
+                        body.get("investmentId"),
+                        body.get("frequency") or "",
+                        body.get("weekday"),
+                        body.get("monthDay"),
+                        body.get("yearDay"),
+                        float(body.get("amount") or 0),
+                        body.get("note"),
+                        1 if body.get("enabled") else 0,
+                        body.get("nextRun") or "",
+                        body.get("lastRun"),
+                        updated_at,
+                        rule_id,
+                    ),
+                )
+                notify_recurring_rule(conn, rule_id, body.get("nextRun") or "", bool(body.get("enabled")))
+                conn.commit()
+                return self._send_json(200, {"id": rule_id})
+            if self.command == "DELETE":
+                conn.execute("DELETE FROM recurringRules WHERE id = ?", (rule_id,))
+                notify_recurring_rule(conn, rule_id, enabled=False)
+                conn.commit()
+                return self._send_json(200, {"ok": True})
+            return self._method_not_allowed()
 
-            if path == "/api/accounts":
-                if self.command == "GET":
-                    rows = conn.execute("SELECT * FROM accounts ORDER BY id ASC").fetchall()
+        if path == "/api/accounts":
+            if self.command == "GET":
+                rows = conn.execute("SELECT * FROM accounts ORDER BY id ASC").fetchall()
+                return self._send_json(200, [row_to_dict(r) for r in rows])
+            if self.command == "POST":
+                body = self._read_json() or {}
+                created_at = body.get("createdAt") or now_iso()
+                updated_at = body.get("updatedAt") or now_iso()
+                cur = conn.execute(
+                    'INSERT INTO accounts (name, "group", balance, icon, includeInNetWorth, billingDay, repaymentDay, note, createdAt, updatedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        body.get("name") or "",
+                        body.get("group") or "",
+                        float(body.get("balance") or 0),
+                        body.get("icon"),
+                        1 if body.get("includeInNetWorth", True) else 0,
+                        body.get("billingDay"),
+                        body.get("repaymentDay"),
+                        body.get("note"),
+                        created_at,
+                        updated_at,
+                    ),
+                )
+                conn.commit()
+                return self._send_json(200, {"id": cur.lastrowid})
+            return self._method_not_allowed()
+
+        if path.startswith("/api/accounts/"):
+            account_id = parse_id(path.split("/")[-1])
+            if not account_id:
+                return self._bad_request("invalid_id")
+            if self.command == "GET":
+                row = conn.execute("SELECT * FROM accounts WHERE id = ?", (account_id,)).fetchone()
+                if not row:
+                    return self._not_found()
+                return self._send_json(200, row_to_dict(row))
+            if self.command == "PUT":
+                body = self._read_json() or {}
+                updated_at = now_iso()
+                conn.execute(
+                    'UPDATE accounts SET name = ?, "group" = ?, balance = ?, icon = ?, includeInNetWorth = ?, billingDay = ?, repaymentDay = ?, note = ?, updatedAt = ? WHERE id = ?',
+                    (
+                        body.get("name") or "",
+                        body.get("group") or "",
+                        float(body.get("balance") or 0),
+                        body.get("icon"),
+                        1 if body.get("includeInNetWorth", True) else 0,
+                        body.get("billingDay"),
+                        body.get("repaymentDay"),
+                        body.get("note"),
+                        updated_at,
+                        account_id,
+                    ),
+                )
+                conn.commit()
+                return self._send_json(200, {"id": account_id})
+            if self.command == "DELETE":
+                conn.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
+                conn.commit()
+                return self._send_json(200, {"ok": True})
+            return self._method_not_allowed()
+
+        if path == "/api/transactions":
+            if self.command == "GET":
+                account_id = parse_id((query.get("accountId") or [None])[0])
+                start = (query.get("startDate") or [None])[0]
+                end = (query.get("endDate") or [None])[0]
+                tx_type = (query.get("type") or [None])[0]
+                before = (query.get("before") or [None])[0]
+                after = (query.get("after") or [None])[0]
+                raw_limit = (query.get("limit") or [None])[0]
+
+                clauses = []
+                params = []
+                if account_id:
+                    clauses.append("accountId = ?")
+                    params.append(account_id)
+                if start:
+                    clauses.append("date >= ?")
+                    params.append(start)
+                if end:
+                    clause, value = end_date_clause(end)
+                    clauses.append(clause)
+                    params.append(value)
+                if tx_type:
+                    clauses.append("type = ?")
+                    params.append(tx_type)
+
+                if raw_limit is None and not before and not after:
+                    sql = "SELECT * FROM transactions"
+                    if clauses:
+                        sql += " WHERE " + " AND ".join(clauses)
+                    sql += " ORDER BY date DESC, id DESC"
+                    rows = conn.execute(sql, params).fetchall()
                     return self._send_json(200, [row_to_dict(r) for r in rows])
-                if self.command == "POST":
-                    body = self._read_json() or {}
-                    created_at = body.get("createdAt") or now_iso()
-                    updated_at = body.get("updatedAt") or now_iso()
-                    cur = conn.execute(
-                        'INSERT INTO accounts (name, "group", balance, icon, includeInNetWorth, billingDay, repaymentDay, note, createdAt, updatedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                        (
-                            body.get("name") or "",
-                            body.get("group") or "",
-                            float(body.get("balance") or 0),
-                            body.get("icon"),
-                            1 if body.get("includeInNetWorth", True) else 0,
-                            body.get("billingDay"),
-                            body.get("repaymentDay"),
-                            body.get("note"),
-                            created_at,
-                            updated_at,
-                        ),
-                    )
-                    conn.commit()
-                    return self._send_json(200, {"id": cur.lastrowid})
-                return self._method_not_allowed()
 
-            if path.startswith("/api/accounts/"):
-                account_id = parse_id(path.split("/")[-1])
-                if not account_id:
-                    return self._bad_request("invalid_id")
-                if self.command == "GET":
-                    row = conn.execute("SELECT * FROM accounts WHERE id = ?", (account_id,)).fetchone()
-                    if not row:
-                        return self._not_found()
-                    return self._send_json(200, row_to_dict(row))
-                if self.command == "PUT":
-                    body = self._read_json() or {}
-                    updated_at = now_iso()
-                    conn.execute(
-                        'UPDATE accounts SET name = ?, "group" = ?, balance = ?, icon = ?, includeInNetWorth = ?, billingDay = ?, repaymentDay = ?, note = ?, updatedAt = ? WHERE id = ?',
-                        (
-                            body.get("name") or "",
-                            body.get("group") or "",
-                            float(body.get("balance") or 0),
-                            body.get("icon"),
-                            1 if body.get("includeInNetWorth", True) else 0,
-                            body.get("billingDay"),
-                            body.get("repaymentDay"),
-                            body.get("note"),
-                            updated_at,
-                            account_id,
-                        ),
-                    )
-                    conn.commit()
-                    return self._send_json(200, {"id": account_id})
-                if self.command == "DELETE":
-                    conn.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
-                    conn.commit()
-                    return self._send_json(200, {"ok": True})
-                return self._method_not_allowed()
-
-            if path == "/api/transactions":
-                if self.command == "GET":
-                    account_id = parse_id((query.get("accountId") or [None])[0])
-                    if account_id:
-                        rows = conn.execute(
-                            "SELECT * FROM transactions WHERE accountId = ? ORDER BY date DESC, id DESC",
-                            (account_id,),
-                        ).fetchall()
+                limit = parse_id(raw_limit) if raw_limit is not None else TRANSACTIONS_PAGE_DEFAULT
+                if not limit or limit < 0:
+                    return self._bad_request("invalid_limit")
+                limit = min(limit, TRANSACTIONS_PAGE_MAX)
+                if before and after:
+                    return self._bad_request("before_and_after_exclusive")
+                cursor = decode_cursor(before or after) if (before or after) else None
+                if (before or after) and cursor is None:
+                    return self._bad_request("invalid_cursor")
+                newer = bool(after)
+                if cursor:
+                    clause, values = keyset_clause(cursor, older=not newer)
+                    clauses.append(clause)
+                    params.extend(values)
+
+                sql = "SELECT * FROM transactions"
+                if clauses:
+                    sql += " WHERE " + " AND ".join(clauses)
+                sql += " ORDER BY date ASC, id ASC" if newer else " ORDER BY date DESC, id DESC"
+                sql += " LIMIT ?"
+                rows = conn.execute(sql, params + [limit + 1]).fetchall()
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+                if newer:
+                    rows.reverse()
+                items = [row_to_dict(r) for r in rows]
+
+                next_cursor = None
+                prev_cursor = None
+                if items:
+                    first, last = items[0], items[-1]
+                    if newer:
+                        next_cursor = encode_cursor(last["date"], last["id"])
+                        if has_more:
+                            prev_cursor = encode_cursor(first["date"], first["id"])
                     else:
-                        rows = conn.execute("SELECT * FROM transactions ORDER BY date DESC, id DESC").fetchall()
-                    return self._send_json(200, [row_to_dict(r) for r in rows])
-                if self.command == "POST":
-                    body = self._read_json() or {}
-                    created_at = body.get("createdAt") or now_iso()
+                        if has_more:
+                            next_cursor = encode_cursor(last["date"], last["id"])
+                        if cursor:
+                            prev_cursor = encode_cursor(first["date"], first["id"])
+                return self._send_json(200, {"items": items, "nextCursor": next_cursor, "prevCursor": prev_cursor})
+            if self.command == "POST":
+                body = self._read_json() or {}
+                created_at = body.get("createdAt") or now_iso()
+                cur = conn.execute(
+                    """
+                    INSERT INTO transactions (accountId, type, previousBalance, newBalance, amount, reason, date, note, createdAt, updatedAt)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        int(body.get("accountId") or 0),
+                        body.get("type"),
+                        float(body.get("previousBalance") or 0),
+                        float(body.get("newBalance") or 0),
+                        float(body.get("amount") or 0),
+                        body.get("reason"),
+                        body.get("date"),
+                        body.get("note"),
+                        created_at,
+                        body.get("updatedAt"),
+                    ),
+                )
+                conn.commit()
+                return self._send_json(200, {"id": cur.lastrowid})
+            return self._method_not_allowed()
+
+        if path.startswith("/api/transactions/"):
+            tx_id = parse_id(path.split("/")[-1])
+            if not tx_id:
+                return self._bad_request("invalid_id")
+            if self.command == "GET":
+                row = conn.execute("SELECT * FROM transactions WHERE id = ?", (tx_id,)).fetchone()
+                if not row:
+                    return self._not_found()
+                return self._send_json(200, row_to_dict(row))
+            if self.command == "PUT":
+                body = self._read_json() or {}
+                updated_at = now_iso()
+                conn.execute(
+                    """
+                    UPDATE transactions SET
+                        accountId = ?, type = ?, previousBalance = ?, newBalance = ?, amount = ?, reason = ?, date = ?, note = ?, updatedAt = ?
+                    WHERE id = ?
+                    """,
+                    (
+                        int(body.get("accountId") or 0),
+                        body.get("type"),
+                        float(body.get("previousBalance") or 0),
+                        float(body.get("newBalance") or 0),
+                        float(body.get("amount") or 0),
+                        body.get("reason"),
+                        body.get("date"),
+                        body.get("note"),
+                        updated_at,
+                        tx_id,
+                    ),
+                )
+                conn.commit()
+                return self._send_json(200, {"id": tx_id})
+            if self.command == "DELETE":
+                conn.execute("DELETE FROM transactions WHERE id = ?", (tx_id,))
+                conn.commit()
+                return self._send_json(200, {"ok": True})
+            return self._method_not_allowed()
+
+        if path == "/api/investments":
+            if self.command == "GET":
+                inv_type = (query.get("type") or [None])[0]
+                if inv_type:
+                    rows = conn.execute(
+                        "SELECT * FROM investments WHERE type = ? ORDER BY id ASC", (inv_type,)
+                    ).fetchall()
+                else:
+                    rows = conn.execute("SELECT * FROM investments ORDER BY id ASC").fetchall()
+                return self._send_json(200, [row_to_dict(r) for r in rows])
+            if self.command == "POST":
+                body = self._read_json() or {}
+                created_at = body.get("createdAt") or now_iso()
+                updated_at = body.get("updatedAt") or now_iso()
+                cur = conn.execute(
+                    """
+                    INSERT INTO investments (type, name, symbol, quantity, costPrice, currentPrice, purchaseDate, wealthProductType, annualInterestRate, maturityDate, lastAccruedDate, note, createdAt, updatedAt)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        body.get("type") or "",
+                        body.get("name") or "",
+                        body.get("symbol") or "",
+                        float(body.get("quantity") or 0),
+                        float(body.get("costPrice") or 0),
+                        float(body.get("currentPrice") or 0),
+                        body.get("purchaseDate"),
+                        body.get("wealthProductType"),
+                        float(body.get("annualInterestRate") or 0),
+                        body.get("maturityDate"),
+                        body.get("lastAccruedDate"),
+                        body.get("note"),
+                        created_at,
+                        updated_at,
+                    ),
+                )
+                conn.commit()
+                return self._send_json(200, {"id": cur.lastrowid})
+            return self._method_not_allowed()
+
+        if path.startswith("/api/investments/"):
+            inv_id = parse_id(path.split("/")[-1])
+            if not inv_id:
+                return self._bad_request("invalid_id")
+            if self.command == "GET":
+                row = conn.execute("SELECT * FROM investments WHERE id = ?", (inv_id,)).fetchone()
+                if not row:
+                    return self._not_found()
+                return self._send_json(200, row_to_dict(row))
+            if self.command == "PUT":
+                body = self._read_json() or {}
+                updated_at = now_iso()
+                conn.execute(
+                    """
+                    UPDATE investments SET
+                        type = ?, name = ?, symbol = ?, quantity = ?, costPrice = ?, currentPrice = ?, purchaseDate = ?, wealthProductType = ?, annualInterestRate = ?, maturityDate = ?, lastAccruedDate = ?, note = ?, updatedAt = ?
+                    WHERE id = ?
+                    """,
+                    (
+                        body.get("type") or "",
+                        body.get("name") or "",
+                        body.get("symbol") or "",
+                        float(body.get("quantity") or 0),
+                        float(body.get("costPrice") or 0),
+                        float(body.get("currentPrice") or 0),
+                        body.get("purchaseDate"),
+                        body.get("wealthProductType"),
+                        float(body.get("annualInterestRate") or 0),
+                        body.get("maturityDate"),
+                        body.get("lastAccruedDate"),
+                        body.get("note"),
+                        updated_at,
+                        inv_id,
+                    ),
+                )
+                conn.commit()
+                return self._send_json(200, {"id": inv_id})
+            if self.command == "DELETE":
+                conn.execute("DELETE FROM investments WHERE id = ?", (inv_id,))
+                conn.execute("DELETE FROM priceHistory WHERE investmentId = ?", (inv_id,))
+                conn.commit()
+                return self._send_json(200, {"ok": True})
+            return self._method_not_allowed()
+
+        if path == "/api/priceHistory":
+            if self.command == "GET":
+                inv_id = parse_id((query.get("investmentId") or [None])[0])
+                start = (query.get("startDate") or [None])[0]
+                end = (query.get("endDate") or [None])[0]
+                if (query.get("format") or [None])[0] == "series":
+                    # Compact {dates, prices} for charts; served from PRICE_INDEX when enabled.
+                    if not inv_id:
+                        return self._bad_request("missing_investment_id")
+                    dates, prices = PRICE_INDEX.range(conn, inv_id, start, end)
+                    return self._send_json(200, {"investmentId": inv_id, "dates": dates, "prices": prices})
+                params = []
+                sql = "SELECT * FROM priceHistory"
+                clauses = []
+                if inv_id:
+                    clauses.append("investmentId = ?")
+                    params.append(inv_id)
+                if start:
+                    clauses.append("date >= ?")
+                    params.append(start)
+                if end:
+                    clauses.append("date <= ?")
+                    params.append(end)
+                if clauses:
+                    sql += " WHERE " + " AND ".join(clauses)
+                sql += " ORDER BY date ASC, id ASC"
+                rows = conn.execute(sql, params).fetchall()
+                return self._send_json(200, [row_to_dict(r) for r in rows])
+            if self.command == "POST":
+                body = self._read_json() or {}
+                created_at = body.get("createdAt") or now_iso()
+                updated_at = body.get("updatedAt")
+                try:
                     cur = conn.execute(
                         """
-                        INSERT INTO transactions (accountId, type, previousBalance, newBalance, amount, reason, date, note, createdAt, updatedAt)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        INSERT INTO priceHistory (investmentId, date, price, type, symbol, createdAt, updatedAt)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
                         """,
                         (
-                            int(body.get("accountId") or 0),
-                            body.get("type"),
-                            float(body.get("previousBalance") or 0),
-                            float(body.get("newBalance") or 0),
-                            float(body.get("amount") or 0),
-                            body.get("reason"),
+                            int(body.get("investmentId") or 0),
                             body.get("date"),
-                            body.get("note"),
+                            float(body.get("price") or 0),
+                            body.get("type"),
+                            body.get("symbol"),
                             created_at,
-                            body.get("updatedAt"),
+                            updated_at,
                         ),
                     )
                     conn.commit()
                     return self._send_json(200, {"id": cur.lastrowid})
-                return self._method_not_allowed()
-
-            if path.startswith("/api/transactions/"):
-                tx_id = parse_id(path.split("/")[-1])
-                if not tx_id:
-                    return self._bad_request("invalid_id")
-                if self.command == "GET":
-                    row = conn.execute("SELECT * FROM transactions WHERE id = ?", (tx_id,)).fetchone()
-                    if not row:
-                        return self._not_found()
-                    return self._send_json(200, row_to_dict(row))
-                if self.command == "PUT":
-                    body = self._read_json() or {}
-                    updated_at = now_iso()
+                except sqlite3.IntegrityError:
                     conn.execute(
                         """
-                        UPDATE transactions SET
-                            accountId = ?, type = ?, previousBalance = ?, newBalance = ?, amount = ?, reason = ?, date = ?, note = ?, updatedAt = ?
-                        WHERE id = ?
+                        UPDATE priceHistory SET price = ?, type = ?, symbol = ?, updatedAt = ?
+                        WHERE investmentId = ? AND date = ?
                         """,
                         (
-                            int(body.get("accountId") or 0),
+                            float(body.get("price") or 0),
                             body.get("type"),
-                            float(body.get("previousBalance") or 0),
-                            float(body.get("newBalance") or 0),
-                            float(body.get("amount") or 0),
-                            body.get("reason"),
+                            body.get("symbol"),
+                            now_iso(),
+                            int(body.get("investmentId") or 0),
                             body.get("date"),
-                            body.get("note"),
-                            updated_at,
-                            tx_id,
                         ),
                     )
                     conn.commit()
-                    return self._send_json(200, {"id": tx_id})
-                if self.command == "DELETE":
-                    conn.execute("DELETE FROM transactions WHERE id = ?", (tx_id,))
-                    conn.commit()
-                    return self._send_json(200, {"ok": True})
-                return self._method_not_allowed()
+                    row = conn.execute(
+                        "SELECT id FROM priceHistory WHERE investmentId = ? AND date = ?",
+                        (int(body.get("investmentId") or 0), body.get("date")),
+                    ).fetchone()
+                    return self._send_json(200, {"id": row["id"] if row else None})
+            return self._method_not_allowed()
 
-            if path == "/api/investments":
-                if self.command == "GET":
-                    inv_type = (query.get("type") or [None])[0]
-                    if inv_type:
-                        rows = conn.execute(
-                            "SELECT * FROM investments WHERE type = ? ORDER BY id ASC", (inv_type,)
-                        ).fetchall()
-                    else:
-                        rows = conn.execute("SELECT * FROM investments ORDER BY id ASC").fetchall()
-                    return self._send_json(200, [row_to_dict(r) for r in rows])
-                if self.command == "POST":
-                    body = self._read_json() or {}
-                    created_at = body.get("createdAt") or now_iso()
-                    updated_at = body.get("updatedAt") or now_iso()
-                    cur = conn.execute(
-                        """
-                        INSERT INTO investments (type, name, symbol, quantity, costPrice, currentPrice, purchaseDate, wealthProductType, annualInterestRate, maturityDate, lastAccruedDate, note, createdAt, updatedAt)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            body.get("type") or "",
-                            body.get("name") or "",
-                            body.get("symbol") or "",
-                            float(body.get("quantity") or 0),
-                            float(body.get("costPrice") or 0),
-                            float(body.get("currentPrice") or 0),
-                            body.get("purchaseDate"),
-                            body.get("wealthProductType"),
-                            float(body.get("annualInterestRate") or 0),
-                            body.get("maturityDate"),
-                            body.get("lastAccruedDate"),
-                            body.get("note"),
-                            created_at,
-                            updated_at,
-                        ),
-                    )
-                    conn.commit()
-                    return self._send_json(200, {"id": cur.lastrowid})
+        if path == "/api/prices/bulk":
+            if self.command != "POST":
                 return self._method_not_allowed()
-
-            if path.startswith("/api/investments/"):
-                inv_id = parse_id(path.split("/")[-1])
+            body = self._read_json() or {}
+            entries = body.get("prices") if isinstance(body, dict) else body
+            if not isinstance(entries, list):
+                return self._bad_request("missing_prices")
+            update_current = body.get("updateCurrentPrice", True) if isinstance(body, dict) else True
+            result = bulk_upsert_prices(conn, entries, update_current=bool(update_current))
+            conn.commit()
+            return self._send_json(200, {"ok": True, **result})
+
+        if path == "/api/priceHistory/sparklines":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            raw_days = (query.get("days") or [None])[0]
+            days = parse_id(raw_days) if raw_days is not None else SPARKLINE_DAYS_DEFAULT
+            if not days or days < 1:
+                return self._bad_request("invalid_days")
+            ids = []
+            for raw in ",".join(query.get("ids") or []).split(","):
+                if not raw.strip():
+                    continue
+                inv_id = parse_id(raw.strip())
                 if not inv_id:
                     return self._bad_request("invalid_id")
-                if self.command == "GET":
-                    row = conn.execute("SELECT * FROM investments WHERE id = ?", (inv_id,)).fetchone()
-                    if not row:
-                        return self._not_found()
-                    return self._send_json(200, row_to_dict(row))
-                if self.command == "PUT":
-                    body = self._read_json() or {}
-                    updated_at = now_iso()
-                    conn.execute(
-                        """
-                        UPDATE investments SET
-                            type = ?, name = ?, symbol = ?, quantity = ?, costPrice = ?, currentPrice = ?, purchaseDate = ?, wealthProductType = ?, annualInterestRate = ?, maturityDate = ?, lastAccruedDate = ?, note = ?, updatedAt = ?
-                        WHERE id = ?
-                        """,
-                        (
-                            body.get("type") or "",
-                            body.get("name") or "",
-                            body.get("symbol") or "",
-                            float(body.get("quantity") or 0),
-                            float(body.get("costPrice") or 0),
-                            float(body.get("currentPrice") or 0),
-                            body.get("purchaseDate"),
-                            body.get("wealthProductType"),
-                            float(body.get("annualInterestRate") or 0),
-                            body.get("maturityDate"),
-                            body.get("lastAccruedDate"),
-                            body.get("note"),
-                            updated_at,
-                            inv_id,
-                        ),
-                    )
-                    conn.commit()
-                    return self._send_json(200, {"id": inv_id})
-                if self.command == "DELETE":
-                    conn.execute("DELETE FROM investments WHERE id = ?", (inv_id,))
-                    conn.execute("DELETE FROM priceHistory WHERE investmentId = ?", (inv_id,))
-                    conn.commit()
-                    return self._send_json(200, {"ok": True})
-                return self._method_not_allowed()
+                ids.append(inv_id)
+            normalize = (query.get("normalize") or ["0"])[0] in ("1", "true")
+            result = price_sparklines(conn, days=min(days, SPARKLINE_DAYS_MAX), ids=ids, normalize=normalize)
+            return self._send_json(200, result)
 
-            if path == "/api/priceHistory":
-                if self.command == "GET":
-                    inv_id = parse_id((query.get("investmentId") or [None])[0])
-                    start = (query.get("startDate") or [None])[0]
-                    end = (query.get("endDate") or [None])[0]
-                    params = []
-                    sql = "SELECT * FROM priceHistory"
-                    clauses = []
-                    if inv_id:
-                        clauses.append("investmentId = ?")
-                        params.append(inv_id)
-                    if start:
-                        clauses.append("date >= ?")
-                        params.append(start)
-                    if end:
-                        clauses.append("date <= ?")
-                        params.append(end)
-                    if clauses:
-                        sql += " WHERE " + " AND ".join(clauses)
-                    sql += " ORDER BY date ASC, id ASC"
-                    rows = conn.execute(sql, params).fetchall()
-                    return self._send_json(200, [row_to_dict(r) for r in rows])
-                if self.command == "POST":
-                    body = self._read_json() or {}
-                    created_at = body.get("createdAt") or now_iso()
-                    updated_at = body.get("updatedAt")
-                    try:
-                        cur = conn.execute(
-                            """
-                            INSERT INTO priceHistory (investmentId, date, price, type, symbol, createdAt, updatedAt)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (
-                                int(body.get("investmentId") or 0),
-                                body.get("date"),
-                                float(body.get("price") or 0),
-                                body.get("type"),
-                                body.get("symbol"),
-                                created_at,
-                                updated_at,
-                            ),
-                        )
-                        conn.commit()
-                        return self._send_json(200, {"id": cur.lastrowid})
-                    except sqlite3.IntegrityError:
-                        conn.execute(
-                            """
-                            UPDATE priceHistory SET price = ?, type = ?, symbol = ?, updatedAt = ?
-                            WHERE investmentId = ? AND date = ?
-                            """,
-                            (
-                                float(body.get("price") or 0),
-                                body.get("type"),
-                                body.get("symbol"),
-                                now_iso(),
-                                int(body.get("investmentId") or 0),
-                                body.get("date"),
-                            ),
-                        )
-                        conn.commit()
-                        row = conn.execute(
-                            "SELECT id FROM priceHistory WHERE investmentId = ? AND date = ?",
-                            (int(body.get("investmentId") or 0), body.get("date")),
-                        ).fetchone()
-                        return self._send_json(200, {"id": row["id"] if row else None})
+        if path == "/api/priceHistory/byDate":
+            if self.command != "GET":
                 return self._method_not_allowed()
-
-            if path == "/api/priceHistory/byDate":
-                if self.command != "GET":
-                    return self._method_not_allowed()
-                inv_id = parse_id((query.get("investmentId") or [None])[0])
-                date = (query.get("date") or [None])[0]
-                if not inv_id or not date:
-                    return self._bad_request("missing_params")
+            inv_id = parse_id((query.get("investmentId") or [None])[0])
+            date = (query.get("date") or [None])[0]
+            if not inv_id or not date:
+                return self._bad_request("missing_params")
+            if parse_date_str(date):
+                history_id = PRICE_INDEX.point(conn, inv_id, date)
+                row = conn.execute("SELECT * FROM priceHistory WHERE id = ?", (history_id,)).fetchone() if history_id else None
+            else:
                 row = conn.execute(
                     "SELECT * FROM priceHistory WHERE investmentId = ? AND date = ?",
                     (inv_id, date),
                 ).fetchone()
-                if not row:
-                    return self._send_json(200, None)
-                return self._send_json(200, row_to_dict(row))
-
-            if path.startswith("/api/priceHistory/"):
-                segs = path.split("/")
-                if len(segs) >= 5 and segs[3] == "byInvestment" and self.command == "DELETE":
-                    inv_id = parse_id(segs[4])
-                    if not inv_id:
-                        return self._bad_request("invalid_id")
-                    conn.execute("DELETE FROM priceHistory WHERE investmentId = ?", (inv_id,))
-                    conn.commit()
-                    return self._send_json(200, {"ok": True})
-
-                history_id = parse_id(segs[-1])
-                if not history_id:
-                    return self._bad_request("invalid_id")
-                if self.command == "PUT":
-                    body = self._read_json() or {}
-                    updated_at = now_iso()
-                    conn.execute(
-                        """
-                        UPDATE priceHistory SET investmentId = ?, date = ?, price = ?, type = ?, symbol = ?, updatedAt = ?
-                        WHERE id = ?
-                        """,
-                        (
-                            int(body.get("investmentId") or 0),
-                            body.get("date"),
-                            float(body.get("price") or 0),
-                            body.get("type"),
-                            body.get("symbol"),
-                            updated_at,
-                            history_id,
-                        ),
-                    )
-                    conn.commit()
-                    return self._send_json(200, {"id": history_id})
-                return self._method_not_allowed()
+            if not row:
+                return self._send_json(200, None)
+            return self._send_json(200, row_to_dict(row))
 
-            if path == "/api/settings":
-                if self.command != "GET":
-                    return self._method_not_allowed()
-                rows = conn.execute("SELECT key, value FROM settings ORDER BY key ASC").fetchall()
-                out = {}
-                for r in rows:
-                    try:
-                        out[r["key"]] = json.loads(r["value"]) if r["value"] is not None else None
-                    except Exception:
-                        out[r["key"]] = r["value"]
-                return self._send_json(200, out)
-
-            if path.startswith("/api/settings/"):
-                key = path.split("/", 3)[3]
-                if not key:
-                    return self._bad_request("missing_key")
-                if self.command == "GET":
-                    row = conn.execute("SELECT key, value FROM settings WHERE key = ?", (key,)).fetchone()
-                    if not row:
-                        return self._send_json(200, {"key": key, "value": None})
-                    try:
-                        val = json.loads(row["value"]) if row["value"] is not None else None
-                    except Exception:
-                        val = row["value"]
-                    return self._send_json(200, {"key": key, "value": val})
-                if self.command == "PUT":
-                    body = self._read_json() or {}
-                    value = body.get("value")
-                    value_json = json.dumps(value, ensure_ascii=False)
-                    ts = now_iso()
-                    conn.execute(
-                        """
-                        INSERT INTO settings (key, value, createdAt, updatedAt) VALUES (?, ?, ?, ?)
-                        ON CONFLICT(key) DO UPDATE SET value = excluded.value, updatedAt = excluded.updatedAt
-                        """,
-                        (key, value_json, ts, ts),
-                    )
-                    conn.commit()
-                    return self._send_json(200, {"ok": True})
-                if self.command == "DELETE":
-                    conn.execute("DELETE FROM settings WHERE key = ?", (key,))
-                    conn.commit()
-                    return self._send_json(200, {"ok": True})
+        if path == "/api/priceHistory/asof":
+            if self.command != "POST":
                 return self._method_not_allowed()
-
-            if path == "/api/snapshots":
-                if self.command == "GET":
-                    start = (query.get("startDate") or [None])[0]
-                    end = (query.get("endDate") or [None])[0]
-                    params = []
-                    sql = "SELECT * FROM snapshots"
-                    clauses = []
-                    if start:
-                        clauses.append("date >= ?")
-                        params.append(start)
-                    if end:
-                        clauses.append("date <= ?")
-                        params.append(end)
-                    if clauses:
-                        sql += " WHERE " + " AND ".join(clauses)
-                    sql += " ORDER BY date ASC, id ASC"
-                    rows = conn.execute(sql, params).fetchall()
-                    return self._send_json(200, [row_to_dict(r) for r in rows])
-                if self.command == "POST":
-                    body = self._read_json() or {}
-                    ts = now_iso()
-                    date = body.get("date")
-                    if not date:
-                        return self._bad_request("missing_date")
-                    conn.execute(
-                        """
-                        INSERT INTO snapshots
-                        (date, netWorth, assets, liabilities, investments, totalAssets, totalLiabilities, totalInvestmentValue, totalInvestmentCost, investmentProfit, investmentProfitRate, createdAt, updatedAt)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT(date) DO UPDATE SET
-                            netWorth = excluded.netWorth,
-                            assets = excluded.assets,
-                            liabilities = excluded.liabilities,
-                            investments = excluded.investments,
-                            totalAssets = excluded.totalAssets,
-                            totalLiabilities = excluded.totalLiabilities,
-                            totalInvestmentValue = excluded.totalInvestmentValue,
-                            totalInvestmentCost = excluded.totalInvestmentCost,
-                            investmentProfit = excluded.investmentProfit,
-                            investmentProfitRate = excluded.investmentProfitRate,
-                            updatedAt = excluded.updatedAt
-                        """,
-                        (
-                            date,
-                            float(body.get("netWorth") or 0),
-                            float(body.get("assets") or 0),
-                            float(body.get("liabilities") or 0),
-                            float(body.get("investments") or 0),
-                            float(body.get("totalAssets") or 0),
-                            float(body.get("totalLiabilities") or 0),
-                            float(body.get("totalInvestmentValue") or 0),
-                            float(body.get("totalInvestmentCost") or 0),
-                            float(body.get("investmentProfit") or 0),
-                            float(body.get("investmentProfitRate") or 0),
-                            ts,
-                            ts,
-                        ),
-                    )
-                    conn.commit()
-                    row = conn.execute("SELECT id FROM snapshots WHERE date = ?", (date,)).fetchone()
-                    return self._send_json(200, {"id": row["id"] if row else None})
+            body = self._read_json() or {}
+            raw_ids = body.get("investmentIds") if isinstance(body, dict) else None
+            dates = body.get("dates") if isinstance(body, dict) else None
+            if not isinstance(raw_ids, list) or not isinstance(dates, list) or not raw_ids or not dates:
+                return self._bad_request("missing_params")
+            if len(raw_ids) > ASOF_MAX_INVESTMENTS or len(dates) > ASOF_MAX_DATES:
+                return self._bad_request("too_many_params")
+            ids = []
+            for raw in raw_ids:
+                inv_id = parse_id(raw)
+                if not inv_id or inv_id <= 0:
+                    return self._bad_request("invalid_id")
+                if inv_id not in ids:
+                    ids.append(inv_id)
+            dates = [str(d) for d in dates]
+            if not all(parse_date_str(d) for d in dates):
+                return self._bad_request("invalid_date")
+            return self._send_json(200, prices_as_of(conn, ids, dates))
+
+        if path == "/api/priceHistory/latest":
+            if self.command != "GET":
                 return self._method_not_allowed()
+            inv_id = parse_id((query.get("investmentId") or [None])[0])
+            on_or_before = (query.get("date") or [None])[0]
+            if not inv_id:
+                return self._bad_request("missing_params")
+            found = PRICE_INDEX.latest(conn, inv_id, on_or_before)
+            if not found:
+                return self._send_json(200, None)
+            return self._send_json(200, {"investmentId": inv_id, "date": found[0], "price": found[1]})
+
+        if path.startswith("/api/priceHistory/"):
+            segs = path.split("/")
+            if len(segs) >= 5 and segs[3] == "byInvestment" and self.command == "DELETE":
+                inv_id = parse_id(segs[4])
+                if not inv_id:
+                    return self._bad_request("invalid_id")
+                conn.execute("DELETE FROM priceHistory WHERE investmentId = ?", (inv_id,))
+                conn.commit()
+                return self._send_json(200, {"ok": True})
 
-            if path == "/api/snapshots/latest":
-                if self.command != "GET":
-                    return self._method_not_allowed()
-                row = conn.execute("SELECT * FROM snapshots ORDER BY date DESC, id DESC LIMIT 1").fetchone()
-                return self._send_json(200, row_to_dict(row))
-
-            if path == "/api/export":
-                if self.command != "GET":
-                    return self._method_not_allowed()
-                accounts = [row_to_dict(r) for r in conn.execute("SELECT * FROM accounts ORDER BY id ASC").fetchall()]
-                transactions = [row_to_dict(r) for r in conn.execute("SELECT * FROM transactions ORDER BY date DESC, id DESC").fetchall()]
-                investments = [row_to_dict(r) for r in conn.execute("SELECT * FROM investments ORDER BY id ASC").fetchall()]
-                priceHistory = [row_to_dict(r) for r in conn.execute("SELECT * FROM priceHistory ORDER BY id ASC").fetchall()]
-                settings_rows = conn.execute("SELECT key, value FROM settings ORDER BY key ASC").fetchall()
-                settings = {}
-                for r in settings_rows:
-                    try:
-                        settings[r["key"]] = json.loads(r["value"]) if r["value"] is not None else None
-                    except Exception:
-                        settings[r["key"]] = r["value"]
-                snapshots = [row_to_dict(r) for r in conn.execute("SELECT * FROM snapshots ORDER BY date ASC, id ASC").fetchall()]
-                payload = {
-                    "version": 2,
-                    "exportedAt": now_iso(),
-                    "accounts": accounts,
-                    "transactions": transactions,
-                    "investments": investments,
-                    "priceHistory": priceHistory,
-                    "settings": settings,
-                    "snapshots": snapshots,
-                }
-                return self._send_json(200, payload)
-
-            if path == "/api/clear":
-                if self.command != "POST":
-                    return self._method_not_allowed()
-                conn.executescript(
-                    """
-                    DELETE FROM priceHistory;
-                    DELETE FROM snapshots;
-                    DELETE FROM transactions;
-                    DELETE FROM investments;
-                    DELETE FROM accounts;
-                    DELETE FROM settings;
+            history_id = parse_id(segs[-1])
+            if not history_id:
+                return self._bad_request("invalid_id")
+            if self.command == "PUT":
+                body = self._read_json() or {}
+                updated_at = now_iso()
+                conn.execute(
                     """
+                    UPDATE priceHistory SET investmentId = ?, date = ?, price = ?, type = ?, symbol = ?, updatedAt = ?
+                    WHERE id = ?
+                    """,
+                    (
+                        int(body.get("investmentId") or 0),
+                        body.get("date"),
+                        float(body.get("price") or 0),
+                        body.get("type"),
+                        body.get("symbol"),
+                        updated_at,
+                        history_id,
+                    ),
                 )
                 conn.commit()
-                return self._send_json(200, {"ok": True})
+                return self._send_json(200, {"id": history_id})
+            return self._method_not_allowed()
 
-            if path == "/api/import":
-                if self.command != "POST":
-                    return self._method_not_allowed()
+        if path == "/api/settings":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            rows = conn.execute("SELECT key, value FROM settings ORDER BY key ASC").fetchall()
+            out = {}
+            for r in rows:
+                try:
+                    out[r["key"]] = json.loads(r["value"]) if r["value"] is not None else None
+                except Exception:
+                    out[r["key"]] = r["value"]
+            return self._send_json(200, out)
+
+        if path.startswith("/api/settings/"):
+            key = path.split("/", 3)[3]
+            if not key:
+                return self._bad_request("missing_key")
+            if self.command == "GET":
+                row = conn.execute("SELECT key, value FROM settings WHERE key = ?", (key,)).fetchone()
+                if not row:
+                    return self._send_json(200, {"key": key, "value": None})
+                try:
+                    val = json.loads(row["value"]) if row["value"] is not None else None
+                except Exception:
+                    val = row["value"]
+                return self._send_json(200, {"key": key, "value": val})
+            if self.command == "PUT":
                 body = self._read_json() or {}
-                conn.executescript(
-                    """
-                    DELETE FROM priceHistory;
-                    DELETE FROM snapshots;
-                    DELETE FROM transactions;
-                    DELETE FROM investments;
-                    DELETE FROM accounts;
-                    DELETE FROM settings;
+                value = body.get("value")
+                value_json = json.dumps(value, ensure_ascii=False)
+                ts = now_iso()
+                conn.execute(
                     """
+                    INSERT INTO settings (key, value, createdAt, updatedAt) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value, updatedAt = excluded.updatedAt
+                    """,
+                    (key, value_json, ts, ts),
                 )
-                for a in body.get("accounts") or []:
-                    conn.execute(
-                        'INSERT INTO accounts (id, name, "group", balance, icon, includeInNetWorth, billingDay, repaymentDay, note, createdAt, updatedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                        (
-                            a.get("id"),
-                            a.get("name") or "",
-                            a.get("group") or "",
-                            float(a.get("balance") or 0),
-                            a.get("icon"),
-                            1 if a.get("includeInNetWorth", True) else 0,
-                            a.get("billingDay"),
-                            a.get("repaymentDay"),
-                            a.get("note"),
-                            a.get("createdAt") or now_iso(),
-                            a.get("updatedAt") or now_iso(),
-                        ),
-                    )
-                for t in body.get("transactions") or []:
-                    conn.execute(
-                        """
-                        INSERT INTO transactions (id, accountId, type, previousBalance, newBalance, amount, reason, date, note, createdAt, updatedAt)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            t.get("id"),
-                            int(t.get("accountId") or 0),
-                            t.get("type"),
-                            float(t.get("previousBalance") or 0),
-                            float(t.get("newBalance") or 0),
-                            float(t.get("amount") or 0),
-                            t.get("reason"),
-                            t.get("date"),
-                            t.get("note"),
-                            t.get("createdAt") or now_iso(),
-                            t.get("updatedAt"),
-                        ),
-                    )
-                for inv in body.get("investments") or []:
-                    conn.execute(
-                        """
-                        INSERT INTO investments (id, type, name, symbol, quantity, costPrice, currentPrice, purchaseDate, wealthProductType, annualInterestRate, maturityDate, lastAccruedDate, note, createdAt, updatedAt)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            inv.get("id"),
-                            inv.get("type") or "",
-                            inv.get("name") or "",
-                            inv.get("symbol") or "",
-                            float(inv.get("quantity") or 0),
-                            float(inv.get("costPrice") or 0),
-                            float(inv.get("currentPrice") or 0),
-                            inv.get("purchaseDate"),
-                            inv.get("wealthProductType"),
-                            float(inv.get("annualInterestRate") or 0),
-                            inv.get("maturityDate"),
-                            inv.get("lastAccruedDate"),
-                            inv.get("note"),
-                            inv.get("createdAt") or now_iso(),
-                            inv.get("updatedAt") or now_iso(),
-                        ),
-                    )
-                for ph in body.get("priceHistory") or []:
-                    conn.execute(
-                        """
-                        INSERT INTO priceHistory (id, investmentId, date, price, type, symbol, createdAt, updatedAt)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            ph.get("id"),
-                            int(ph.get("investmentId") or 0),
-                            ph.get("date"),
-                            float(ph.get("price") or 0),
-                            ph.get("type"),
-                            ph.get("symbol"),
-                            ph.get("createdAt") or now_iso(),
-                            ph.get("updatedAt") or now_iso(),
-                        ),
-                    )
-                for key, val in (body.get("settings") or {}).items():
-                    ts = now_iso()
-                    conn.execute(
-                        "INSERT INTO settings (key, value, createdAt, updatedAt) VALUES (?, ?, ?, ?)",
-                        (key, json.dumps(val, ensure_ascii=False), ts, ts),
-                    )
-                for s in body.get("snapshots") or []:
-                    ts = s.get("createdAt") or now_iso()
-                    conn.execute(
-                        """
-                        INSERT INTO snapshots
-                        (id, date, netWorth, assets, liabilities, investments, totalAssets, totalLiabilities, totalInvestmentValue, totalInvestmentCost, investmentProfit, investmentProfitRate, createdAt, updatedAt)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            s.get("id"),
-                            s.get("date"),
-                            float(s.get("netWorth") or 0),
-                            float(s.get("assets") or s.get("totalAssets") or 0),
-                            float(s.get("liabilities") or s.get("totalLiabilities") or 0),
-                            float(s.get("investments") or s.get("totalInvestmentValue") or 0),
-                            float(s.get("totalAssets") or 0),
-                            float(s.get("totalLiabilities") or 0),
-                            float(s.get("totalInvestmentValue") or 0),
-                            float(s.get("totalInvestmentCost") or 0),
-                            float(s.get("investmentProfit") or 0),
-                            float(s.get("investmentProfitRate") or 0),
-                            ts,
-                            s.get("updatedAt"),
-                        ),
-                    )
                 conn.commit()
                 return self._send_json(200, {"ok": True})
+            if self.command == "DELETE":
+                conn.execute("DELETE FROM settings WHERE key = ?", (key,))
+                conn.commit()
+                return self._send_json(200, {"ok": True})
+            return self._method_not_allowed()
+
+        if path == "/api/snapshots":
+            if self.command == "GET":
+                start = (query.get("startDate") or [None])[0]
+                end = (query.get("endDate") or [None])[0]
+                params = []
+                sql = "SELECT * FROM snapshots"
+                clauses = []
+                if start:
+                    clauses.append("date >= ?")
+                    params.append(start)
+                if end:
+                    clauses.append("date <= ?")
+                    params.append(end)
+                if clauses:
+                    sql += " WHERE " + " AND ".join(clauses)
+                sql += " ORDER BY date ASC, id ASC"
+                rows = conn.execute(sql, params).fetchall()
+                return self._send_json(200, [row_to_dict(r) for r in rows])
+            if self.command == "POST":
+                body = self._read_json() or {}
+                ts = now_iso()
+                date = body.get("date")
+                if not date:
+                    return self._bad_request("missing_date")
+                upsert_snapshot(conn, date, body, ts)
+                conn.commit()
+                row = conn.execute("SELECT id FROM snapshots WHERE date = ?", (date,)).fetchone()
+                return self._send_json(200, {"id": row["id"] if row else None})
+            return self._method_not_allowed()
 
-            return self._not_found()
-        finally:
-            conn.close()
+        if path == "/api/analytics/cashflow":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            period = (query.get("period") or ["month"])[0]
+            bucket = (query.get("bucket") or [None])[0] or CASHFLOW_PERIOD_BUCKETS.get(period)
+            if bucket not in CASHFLOW_BUCKET_KEYS:
+                return self._bad_request("invalid_period")
+            start = (query.get("start") or query.get("startDate") or [None])[0]
+            end = (query.get("end") or query.get("endDate") or [None])[0]
+            account_id = parse_id((query.get("accountId") or [None])[0])
+            result = cashflow_rollup(conn, bucket, start=start, end=end, account_id=account_id)
+            return self._send_json(200, {"period": period, **result})
+
+        if path == "/api/stats":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            return self._send_json(200, cached_stats(conn))
+
+        if path == "/api/snapshots/series":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            field = (query.get("field") or ["netWorth"])[0]
+            if field not in SNAPSHOT_FIELDS:
+                return self._bad_request("invalid_field")
+            raw_max = (query.get("maxPoints") or [None])[0]
+            max_points = parse_id(raw_max) if raw_max is not None else SERIES_MAX_POINTS_DEFAULT
+            if not max_points or max_points < 2:
+                return self._bad_request("invalid_max_points")
+            max_points = min(max_points, SERIES_MAX_POINTS_LIMIT)
+            start = (query.get("start") or query.get("startDate") or [None])[0]
+            end = (query.get("end") or query.get("endDate") or [None])[0]
+            return self._send_json(200, snapshot_series(conn, field, start=start, end=end, max_points=max_points))
+
+        if path == "/api/snapshots/record":
+            if self.command != "POST":
+                return self._method_not_allowed()
+            body = self._read_json() or {}
+            date = body.get("date") or to_date_str(local_today())
+            if not parse_date_str(str(date)):
+                return self._bad_request("invalid_date")
+            result = record_snapshot(conn, str(date))
+            conn.commit()
+            return self._send_json(200, result)
+
+        if path == "/api/snapshots/latest":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            row = conn.execute("SELECT * FROM snapshots ORDER BY date DESC, id DESC LIMIT 1").fetchone()
+            return self._send_json(200, row_to_dict(row))
+
+        if path == "/api/export":
+            if self.command != "GET":
+                return self._method_not_allowed()
+            conn.execute("BEGIN")
+            return self._send_json_stream(200, iter_export_json(conn))
+
+        if path == "/api/clear":
+            if self.command != "POST":
+                return self._method_not_allowed()
+            for table in IMPORT_CLEAR_ORDER:
+                conn.execute(f"DELETE FROM {table}")
+            conn.commit()
+            return self._send_json(200, {"ok": True})
+
+        if path == "/api/import":
+            if self.command != "POST":
+                return self._method_not_allowed()
+            body = self._read_json() or {}
+            mode = (query.get("mode") or ["replace"])[0]
+            if mode == "merge":
+                return self._send_json(200, {"ok": True, **merge_import(conn, body)})
+            if mode != "replace":
+                return self._bad_request("invalid_mode")
+            return self._send_json(200, {"ok": True, **bulk_import(conn, body)})
+
+        return self._not_found()
 
     def do_GET(self):
         if self.path.startswith("/api/"):
             return self._handle_api()
+        if self._send_static_asset():
+            return
         return super().do_GET()
 
+    def do_HEAD(self):
+        if self._send_static_asset(head=True):
+            return
+        return super().do_HEAD()
+
     def do_POST(self):
         if self.path.startswith("/api/"):
             return self._handle_api()
@@ -1776,20 +4412,177 @@ class Handler(SimpleHTTPRequestHandler):
         return self._not_found()
 
 
+class _BatchOperation(Handler):
+    """Replays one /api/batch entry through Handler's routes without a socket, capturing the reply."""
+
+    def __init__(self, method, body):
+        self.command = method
+        self._body = body
+        self.result_status = 200
+        self.result_payload = None
+
+    def _read_json(self):
+        return self._body
+
+    def _send_json(self, status, payload):
+        self.result_status = status
+        self.result_payload = payload
+
+
+# Pooled server mode: persistent HTTP/1.1 connections served by a fixed set of worker threads.
+SERVER_WORKERS_DEFAULT = 16
+SERVER_QUEUE_DEFAULT = 64
+# Idle keep-alive connections are dropped after this many seconds, or as soon as another
+# connection is queued (checked every KEEPALIVE_POLL_INTERVAL), so they don't pin a worker.
+KEEPALIVE_TIMEOUT = 15
+KEEPALIVE_POLL_INTERVAL = 0.05
+# Bodies left unread by a handler are skipped up to this size; larger ones close the connection.
+KEEPALIVE_DISCARD_MAX = 1024 * 1024
+BUSY_RETRY_AFTER = 1
+# Rejected connections waiting for their 503; beyond this they are closed without a reply.
+BUSY_REJECT_QUEUE = 64
+
+
+class KeepAliveHandler(Handler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without this each reply waits on a delayed ACK.
+    disable_nagle_algorithm = True
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer whose connections are handled by `workers` threads fed from a bounded queue.
+
+    When the queue is full a new connection gets an immediate 503 with Retry-After instead
+    of another thread that would only wait on the database locks.
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers: int = SERVER_WORKERS_DEFAULT, queue_size: int = SERVER_QUEUE_DEFAULT):
+        super().__init__(server_address, handler_class)
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max(1, queue_size))
+        self.rejected = 0
+        self._rejects: "queue.Queue[Optional[object]]" = queue.Queue(maxsize=BUSY_REJECT_QUEUE)
+        self._workers = [threading.Thread(target=self._work, name=f"http-worker-{i}", daemon=True) for i in range(max(1, workers))]
+        self._rejecter = threading.Thread(target=self._reject_loop, name="http-rejecter", daemon=True)
+        for t in (*self._workers, self._rejecter):
+            t.start()
+
+    def has_waiting(self) -> bool:
+        return not self._queue.empty()
+
+    def process_request(self, request, client_address):
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            self.rejected += 1
+            # The 503 is written off the accept thread, which must never block on a client.
+            try:
+                self._rejects.put_nowait(request)
+            except queue.Full:
+                self.shutdown_request(request)
+
+    def _reject_loop(self):
+        while True:
+            request = self._rejects.get()
+            if request is None:
+                return
+            try:
+                self._reject(request)
+            finally:
+                self.shutdown_request(request)
+
+    def _reject(self, request):
+        body = b'{"error":"server_busy"}'
+        try:
+            # Take what the client already sent, so closing doesn't reset the connection under the reply.
+            request.settimeout(0.05)
+            try:
+                request.recv(65536)
+            except OSError:
+                pass
+            request.sendall(
+                b"HTTP/1.1 503 Service Unavailable\r\n"
+                b"Content-Type: application/json; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\nRetry-After: {BUSY_RETRY_AFTER}\r\n".encode("ascii")
+                + b"Connection: close\r\n\r\n"
+                + body
+            )
+        except OSError:
+            pass
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                request.settimeout(KEEPALIVE_TIMEOUT)
+                self.finish_request(request, client_address)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away mid-reply; nothing to report.
+                pass
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._workers:
+            self._queue.put(None)
+        self._rejects.put(None)
+
+
 def main():
     init_db()
     import os
 
+    snapshot_at = _parse_time_of_day(os.environ.get("PERCENTO_SNAPSHOT_TIME"), (23, 55))
+    recorder = SnapshotRecorder(snapshot_at) if snapshot_at else None
+    if recorder:
+        recorder.start()
+
+    global RECURRING_SCHEDULER
+    if (os.environ.get("PERCENTO_RECURRING_SCHEDULER") or "").strip().lower() not in ("0", "off", "false", "no"):
+        RECURRING_SCHEDULER = RecurringScheduler()
+        RECURRING_SCHEDULER.start()
+
+    STATIC_ASSETS.load()
+    threading.Thread(target=STATIC_ASSETS.precompress, name="precompress", daemon=True).start()
+
     host = "0.0.0.0"
     port_env = os.environ.get("PORT") or os.environ.get("PERCENTO_PORT")
     base_port = int(port_env) if port_env and str(port_env).isdigit() else 9000
+    # PERCENTO_WORKERS=0 falls back to the thread-per-connection HTTP/1.0 server.
+    workers_env = (os.environ.get("PERCENTO_WORKERS") or "").strip()
+    workers = int(workers_env) if workers_env.isdigit() else SERVER_WORKERS_DEFAULT
+    queue_env = (os.environ.get("PERCENTO_QUEUE") or "").strip()
+    queue_size = int(queue_env) if queue_env.isdigit() and int(queue_env) > 0 else SERVER_QUEUE_DEFAULT
+
+    if workers > 0:
+        # One idle connection per worker, so a fully busy pool never reopens connections.
+        DB_POOL.resize(workers + DB_POOL_BACKGROUND)
 
     last_error = None
     for port in range(base_port, base_port + 50):
         try:
-            server = ThreadingHTTPServer((host, port), Handler)
-            print(f"Serving on http://{host}:{port}/")
-            server.serve_forever()
+            if workers > 0:
+                server = PooledHTTPServer((host, port), KeepAliveHandler, workers=workers, queue_size=queue_size)
+                print(f"Serving on http://{host}:{port}/ (HTTP/1.1, {workers} workers, queue {queue_size})")
+            else:
+                server = ThreadingHTTPServer((host, port), Handler)
+                print(f"Serving on http://{host}:{port}/")
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+                if recorder:
+                    recorder.stop()
+                if RECURRING_SCHEDULER is not None:
+                    RECURRING_SCHEDULER.stop()
+                DB_POOL.drain()
             return
         except OSError as e:
             last_error = e
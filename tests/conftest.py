@@ -0,0 +1,84 @@
+import gzip
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, migrated database file for one test."""
+    server.DB_POOL.drain()
+    monkeypatch.setattr(server, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(server, "RECURRING_SCHEDULER", None)
+    # Process-wide caches would otherwise carry bodies and series over from the previous test's database.
+    monkeypatch.setattr(server, "RESPONSE_CACHE", server.ResponseCache(server.RESPONSE_CACHE.max_bytes))
+    monkeypatch.setattr(server, "PRICE_INDEX", server.PriceIndex(enabled=server.PRICE_INDEX.enabled))
+    server.init_db()
+    yield server.DB_PATH
+    server.DB_POOL.drain()
+
+
+class Client:
+    def __init__(self, base):
+        self.base = base
+
+    def request(self, method, path, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(
+            self.base + path, data=data, method=method, headers={"Content-Type": "application/json", **(headers or {})}
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                raw = resp.read()
+                status, resp_headers = resp.status, resp.headers
+        except urllib.error.HTTPError as e:
+            raw = e.read()
+            status, resp_headers = e.code, e.headers
+        if raw and resp_headers.get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        payload = json.loads(raw) if raw and "json" in (resp_headers.get("Content-Type") or "") else raw
+        return status, payload, resp_headers
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, body=None, **kwargs):
+        return self.request("POST", path, body, **kwargs)
+
+    def put(self, path, body=None, **kwargs):
+        return self.request("PUT", path, body, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """Client for a server bound to the test database on an ephemeral port."""
+    monkeypatch.setattr(server.Handler, "log_message", lambda *args: None)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.Handler)
+    t = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    t.start()
+    try:
+        yield Client(f"http://127.0.0.1:{httpd.server_address[1]}")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture
+def conn(db):
+    """A pooled write connection, closed after the test."""
+    c = server.connect()
+    yield c
+    c.close()
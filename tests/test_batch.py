@@ -0,0 +1,66 @@
+import server
+
+
+def _accounts(client):
+    _, accounts, _ = client.get("/api/accounts")
+    return sorted(a["name"] for a in accounts)
+
+
+def _op(method, path, body=None):
+    return {"method": method, "path": path, "body": body}
+
+
+def test_batch_commits_all_operations_together(client):
+    status, result, _ = client.post("/api/batch", {"operations": [
+        _op("POST", "/api/accounts", {"name": "A", "group": "cash", "balance": 10}),
+        _op("POST", "/api/accounts", {"name": "B", "group": "cash", "balance": 0}),
+        _op("GET", "/api/accounts"),
+    ]})
+    assert status == 200 and result["ok"] is True
+    assert [r["status"] for r in result["results"]] == [200, 200, 200]
+    # Later operations see earlier ones' uncommitted writes.
+    assert sorted(a["name"] for a in result["results"][2]["body"]) == ["A", "B"]
+    assert _accounts(client) == ["A", "B"]
+
+
+def test_failing_operation_rolls_back_the_whole_batch(client):
+    client.post("/api/accounts", {"name": "Keep", "group": "cash", "balance": 1})
+    before = _accounts(client)
+    status, result, _ = client.post("/api/batch", {"operations": [
+        _op("POST", "/api/accounts", {"name": "Gone", "group": "cash", "balance": 5}),
+        _op("POST", "/api/transactions", {"accountId": 1, "type": "income", "amount": 1, "date": "2026-01-01"}),
+        _op("PUT", "/api/nope/1", {}),
+    ]})
+    assert status == 200 and result["ok"] is False and result["failedIndex"] == 2
+    assert [r["status"] for r in result["results"]][:2] == [200, 200]
+    assert result["results"][2]["status"] >= 400
+    # The cached list from before the batch must not be replaced by rolled-back rows.
+    assert _accounts(client) == before
+    _, txs, _ = client.get("/api/transactions")
+    assert txs == []
+
+
+def test_raising_operation_rolls_back(client, monkeypatch):
+    def boom(*_args):
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(server, "record_snapshot", boom)
+    status, result, _ = client.post("/api/batch", {"operations": [
+        _op("POST", "/api/accounts", {"name": "Gone", "group": "cash", "balance": 5}),
+        _op("POST", "/api/snapshots/record", {"date": "2026-01-01"}),
+    ]})
+    assert status == 200 and result["failedIndex"] == 1
+    assert result["results"][-1] == {"status": 500, "body": {"error": "operation_failed", "message": "disk on fire"}}
+    assert _accounts(client) == []
+
+
+def test_rejected_batches_write_nothing(client):
+    for ops, error in (
+        ([_op("POST", "/api/accounts", {"name": "Gone", "group": "cash"}), _op("POST", "/api/import", {})], "operation_not_batchable"),
+        ([_op("POST", "/api/accounts", {"name": "Gone", "group": "cash"}), "junk"], "invalid_operation"),
+    ):
+        _, result, _ = client.post("/api/batch", {"operations": ops})
+        assert result["ok"] is False and result["results"][-1]["body"] == {"error": error}
+    status, body, _ = client.post("/api/batch", {"operations": []})
+    assert status == 400 and body == {"error": "missing_operations"}
+    assert _accounts(client) == []
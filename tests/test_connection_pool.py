@@ -0,0 +1,32 @@
+import server
+
+
+def _cycle(pool, n):
+    """Borrow `n` connections at once, as n busy workers would, then return them."""
+    held = [pool.acquire() for _ in range(n)]
+    for conn, generation in held:
+        pool.release(conn, generation)
+    return {conn for conn, _generation in held}
+
+
+def test_pool_sized_to_workers_reuses_every_connection(db):
+    pool = server._ConnectionPool(max_idle=2)
+    pool.resize(5)
+    first = _cycle(pool, 5)
+    assert _cycle(pool, 5) == first
+    pool.drain()
+
+
+def test_undersized_pool_reopens_connections_under_load(db):
+    pool = server._ConnectionPool(max_idle=2)
+    first = _cycle(pool, 5)
+    assert len(_cycle(pool, 5) & first) == 2
+    pool.drain()
+
+
+def test_shrinking_closes_surplus_idle_connections(db):
+    pool = server._ConnectionPool(max_idle=4)
+    _cycle(pool, 4)
+    pool.resize(1)
+    assert len(pool._idle) == 1
+    pool.drain()
@@ -0,0 +1,47 @@
+def _add_accounts(client, n, prefix="Account"):
+    for i in range(n):
+        client.post("/api/accounts", {"name": f"{prefix} {i}", "group": "cash", "balance": i})
+
+
+def test_unchanged_get_answers_304(client):
+    _add_accounts(client, 1)
+    status, body, headers = client.get("/api/accounts")
+    etag = headers["ETag"]
+    assert status == 200 and etag
+    status, body, headers = client.get("/api/accounts", headers={"If-None-Match": etag})
+    assert status == 304 and body == b"" and headers["ETag"] == etag
+    # Validators are per route and query.
+    status, _, _ = client.get("/api/accounts?x=1", headers={"If-None-Match": etag})
+    assert status == 200
+
+
+def test_write_changes_the_etag(client):
+    _add_accounts(client, 1)
+    _, _, headers = client.get("/api/accounts")
+    etag = headers["ETag"]
+    _add_accounts(client, 1, "New")
+    status, body, headers = client.get("/api/accounts", headers={"If-None-Match": etag})
+    assert status == 200 and headers["ETag"] != etag
+    assert len(body) == 2
+
+
+def test_compressed_etag_validates_either_representation(client):
+    _add_accounts(client, 30)
+    status, body, headers = client.get("/api/accounts", headers={"Accept-Encoding": "gzip"})
+    assert status == 200 and headers["Content-Encoding"] == "gzip" and len(body) == 30
+    gzip_etag = headers["ETag"]
+    assert gzip_etag.endswith('-gzip"')
+    status, _, headers = client.get("/api/accounts", headers={"If-None-Match": gzip_etag})
+    assert status == 304
+    status, _, headers = client.get("/api/accounts", headers={"If-None-Match": gzip_etag, "Accept-Encoding": "gzip"})
+    assert status == 304 and headers["ETag"] == gzip_etag
+
+
+def test_validators_are_settled_when_the_write_reply_arrives(client):
+    for i in range(20):
+        client.post("/api/accounts", {"name": f"A{i}", "group": "cash", "balance": 10})
+        _, stats, headers = client.get("/api/stats")
+        # The write's version bump happens before its reply, never after the next read.
+        assert stats["netWorth"] == 10 * (i + 1)
+        status, _, _ = client.get("/api/stats", headers={"If-None-Match": headers["ETag"]})
+        assert status == 304
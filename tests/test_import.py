@@ -0,0 +1,59 @@
+import server
+
+
+def _doc(prices, **tables):
+    return {
+        "investments": [{"id": 1, "type": "stock", "name": "Fund", "symbol": "F", "quantity": 1, "costPrice": 1, "currentPrice": 1}],
+        "priceHistory": [
+            {"id": pid, "investmentId": 1, "date": date, "price": price, "updatedAt": f"u{price}"}
+            for pid, date, price in prices
+        ],
+        **tables,
+    }
+
+
+def _prices(conn):
+    return [tuple(r) for r in conn.execute("SELECT id, date, price FROM priceHistory ORDER BY date")]
+
+
+def test_merge_rekeyed_price_dates_do_not_collide(conn):
+    server.bulk_import(conn, _doc([(1, "2026-01-01", 1.0), (2, "2026-01-02", 2.0)]))
+    # id 1 moves onto the day id 2 held, id 2 moves to a new day.
+    result = server.merge_import(conn, _doc([(1, "2026-01-02", 2.5), (2, "2026-01-03", 3.0)]))
+    assert result["counts"]["priceHistory"] == {"inserted": 1, "updated": 1, "unchanged": 0, "deleted": 1}
+    rows = _prices(conn)
+    assert [(d, p) for _id, d, p in rows] == [("2026-01-02", 2.5), ("2026-01-03", 3.0)]
+    # The surviving point keeps its local id; the new one can't reuse it.
+    assert rows[0][0] == 2 and rows[1][0] not in (1, 2)
+
+
+def test_merge_swapped_price_ids_are_unchanged(conn):
+    server.bulk_import(conn, _doc([(1, "2026-01-01", 1.0), (2, "2026-01-02", 2.0)]))
+    result = server.merge_import(conn, _doc([(2, "2026-01-01", 1.0), (1, "2026-01-02", 2.0)]))
+    assert result["counts"]["priceHistory"] == {"inserted": 0, "updated": 0, "unchanged": 2, "deleted": 0}
+    assert [(d, p) for _id, d, p in _prices(conn)] == [("2026-01-01", 1.0), ("2026-01-02", 2.0)]
+
+
+def test_merge_matches_full_import_for_other_tables(conn):
+    accounts = [{"id": 1, "name": "Cash", "group": "cash", "balance": 10}, {"id": 2, "name": "Card", "group": "credit", "balance": -5}]
+    server.bulk_import(conn, _doc([], accounts=accounts))
+    accounts = [{"id": 1, "name": "Cash", "group": "cash", "balance": 12}, {"id": 3, "name": "Bank", "group": "cash", "balance": 1}]
+    result = server.merge_import(conn, _doc([], accounts=accounts))
+    assert result["counts"]["accounts"] == {"inserted": 1, "updated": 1, "unchanged": 0, "deleted": 1}
+    assert [tuple(r) for r in conn.execute("SELECT id, balance FROM accounts ORDER BY id")] == [(1, 12.0), (3, 1.0)]
+
+
+def test_merge_keeps_created_at_of_matched_settings_and_prices(conn):
+    conn.execute("INSERT INTO settings (key, value, createdAt, updatedAt) VALUES ('language', '\"zh\"', 'c0', 'u0')")
+    conn.execute("INSERT INTO settings (key, value, createdAt, updatedAt) VALUES ('theme', '\"dark\"', 'c0', 'u0')")
+    conn.commit()
+    server.merge_import(conn, _doc([], settings={"language": "en", "theme": "dark"}))
+    rows = {r["key"]: (r["value"], r["createdAt"]) for r in conn.execute("SELECT key, value, createdAt FROM settings")}
+    assert rows == {"language": ('"en"', "c0"), "theme": ('"dark"', "c0")}
+
+    server.bulk_import(conn, _doc([(1, "2026-01-01", 1.0)]))
+    created = conn.execute("SELECT createdAt FROM priceHistory").fetchone()[0]
+    doc = _doc([(1, "2026-01-01", 1.5)])
+    doc["priceHistory"][0]["createdAt"] = "later"
+    server.merge_import(conn, doc)
+    assert tuple(conn.execute("SELECT price, createdAt FROM priceHistory").fetchone()) == (1.5, created)
@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+import server
+
+LEGACY_SCHEMA = """
+CREATE TABLE accounts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    "group" TEXT NOT NULL,
+    balance REAL NOT NULL DEFAULT 0,
+    note TEXT,
+    createdAt TEXT NOT NULL,
+    updatedAt TEXT NOT NULL
+);
+CREATE TABLE investments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    symbol TEXT,
+    quantity REAL NOT NULL DEFAULT 0,
+    costPrice REAL NOT NULL DEFAULT 0,
+    currentPrice REAL NOT NULL DEFAULT 0,
+    purchaseDate TEXT,
+    note TEXT,
+    createdAt TEXT NOT NULL,
+    updatedAt TEXT NOT NULL
+);
+INSERT INTO accounts (name, "group", balance, createdAt, updatedAt) VALUES ('Cash', 'cash', 12.5, 'x', 'x');
+INSERT INTO investments (type, name, symbol, quantity, costPrice, currentPrice, createdAt, updatedAt)
+VALUES ('fund', 'Fund', '000001', 3, 1, 1.2, 'x', 'x');
+"""
+
+
+@pytest.fixture
+def legacy_path(tmp_path, monkeypatch):
+    """A database file written by a build from before schema versioning (user_version 0)."""
+    path = tmp_path / "legacy.db"
+    raw = sqlite3.connect(path)
+    raw.executescript(LEGACY_SCHEMA)
+    raw.close()
+    server.DB_POOL.drain()
+    monkeypatch.setattr(server, "DB_PATH", path)
+    monkeypatch.setattr(server, "RECURRING_SCHEDULER", None)
+    yield path
+    server.DB_POOL.drain()
+
+
+def _inspect(path):
+    raw = sqlite3.connect(path)
+    try:
+        version = raw.execute("PRAGMA user_version").fetchone()[0]
+        columns = {t: {r[1] for r in raw.execute(f"PRAGMA table_info({t})")} for t in ("accounts", "investments")}
+        names = {r[0] for r in raw.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")}
+        rows = raw.execute("SELECT a.name, a.balance, a.includeInNetWorth, i.symbol, i.annualInterestRate FROM accounts a, investments i").fetchall()
+        return version, columns, names, rows
+    finally:
+        raw.close()
+
+
+def test_unversioned_database_is_upgraded_in_place(legacy_path):
+    server.init_db()
+    version, columns, names, rows = _inspect(legacy_path)
+    assert version == server.SCHEMA_VERSION
+    assert {"icon", "billingDay", "repaymentDay", "includeInNetWorth"} <= columns["accounts"]
+    assert {"wealthProductType", "annualInterestRate", "maturityDate", "lastAccruedDate"} <= columns["investments"]
+    assert {name for name, _table, _ddl in server.QUERY_INDEXES} <= names
+    assert {"transactions", "priceHistory", "recurringRules", "quoteCache"} <= names
+    # Existing rows survive, and added NOT NULL columns take their defaults.
+    assert rows == [("Cash", 12.5, 1, "000001", 0.0)]
+
+
+def test_partially_migrated_database_runs_only_newer_steps(legacy_path, monkeypatch):
+    migrations = server.SCHEMA_MIGRATIONS
+    monkeypatch.setattr(server, "SCHEMA_MIGRATIONS", migrations[:1])
+    server.init_db()
+    assert _inspect(legacy_path)[0] == 1
+    ran = []
+    monkeypatch.setattr(server, "SCHEMA_MIGRATIONS", tuple((v, lambda conn, v=v, m=m: (ran.append(v), m(conn))) for v, m in migrations))
+    server.init_db()
+    assert ran == [v for v, _m in server.SCHEMA_MIGRATIONS if v > 1]
+    assert _inspect(legacy_path)[0] == server.SCHEMA_VERSION
+
+
+def test_current_database_skips_migrations(legacy_path, monkeypatch):
+    server.init_db()
+
+    def fail(conn):
+        raise AssertionError("migration re-run on a current database")
+
+    monkeypatch.setattr(server, "SCHEMA_MIGRATIONS", tuple((v, fail) for v, _m in server.SCHEMA_MIGRATIONS))
+    server.init_db()
+    conn = server.connect(write=False)
+    try:
+        assert conn.execute("SELECT name FROM accounts").fetchone()[0] == "Cash"
+    finally:
+        conn.close()
@@ -0,0 +1,108 @@
+import http.client
+import socket
+import threading
+import time
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def pooled(db, monkeypatch):
+    monkeypatch.setattr(server.Handler, "log_message", lambda *args: None)
+    servers = []
+
+    def start(workers=1, queue_size=4):
+        httpd = server.PooledHTTPServer(("127.0.0.1", 0), server.KeepAliveHandler, workers=workers, queue_size=queue_size)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return httpd.server_address[1], httpd
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def _get(conn, path):
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    return resp.status, resp.getheader("Connection"), resp.read()
+
+
+def test_keep_alive_reuses_one_connection(pooled):
+    port, _ = pooled()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    _get(conn, "/api/accounts")
+    sock = conn.sock
+    for _ in range(5):
+        assert _get(conn, "/api/accounts")[0] == 200
+    assert conn.sock is sock
+    conn.close()
+
+
+def test_unread_body_does_not_desync_connection(pooled):
+    port, _ = pooled()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("POST", "/api/health", body=b'{"junk": "' + b"x" * 5000 + b'"}', headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    resp.read()
+    assert resp.status == 405
+    assert _get(conn, "/api/accounts")[0] == 200
+    conn.close()
+
+
+def test_idle_keep_alive_yields_worker_to_new_connection(pooled):
+    port, _ = pooled(workers=1)
+    idle = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    assert _get(idle, "/api/accounts")[0] == 200
+    time.sleep(0.1)
+
+    started = time.perf_counter()
+    other = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    assert _get(other, "/api/accounts")[0] == 200
+    assert time.perf_counter() - started < 1.0
+    idle.close()
+    other.close()
+
+
+def test_saturated_server_sheds_load_with_503(pooled):
+    port, httpd = pooled(workers=1, queue_size=1)
+    # Half-sent requests keep the only worker busy and fill the queue.
+    busy = []
+    for _ in range(2):
+        s = socket.create_connection(("127.0.0.1", port))
+        s.sendall(b"GET /api/accounts HTTP/1.1\r\nHost: x\r\n")
+        busy.append(s)
+        time.sleep(0.2)
+
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", "/api/accounts")
+    resp = conn.getresponse()
+    assert resp.status == 503
+    assert resp.getheader("Retry-After") == str(server.BUSY_RETRY_AFTER)
+    assert time.perf_counter() - started < 1.0
+    assert httpd.rejected == 1
+    for s in busy:
+        s.close()
+
+
+def test_client_disconnects_are_not_reported_as_errors(pooled, monkeypatch):
+    errors = []
+    monkeypatch.setattr(server.PooledHTTPServer, "handle_error", lambda self, request, address: errors.append(address))
+    calls = iter([BrokenPipeError, ConnectionResetError, ValueError])
+
+    def finish_request(self, request, address):
+        raise next(calls)()
+
+    monkeypatch.setattr(server.PooledHTTPServer, "finish_request", finish_request)
+    port, _ = pooled()
+    for _ in range(3):
+        socket.create_connection(("127.0.0.1", port), timeout=5).close()
+    deadline = time.monotonic() + 5
+    while not errors and time.monotonic() < deadline:
+        time.sleep(0.02)
+    # Only the genuine fault reaches handle_error.
+    assert len(errors) == 1
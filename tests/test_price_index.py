@@ -0,0 +1,98 @@
+import pytest
+
+import server
+
+ROWS = [
+    (1, "2026-01-01", 1.0),
+    (1, "2026-01-03T09:30:00", 1.3),
+    (1, "2026-01-03", 1.2),
+    (1, "2026-01-05", 1.5),
+    (1, "2026-01-05T18:00:00Z", 1.55),
+    (1, "2026/01/04", 9.9),
+    (1, "bogus", 9.9),
+    (1, "2026-01-10", 2.0),
+    (2, "2025-12-31", 5.0),
+    (2, "2026-01-04T00:00:00", 5.4),
+]
+RANGES = [(None, None), ("2026-01-03", "2026-01-05"), ("2026-01-02", "2026-01-04"), ("2026-01-05T12:00", None), (None, "2026-01-05"), ("nonsense", "2026-01-03")]
+DAYS = ["2025-12-30", "2025-12-31", "2026-01-01", "2026-01-02", "2026-01-03", "2026-01-04", "2026-01-05", "2026-01-09", "2026-01-10", "2026-02-01"]
+
+
+@pytest.fixture
+def history(conn):
+    conn.executemany(
+        "INSERT INTO priceHistory (investmentId, date, price, createdAt) VALUES (?, ?, ?, 'x')", ROWS
+    )
+    conn.commit()
+    return conn
+
+
+def _answers(conn, enabled):
+    index = server.PriceIndex(enabled=enabled)
+    out = []
+    for inv_id in (1, 2, 3):
+        out.append([index.range(conn, inv_id, start, end) for start, end in RANGES])
+        out.append([index.point(conn, inv_id, d) for d in DAYS])
+        out.append([index.latest(conn, inv_id, d) for d in [None, *DAYS]])
+    return out
+
+
+def test_index_and_sql_paths_agree(history):
+    assert _answers(history, True) == _answers(history, False)
+
+
+def test_range_bounds_are_whole_days_and_dates_normalized(history):
+    index = server.PriceIndex(enabled=False)
+    dates, prices = index.range(history, 1, "2026-01-03", "2026-01-05")
+    assert dates == ["2026-01-03", "2026-01-03", "2026-01-05", "2026-01-05"]
+    assert prices == [1.2, 1.3, 1.5, 1.55]
+    assert index.latest(history, 2, "2026-01-04") == ("2026-01-04", 5.4)
+
+
+def test_as_of_agrees_with_and_without_index(history, monkeypatch):
+    monkeypatch.setattr(server, "PRICE_INDEX", server.PriceIndex(enabled=True))
+    with_index = server.prices_as_of(history, [1, 2, 3], DAYS)
+    monkeypatch.setattr(server, "PRICE_INDEX", server.PriceIndex(enabled=False))
+    without_index = server.prices_as_of(history, [1, 2, 3], DAYS)
+    assert with_index == without_index
+    assert with_index["series"]["1"]["prices"][DAYS.index("2026-01-04")] == 1.3
+
+
+def test_committed_price_write_is_visible_before_close(db, monkeypatch):
+    index = server.PriceIndex(enabled=True)
+    monkeypatch.setattr(server, "PRICE_INDEX", index)
+    reader = server.connect(write=False)
+    try:
+        assert index.latest(reader, 1) is None
+        writer = server.connect()
+        try:
+            writer.execute("INSERT INTO priceHistory (investmentId, date, price, createdAt) VALUES (1, '2026-01-01', 3.0, 'x')")
+            # The writer sees its own row; other readers keep the committed state meanwhile.
+            assert index.latest(writer, 1) == ("2026-01-01", 3.0)
+            assert index.latest(reader, 1) is None
+            writer.commit()
+            # The handler has replied by now but not yet released the connection.
+            assert index.latest(reader, 1) == ("2026-01-01", 3.0)
+            # Once committed, the writer's own reads go back through the cache.
+            assert index.series(writer, 1) is index.series(reader, 1)
+        finally:
+            writer.close()
+    finally:
+        reader.close()
+
+
+def test_rolled_back_price_write_never_reaches_the_index(db, monkeypatch):
+    index = server.PriceIndex(enabled=True)
+    monkeypatch.setattr(server, "PRICE_INDEX", index)
+    writer = server.connect()
+    try:
+        writer.execute("INSERT INTO priceHistory (investmentId, date, price, createdAt) VALUES (1, '2026-01-01', 3.0, 'x')")
+        assert index.latest(writer, 1) == ("2026-01-01", 3.0)
+        writer.rollback()
+    finally:
+        writer.close()
+    reader = server.connect(write=False)
+    try:
+        assert index.latest(reader, 1) is None
+    finally:
+        reader.close()
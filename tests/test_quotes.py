@@ -0,0 +1,24 @@
+from datetime import date
+
+import server
+
+
+class _StubQuotes:
+    def lookup(self, keys, force=False):
+        return {key: {"price": 1.25} for key in keys}, {}, {"hits": 0, "misses": len(keys)}
+
+
+def test_quote_and_snapshot_dates_use_the_local_day(client, monkeypatch):
+    monkeypatch.setattr(server, "local_today", lambda: date(2026, 3, 1))
+    monkeypatch.setattr(server, "QUOTE_CACHE", _StubQuotes())
+    _, inv, _ = client.post("/api/investments", {"type": "fund", "name": "Fund", "symbol": "000001", "quantity": 2, "costPrice": 1, "currentPrice": 1})
+
+    status, body, _ = client.post("/api/quotes/refresh", {})
+    assert status == 200 and body["date"] == "2026-03-01"
+    _, history, _ = client.get(f"/api/priceHistory?investmentId={inv['id']}")
+    assert [(h["date"], h["price"]) for h in history] == [("2026-03-01", 1.25)]
+
+    status, _, _ = client.post("/api/snapshots/record", {})
+    assert status == 200
+    _, latest, _ = client.get("/api/snapshots/latest")
+    assert latest["date"] == "2026-03-01"
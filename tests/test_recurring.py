@@ -0,0 +1,199 @@
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import server
+
+
+def _account(conn, account_id, name, balance):
+    conn.execute(
+        'INSERT INTO accounts (id, name, "group", balance, createdAt, updatedAt) VALUES (?, ?, ?, ?, ?, ?)',
+        (account_id, name, "cash", balance, "x", "x"),
+    )
+
+
+def _rule(conn, action, amount, next_run, **fields):
+    cols = {"kind": "account", "action": action, "frequency": "monthly", "amount": amount, "nextRun": next_run, "createdAt": "x", "updatedAt": "x"}
+    cols.update(fields)
+    cur = conn.execute(
+        f"INSERT INTO recurringRules ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})", list(cols.values())
+    )
+    return cur.lastrowid
+
+
+def _reasons(conn):
+    return [r["reason"] for r in conn.execute("SELECT reason FROM transactions ORDER BY id")]
+
+
+def test_reasons_default_to_chinese_like_the_client(conn):
+    _account(conn, 1, "A", 100)
+    _account(conn, 2, "B", 0)
+    _rule(conn, "income", 10, "2026-01-05", accountId=1)
+    _rule(conn, "transfer", 5, "2026-01-05", fromAccountId=1, toAccountId=2)
+    server.run_due_recurring(conn, date(2026, 1, 5))
+    assert _reasons(conn) == ["周期入账", "周期转账: A → B", "周期转账: A → B"]
+
+
+def test_reasons_follow_saved_language(conn):
+    _account(conn, 1, "A", 100)
+    conn.execute("INSERT INTO settings (key, value, createdAt, updatedAt) VALUES ('language', '\"en\"', 'x', 'x')")
+    _rule(conn, "income", 10, "2026-01-05", accountId=1)
+    server.run_due_recurring(conn, date(2026, 1, 5))
+    assert _reasons(conn) == ["Recurring income"]
+
+
+def test_explicit_language_and_note_win(conn):
+    _account(conn, 1, "A", 100)
+    _rule(conn, "income", 10, "2026-01-05", accountId=1)
+    _rule(conn, "income", 10, "2026-01-05", accountId=1, note="Salary")
+    server.run_due_recurring(conn, date(2026, 1, 5), lang="en")
+    assert _reasons(conn) == ["Recurring income", "Salary"]
+
+
+def test_run_due_route_uses_requested_language(client):
+    status, account, _ = client.post("/api/accounts", {"name": "A", "group": "cash", "balance": 0})
+    client.post(
+        "/api/recurring",
+        {"kind": "account", "action": "income", "accountId": account["id"], "frequency": "daily", "amount": 3, "enabled": True, "nextRun": "2026-01-01"},
+    )
+    status, result, _ = client.post("/api/recurring/runDue", {"lang": "en"})
+    assert status == 200 and result["executed"] >= 1
+    _, txs, _ = client.get(f"/api/transactions?accountId={account['id']}")
+    assert {t["reason"] for t in txs} == {"Recurring income"}
+
+
+def _investment(conn, inv_id, inv_type, quantity, cost, price, **fields):
+    cols = {"id": inv_id, "type": inv_type, "name": "W", "symbol": "", "quantity": quantity, "costPrice": cost, "currentPrice": price, "createdAt": "2026-01-01T00:00:00Z", "updatedAt": "x"}
+    cols.update(fields)
+    conn.execute(f"INSERT INTO investments ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})", list(cols.values()))
+
+
+def test_expense_debits_and_never_overdraws(conn):
+    _account(conn, 1, "A", 50)
+    _rule(conn, "expense", 30, "2026-01-05", accountId=1)
+    big = _rule(conn, "expense", 1000, "2026-01-05", accountId=1)
+    result = server.run_due_recurring(conn, date(2026, 1, 5))
+    assert result == {"processed": 2, "executed": 1}
+    assert conn.execute("SELECT balance FROM accounts WHERE id = 1").fetchone()[0] == 20
+    tx = conn.execute("SELECT type, amount, previousBalance, newBalance, reason FROM transactions").fetchall()
+    assert [tuple(r) for r in tx] == [("recurring_expense", -30.0, 50.0, 20.0, "周期出账")]
+    # The skipped rule stays due, like the browser's runDue loop.
+    assert conn.execute("SELECT nextRun FROM recurringRules WHERE id = ?", (big,)).fetchone()[0] == "2026-01-05"
+
+
+def test_wealth_dca_accrues_interest_before_adding_principal(conn):
+    _account(conn, 1, "A", 100)
+    _investment(conn, 1, "wealth", 100, 1, 1, annualInterestRate=3.65, purchaseDate="2026-01-01")
+    _rule(conn, "dca", 10, "2026-01-11", kind="investment", fromAccountId=1, investmentId=1)
+    server.run_due_recurring(conn, date(2026, 1, 11))
+    inv = conn.execute("SELECT quantity, costPrice, currentPrice, lastAccruedDate FROM investments WHERE id = 1").fetchone()
+    # 100 at 3.65%/yr for 10 days -> 100.1; plus 10 principal -> 110.1 over 110 units.
+    assert inv["quantity"] == 110
+    assert inv["costPrice"] == 1
+    assert abs(inv["currentPrice"] - 110.1 / 110) < 1e-12
+    assert inv["lastAccruedDate"] == "2026-01-11"
+    assert conn.execute("SELECT balance FROM accounts WHERE id = 1").fetchone()[0] == 90
+
+
+def test_market_dca_averages_cost(conn):
+    _account(conn, 1, "A", 100)
+    _investment(conn, 1, "fund", 10, 1, 2)
+    _rule(conn, "dca", 20, "2026-01-11", kind="investment", fromAccountId=1, investmentId=1)
+    server.run_due_recurring(conn, date(2026, 1, 11))
+    inv = conn.execute("SELECT quantity, costPrice, currentPrice FROM investments WHERE id = 1").fetchone()
+    assert inv["quantity"] == 20
+    assert inv["costPrice"] == 1.5
+    assert inv["currentPrice"] == 2
+
+
+@pytest.fixture
+def scheduler(db, monkeypatch):
+    s = server.RecurringScheduler()
+    monkeypatch.setattr(server, "RECURRING_SCHEDULER", s)
+    s.start()
+    yield s
+    s.stop()
+    s.join(timeout=2)
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _count(client, path):
+    _, rows, _ = client.get(path)
+    return len(rows)
+
+
+def test_scheduler_runs_overdue_rules_on_start(db, monkeypatch):
+    today = server.local_today()
+    conn = server.connect()
+    try:
+        _account(conn, 1, "A", 0)
+        rule_id = _rule(conn, "income", 5, (today - timedelta(days=2)).isoformat(), frequency="daily", accountId=1)
+        conn.commit()
+    finally:
+        conn.close()
+
+    s = server.RecurringScheduler()
+    monkeypatch.setattr(server, "RECURRING_SCHEDULER", s)
+    s.start()
+    try:
+        def caught_up():
+            conn = server.connect(write=False)
+            try:
+                return conn.execute("SELECT nextRun FROM recurringRules WHERE id = ?", (rule_id,)).fetchone()[0]
+            finally:
+                conn.close()
+
+        assert _wait_for(lambda: caught_up() == (today + timedelta(days=1)).isoformat())
+    finally:
+        s.stop()
+        s.join(timeout=2)
+
+    conn = server.connect(write=False)
+    try:
+        # Three occurrences (two missed days and today), then a snapshot for the run.
+        assert conn.execute("SELECT balance FROM accounts WHERE id = 1").fetchone()[0] == 15
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 3
+        assert conn.execute("SELECT date FROM snapshots").fetchone()[0] == today.isoformat()
+    finally:
+        conn.close()
+
+
+def test_scheduler_picks_up_rules_saved_through_the_api(client, scheduler):
+    _, account, _ = client.post("/api/accounts", {"name": "A", "group": "cash", "balance": 0})
+    today = server.local_today().isoformat()
+    client.post(
+        "/api/recurring",
+        {"kind": "account", "action": "income", "accountId": account["id"], "frequency": "daily", "amount": 3, "enabled": True, "nextRun": today},
+    )
+    assert _wait_for(lambda: _count(client, f"/api/transactions?accountId={account['id']}") == 1)
+
+
+def test_scheduler_drops_disabled_rules_and_defers_failing_ones(client, scheduler):
+    today = server.local_today()
+    _, account, _ = client.post("/api/accounts", {"name": "A", "group": "cash", "balance": 0})
+    future = (today + timedelta(days=3)).isoformat()
+    _, rule, _ = client.post(
+        "/api/recurring",
+        {"kind": "account", "action": "income", "accountId": account["id"], "frequency": "daily", "amount": 3, "enabled": True, "nextRun": future},
+    )
+    assert _wait_for(lambda: rule["id"] in scheduler._live)
+    client.put(f"/api/recurring/{rule['id']}", {**rule, "enabled": False})
+    assert _wait_for(lambda: rule["id"] not in scheduler._live)
+
+    # An expense the account can't cover stays due; it is retried tomorrow, not in a loop.
+    _, broke, _ = client.post(
+        "/api/recurring",
+        {"kind": "account", "action": "expense", "accountId": account["id"], "frequency": "daily", "amount": 50, "enabled": True, "nextRun": today.isoformat()},
+    )
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    assert _wait_for(lambda: any(key == tomorrow and rule_id == broke["id"] for key, rule_id, _seq in list(scheduler._heap)))
+    assert _count(client, f"/api/transactions?accountId={account['id']}") == 0
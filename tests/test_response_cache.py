@@ -0,0 +1,38 @@
+import server
+
+
+def _add_accounts(client, n, prefix="Account"):
+    for i in range(n):
+        client.post("/api/accounts", {"name": f"{prefix} {i}", "group": "cash", "balance": i})
+
+
+def test_cached_body_is_reused_until_its_table_is_written(client):
+    _add_accounts(client, 2)
+    _, first, _ = client.get("/api/accounts")
+    _, again, _ = client.get("/api/accounts")
+    stats = server.RESPONSE_CACHE.stats()
+    assert again == first and stats["hits"] == 1 and stats["entries"] == 1
+
+    # A write to another table leaves the accounts entry alone...
+    status, _, _ = client.put("/api/settings/language", {"value": "en"})
+    assert status == 200
+    client.get("/api/accounts")
+    assert server.RESPONSE_CACHE.stats()["hits"] == 2
+
+    # ...while a write to accounts is visible on the very next GET.
+    client.put(f"/api/accounts/{first[0]['id']}", {**first[0], "name": "Renamed"})
+    _, after, _ = client.get("/api/accounts")
+    assert "Renamed" in {a["name"] for a in after}
+    assert server.RESPONSE_CACHE.stats()["hits"] == 2
+
+
+def test_rolled_back_write_does_not_poison_the_cache(client):
+    _add_accounts(client, 1)
+    _, before, _ = client.get("/api/accounts")
+    client.post("/api/batch", {"operations": [
+        {"method": "POST", "path": "/api/accounts", "body": {"name": "Gone", "group": "cash"}},
+        {"method": "GET", "path": "/api/accounts"},
+        {"method": "POST", "path": "/api/nope"},
+    ]})
+    _, after, _ = client.get("/api/accounts")
+    assert after == before
@@ -0,0 +1,83 @@
+import pytest
+
+import server
+
+# (id, accountId, date): several rows share a date so ties fall back to id.
+ROWS = [
+    (1, 1, "2026-01-01"),
+    (2, 1, "2026-01-02"),
+    (3, 2, "2026-01-02"),
+    (4, 1, "2026-01-02T08:00:00"),
+    (5, 2, "2026-01-03"),
+    (6, 1, "2026-01-03"),
+    (7, 1, "2026-01-05"),
+]
+
+
+@pytest.fixture
+def seeded(db):
+    conn = server.connect()
+    try:
+        conn.executemany(
+            "INSERT INTO transactions (id, accountId, type, previousBalance, newBalance, amount, date, createdAt) VALUES (?, ?, 'income', 0, 0, 1, ?, 'x')",
+            ROWS,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return sorted(ROWS, key=lambda r: (r[2], r[0]), reverse=True)
+
+
+def _ids(page):
+    return [t["id"] for t in page["items"]]
+
+
+def _walk(client, query):
+    pages, cursor = [], None
+    while True:
+        _, page, _ = client.get(f"/api/transactions?{query}" + (f"&before={cursor}" if cursor else ""))
+        pages.append(page)
+        cursor = page["nextCursor"]
+        if not cursor:
+            return pages
+
+
+def test_unpaged_request_still_returns_a_plain_list(client, seeded):
+    status, txs, _ = client.get("/api/transactions")
+    assert status == 200 and [t["id"] for t in txs] == [r[0] for r in seeded]
+
+
+def test_pages_cover_every_row_once_in_order(client, seeded):
+    pages = _walk(client, "limit=3")
+    assert [len(p["items"]) for p in pages] == [3, 3, 1]
+    assert [i for p in pages for i in _ids(p)] == [r[0] for r in seeded]
+    assert pages[0]["prevCursor"] is None
+
+
+def test_after_cursor_returns_the_previous_page(client, seeded):
+    first, second = _walk(client, "limit=3")[:2]
+    _, back, _ = client.get(f"/api/transactions?limit=3&after={second['prevCursor']}")
+    assert _ids(back) == _ids(first)
+    assert back["prevCursor"] is None and back["nextCursor"] == first["nextCursor"]
+
+
+def test_cursor_is_stable_when_newer_rows_arrive(client, seeded):
+    _, first, _ = client.get("/api/transactions?limit=3")
+    client.post("/api/transactions", {"accountId": 1, "type": "income", "amount": 1, "date": "2026-02-01"})
+    _, second, _ = client.get(f"/api/transactions?limit=3&before={first['nextCursor']}")
+    assert _ids(second) == [r[0] for r in seeded[3:6]]
+
+
+def test_filters_apply_to_pages(client, seeded):
+    pages = _walk(client, "limit=2&accountId=1&startDate=2026-01-02")
+    assert [i for p in pages for i in _ids(p)] == [7, 6, 4, 2]
+
+
+@pytest.mark.parametrize("query, error", [
+    ("limit=2&before=!!", "invalid_cursor"),
+    ("limit=0", "invalid_limit"),
+    ("before=a&after=b", "before_and_after_exclusive"),
+])
+def test_bad_paging_parameters(client, seeded, query, error):
+    status, body, _ = client.get(f"/api/transactions?{query}")
+    assert status == 400 and body == {"error": error}